@@ -1 +1,4 @@
-from .controller import Controller
\ No newline at end of file
+from .controller import Controller
+from .headless import HeadlessController
+from .server import GameServer, GameSession, LoadTester
+from .replay import InputRecording, ReplayRunner
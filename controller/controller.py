@@ -1,11 +1,14 @@
+import concurrent.futures
 import os
 import pygame
 import sys
+import time
 from pygame.locals import *
 
 import model as model
 import view as view
-import pickle
+import utils.profiler as profiler
+from .replay import InputRecording
 import logging
 
 class Controller:
@@ -14,17 +17,67 @@ class Controller:
     PLAYING = "Playing"
     SHOP = "Shop"
 
+    # The model moves on in fixed steps at this rate whatever rate the frames get drawn at
+    SIMULATION_RATE = 75
+    MOVE_STEP = 2
+    TICK_INTERVAL = 250
+
+    # Draw at most this many frames per second, run at most this many steps between frames and skip
+    # drawing at most this many frames in a row when the model falls behind
+    MAX_FRAME_RATE = 75
+    MAX_STEPS_PER_FRAME = 5
+    MAX_FRAME_SKIP = 5
+    MAX_FRAME_TIME = 0.25
+
+    # The hot paths that get timed when profiling is turned on
+    PROFILE_TARGETS = ((model.Game, "move_player"),
+                       (model.Game, "tick"),
+                       (model.MonsterEngine, "tick"),
+                       (model.Floor, "move_player"),
+                       (model.Floor, "touching_objects"),
+                       (model.Floor, "colliding_objects"),
+                       (view.FloorView, "draw"),
+                       (view.FloorView, "draw_layer"),
+                       (view.FloorView, "draw_actors"),
+                       (view.ImageManager, "get_skin_image"),
+                       (view.ImageManager, "get_skin_sprite"),
+                       (pygame.display, "update"))
+
+    # Get the floors that the player is heading towards ready in the background before they get there
+    PREFETCH_FLOORS = True
+
+    # Print the game's messages to the console
+    PRINT_EVENTS = True
+
+    PROFILE_KEY = K_F3
+    PROFILE_DUMP_KEY = K_F4
+    PROFILE_FILE_NAME = "profile"
+
+    SAVE_KEY = K_F5
+    LOAD_KEY = K_F9
+    SAVE_FILE_NAME = "zeldaquest.sav"
+
     def __init__(self):
         self.game = None
         self.view = None
         self.audio = None
         self._mode = None
+        self.profiler = None
+        self.prefetcher = None
+        self.prefetching = {}
+        self.prefetch_floor_id = None
+
+        # The inputs being recorded and the file to save them to or the recording being replayed
+        self.recording = None
+        self.record_file_name = None
+        self.replay = None
+        self.replay_inputs = None
 
         self.music_on = True
         self.sound_on = True
 
 
-    def initialise(self):
+    def initialise(self, record_file_name: str = None, replay_file_name: str = None):
 
         self._mode = Controller.PLAYING
         self._test_mode = False
@@ -32,11 +85,40 @@ class Controller:
         self.game = model.Game("Zelda Quest")
         self.view = view.MainFrame(width=20*32, height=730)
 
+        self.recording = None
+        self.record_file_name = record_file_name
+        self.replay = None
+        self.replay_inputs = None
+        player_name = "player1"
+
+        if replay_file_name is not None:
+            self.replay = InputRecording.load(replay_file_name)
+            self.replay_inputs = iter(self.replay)
+            player_name = self.replay.player_name
+        elif record_file_name is not None:
+            self.recording = InputRecording(player_name, Controller.MOVE_STEP)
+
+        # Echo the game's messages to the console as well as showing them in the status bar
+        if Controller.PRINT_EVENTS is True:
+            self.game.events.subscribe(model.EventQueue.print_events)
+
         self.game.initialise()
-        new_player = self.game.create_player("player1")
+        new_player = self.game.create_player(player_name)
         self.game.add_player(new_player)
         #new_player.set_pos(50,50)
-        self.view.initialise(self.game)
+        self.game.start()
+
+        self.profiler = profiler.Profiler()
+        for owner, attribute_name in Controller.PROFILE_TARGETS:
+            self.profiler.add_target(owner, attribute_name)
+
+        self.view.initialise(self.game, self.profiler)
+
+        # Prefetching loads floors at times that depend on how fast the machine is so recordings need it off
+        if Controller.PREFETCH_FLOORS is True and self.recording is None and self.replay is None:
+            self.prefetcher = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self.prefetching = {}
+        self.prefetch_floor_id = None
 
         pygame.mixer.pre_init(44100, -16, 2, 2048)
         pygame.mixer.init()
@@ -48,8 +130,16 @@ class Controller:
 
         FPSCLOCK = pygame.time.Clock()
 
-        pygame.time.set_timer(USEREVENT + 1, 250)
-        pygame.event.set_allowed([QUIT, KEYDOWN, KEYUP, USEREVENT])
+        pygame.event.set_allowed([QUIT, KEYDOWN, KEYUP])
+
+        step_time = 1.0 / Controller.SIMULATION_RATE
+        steps_per_tick = max(1, round(Controller.TICK_INTERVAL / 1000 * Controller.SIMULATION_RATE))
+
+        self.reset_stats()
+        accumulator = 0.0
+        frames_skipped = 0
+        start_time = time.perf_counter()
+        previous_time = start_time
 
         loop = True
 
@@ -59,34 +149,239 @@ class Controller:
             for event in pygame.event.get():
                 if event.type == QUIT:
                     loop = False
-                elif event.type == USEREVENT + 1:
-                    try:
-                        if self.game.state == model.Game.PLAYING:
-                            self.game.tick()
-                        self.view.tick()
+                elif event.type == KEYDOWN:
+                    if event.key == Controller.PROFILE_KEY:
+                        print("Profiling {0}".format("on" if self.profiler.toggle() is True else "off"))
+                    elif event.key == Controller.PROFILE_DUMP_KEY:
+                        self.dump_profile()
+                    elif event.key == Controller.SAVE_KEY:
+                        self.save()
+                    elif event.key == Controller.LOAD_KEY:
+                        self.load()
 
-                    except Exception as err:
-                        print(str(err))
+            # Add on however much real time has passed but don't let a long stall turn into a huge catch up
+            now = time.perf_counter()
+            frame_time = now - previous_time
+            previous_time = now
+            if frame_time > Controller.MAX_FRAME_TIME:
+                self.dropped_sim_time += frame_time - Controller.MAX_FRAME_TIME
+                frame_time = Controller.MAX_FRAME_TIME
+            accumulator += frame_time
 
-            # Move the player if an arrow key is pressed
+            # Run the model in fixed steps until it has caught up with real time
             key = pygame.key.get_pressed()
-            if key[pygame.K_LEFT]:
-                self.game.move_player(-2, 0)
-            if key[pygame.K_RIGHT]:
-                self.game.move_player(2, 0)
-            if key[pygame.K_UP]:
-                self.game.move_player(0, -2)
-            if key[pygame.K_DOWN]:
-                self.game.move_player(0, 2)
+            steps = 0
+            while accumulator >= step_time and steps < Controller.MAX_STEPS_PER_FRAME:
+                step_start = time.perf_counter()
+                if self.step(key, steps_per_tick) is False:
+                    loop = False
+                    break
+                self.sim_time += time.perf_counter() - step_start
+                accumulator -= step_time
+                steps += 1
+
+            # If the model is still behind skip drawing this frame to give it more time to catch up...
+            if accumulator >= step_time:
+                if frames_skipped < Controller.MAX_FRAME_SKIP:
+                    frames_skipped += 1
+                    self.dropped_frames += 1
+                    continue
+
+                # ...but not forever so give up on the time that it can't make up
+                self.dropped_sim_time += accumulator - accumulator % step_time
+                accumulator %= step_time
+
+            frames_skipped = 0
 
-            FPSCLOCK.tick(75)
+            self.prefetch_floors()
 
+            # Hand out everything that happened in this frame's steps to the view and anything else subscribed
+            self.game.events.process()
+
+            # Draw the player part way between where they were before the last step and where they are now
+            frame_start = time.perf_counter()
+            self.view.interpolate(self.get_interpolation(accumulator / step_time))
             self.view.draw()
             self.view.update()
+            self.frame_time += time.perf_counter() - frame_start
+            self.frames += 1
+
+            if self.profiler.enabled is True:
+                self.profiler.record("frame", time.perf_counter() - frame_start)
+                self.profiler.record("sim steps", steps, units=" steps")
+                self.profiler.record("pixels pushed", self.view.pixels_pushed, units="px")
+
+            FPSCLOCK.tick(Controller.MAX_FRAME_RATE)
+
+        self.elapsed = time.perf_counter() - start_time
+
+        print(self.get_stats())
+
+        self.finish_recording()
 
         #Finish main game loop
         self.end()
 
+    def step(self, key, steps_per_tick: int):
+        """Move the model on by one fixed time step or return False if there is nothing left to replay"""
+
+        self.previous_player_position = (self.game.current_floor_id,) + self.game.current_player.get_pos()
+
+        is_tick = (self.sim_steps + 1) % steps_per_tick == 0
+
+        # Take the inputs from the replay if there is one or else from the arrow keys
+        if self.replay is not None:
+            inputs = next(self.replay_inputs, None)
+            if inputs is None:
+                return False
+        else:
+            inputs = InputRecording.get_inputs(key[pygame.K_LEFT], key[pygame.K_RIGHT], key[pygame.K_UP],
+                                               key[pygame.K_DOWN], is_tick and self.game.state == model.Game.PLAYING)
+
+        if self.recording is not None:
+            self.recording.add(inputs)
+
+        # Move the player for each arrow key that is pressed and tick the game if it is due a tick
+        InputRecording.apply(self.game, inputs, Controller.MOVE_STEP)
+
+        self.sim_steps += 1
+
+        if is_tick is True:
+            try:
+                self.view.tick()
+
+            except Exception as err:
+                print(str(err))
+
+        return True
+
+    def finish_recording(self):
+        """Save the inputs that were recorded or check that the replay ended up where the recording did"""
+
+        if self.recording is not None:
+            self.recording.finish(self.game)
+            self.recording.save(self.record_file_name)
+            print("Recorded {0} steps to {1}".format(self.recording.step_count, self.record_file_name))
+            self.recording = None
+
+        if self.replay is not None:
+            final_state, final_hash = InputRecording.get_state(self.game)
+            if tuple(final_state) == tuple(self.replay.final_state) and final_hash == self.replay.final_hash:
+                print("Replay matched the recording")
+            else:
+                print("Replay did not match the recording: {0} {1} != {2} {3}".format(
+                    final_state, final_hash, self.replay.final_state, self.replay.final_hash))
+
+    def prefetch_floors(self):
+        """Start getting the floor through any exit that the player is getting close to ready in the background"""
+
+        if self.prefetcher is None:
+            return
+
+        # Hand the floors that have been got ready over to the view, which only ever gets changed by this thread
+        for floor_id, prefetched in self.prefetching.items():
+            if prefetched is not None and prefetched.done() is True:
+                self.prefetching[floor_id] = None
+                if prefetched.result() is not None:
+                    self.view.floor_view.add_prepared(*prefetched.result())
+
+        # Forget about the floors that were got ready from the last floor once the player has moved on
+        if self.prefetch_floor_id != self.game.current_floor_id:
+            self.prefetch_floor_id = self.game.current_floor_id
+            self.prefetching = {}
+
+        for floor_id in self.game.get_approaching_floor_ids():
+            if floor_id not in self.prefetching.keys():
+                self.prefetching[floor_id] = self.prefetcher.submit(self.prefetch_floor, floor_id)
+
+    def prefetch_floor(self, floor_id: int):
+        '''
+        Load a floor and draw its scenery returning the floor and what the view got ready for it, which gets run
+        by the prefetch thread rather than the game loop. It leaves the game and the view alone so the floors that
+        get evicted and the floors that the view uses only get changed by the game loop.
+        '''
+
+        try:
+            floors = self.game.floor_factory.floors
+            floor = floors.load(floor_id, evict=False) if self.game.floor_factory.lazy is True else floors[floor_id]
+            return floor, self.view.floor_view.prepare(floor)
+
+        except Exception as err:
+            logging.exception("Failed to prefetch floor {0}: {1}".format(floor_id, err))
+
+    def get_interpolation(self, alpha: float):
+        """How far back towards their position before the last step should the player be drawn?"""
+
+        player = self.game.current_player
+        floor_id, x, y = self.previous_player_position
+        current_x, current_y = player.get_pos()
+
+        # No interpolating if the player has moved floor or jumped
+        if floor_id != self.game.current_floor_id or \
+                abs(x - current_x) > Controller.MOVE_STEP or abs(y - current_y) > Controller.MOVE_STEP:
+            return {}
+
+        return {player: (round((x - current_x) * (1 - alpha)), round((y - current_y) * (1 - alpha)))}
+
+    def save(self):
+
+        try:
+            self.game.save(Controller.SAVE_FILE_NAME)
+            print("Saved game to {0}".format(Controller.SAVE_FILE_NAME))
+        except Exception as err:
+            print("Unable to save game - {0}".format(err))
+
+    def load(self):
+
+        # Loading a game part way through a recording would stop it from being replayed
+        if self.recording is not None or self.replay is not None:
+            print("You can't load a game while recording or replaying")
+            return
+
+        try:
+            self.game.load(Controller.SAVE_FILE_NAME)
+            self.game.start()
+            self.previous_player_position = (self.game.current_floor_id,) + self.game.current_player.get_pos()
+            print("Loaded game from {0}".format(Controller.SAVE_FILE_NAME))
+        except Exception as err:
+            print("Unable to load game - {0}".format(err))
+
+    def dump_profile(self):
+
+        self.profiler.dump_json(Controller.PROFILE_FILE_NAME + ".json")
+        self.profiler.dump_csv(Controller.PROFILE_FILE_NAME + ".csv")
+        print("Dumped profile to {0}.json and {0}.csv".format(Controller.PROFILE_FILE_NAME))
+
+    def reset_stats(self):
+        self.frames = 0
+        self.dropped_frames = 0
+        self.sim_steps = 0
+        self.frame_time = 0.0
+        self.sim_time = 0.0
+        self.dropped_sim_time = 0.0
+        self.elapsed = 0.0
+        self.previous_player_position = (self.game.current_floor_id,) + self.game.current_player.get_pos()
+
+    def get_stats(self):
+
+        elapsed = max(self.elapsed, 1e-9)
+
+        return {"frames": self.frames,
+                "dropped_frames": self.dropped_frames,
+                "sim_steps": self.sim_steps,
+                "elapsed": self.elapsed,
+                "frames_per_second": self.frames / elapsed,
+                "sim_steps_per_second": self.sim_steps / elapsed,
+                "mean_frame_time": self.frame_time / max(self.frames, 1),
+                "mean_sim_step_time": self.sim_time / max(self.sim_steps, 1),
+                "dropped_sim_time": self.dropped_sim_time}
+
     def end(self):
+
+        # Let any floor that is being got ready finish before pygame goes away underneath it
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown(wait=True)
+            self.prefetcher = None
+
         pygame.quit()
 
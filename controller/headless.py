@@ -0,0 +1,148 @@
+import logging
+import random
+import time
+
+import model as model
+import utils.profiler as profiler
+
+
+class HeadlessController:
+    '''
+    Drives a Game without a view or a display. Each frame takes one (dx, dy) move from an input stream and
+    every FRAMES_PER_TICK frames the game is ticked, all as fast as possible rather than at the frame rate.
+    '''
+
+    FRAME_RATE = 75
+    TICK_INTERVAL = 250
+    FRAMES_PER_TICK = int(FRAME_RATE * TICK_INTERVAL / 1000)
+
+    # The hot paths of the model that get timed when profiling is turned on
+    PROFILE_TARGETS = ((model.Game, "move_player"),
+                       (model.Game, "tick"),
+                       (model.MonsterEngine, "tick"),
+                       (model.Floor, "move_player"),
+                       (model.Floor, "touching_objects"),
+                       (model.Floor, "colliding_objects"))
+
+    # Print the game's messages to the console
+    PRINT_EVENTS = True
+
+    MOVE_STEP = 2
+    MOVES = {"NONE": (0, 0),
+             "LEFT": (-MOVE_STEP, 0),
+             "RIGHT": (MOVE_STEP, 0),
+             "UP": (0, -MOVE_STEP),
+             "DOWN": (0, MOVE_STEP)}
+
+    def __init__(self):
+        self.game = None
+        self.tick_count = 0
+        self.move_count = 0
+        self.frame_count = 0
+        self.elapsed = 0
+        self.floors_visited = set()
+        self.profiler = profiler.Profiler()
+        for owner, attribute_name in HeadlessController.PROFILE_TARGETS:
+            self.profiler.add_target(owner, attribute_name)
+
+    def initialise(self, player_name: str = "player1"):
+
+        self.game = model.Game("Zelda Quest")
+        if HeadlessController.PRINT_EVENTS is True:
+            self.game.events.subscribe(model.EventQueue.print_events)
+        self.game.initialise()
+        new_player = self.game.create_player(player_name)
+        self.game.add_player(new_player)
+        self.game.start()
+
+        self.tick_count = 0
+        self.move_count = 0
+        self.frame_count = 0
+        self.elapsed = 0
+        self.floors_visited = {self.game.current_floor_id}
+
+    def run(self, inputs, max_frames: int = None, frames_per_tick: int = FRAMES_PER_TICK):
+        """Step the game with each (dx, dy) from inputs until they run out or max_frames have been run"""
+
+        start = time.perf_counter()
+
+        for dx, dy in inputs:
+
+            if max_frames is not None and self.frame_count >= max_frames:
+                break
+
+            if dx != 0 or dy != 0:
+                self.game.move_player(dx, dy)
+                self.move_count += 1
+
+            self.frame_count += 1
+
+            if self.frame_count % frames_per_tick == 0:
+                self.game.tick()
+                self.tick_count += 1
+
+            self.floors_visited.add(self.game.current_floor_id)
+            self.game.events.process()
+
+        self.elapsed += time.perf_counter() - start
+
+        return self.get_stats()
+
+    def get_stats(self):
+
+        elapsed = max(self.elapsed, 1e-9)
+
+        return {"frames": self.frame_count,
+                "ticks": self.tick_count,
+                "moves": self.move_count,
+                "elapsed": self.elapsed,
+                "frames_per_second": self.frame_count / elapsed,
+                "ticks_per_second": self.tick_count / elapsed,
+                "moves_per_second": self.move_count / elapsed,
+                "floors_visited": len(self.floors_visited),
+                "dirty_rects": self.game.get_dirty_rect_count() if self.game is not None else 0}
+
+    @staticmethod
+    def random_inputs(seed: int = None, max_hold: int = 40):
+        """An endless stream of moves that holds a random direction (or nothing) for a random number of frames"""
+
+        rnd = random.Random(seed)
+        directions = sorted(HeadlessController.MOVES.keys())
+
+        while True:
+            move = HeadlessController.MOVES[rnd.choice(directions)]
+            for i in range(rnd.randint(1, max_hold)):
+                yield move
+
+    @staticmethod
+    def scripted_inputs(file_name: str):
+        '''
+        Read moves from a script file with a line per move of one or more directions and an optional
+        number of frames to hold them for e.g. "LEFT 10" or "UP RIGHT 5". Blank lines and # comments are skipped.
+        '''
+
+        with open(file_name, 'r') as script_file:
+
+            for line_number, line in enumerate(script_file, 1):
+
+                words = line.split("#")[0].upper().split()
+                if len(words) == 0:
+                    continue
+
+                frames = 1
+                if words[-1].isdigit():
+                    frames = int(words.pop())
+
+                dx = 0
+                dy = 0
+                for word in words:
+                    if word not in HeadlessController.MOVES.keys():
+                        raise Exception("{0} line {1}: {2} is not a valid move".format(file_name, line_number, word))
+                    dx += HeadlessController.MOVES[word][0]
+                    dy += HeadlessController.MOVES[word][1]
+
+                logging.info("{0}: line {1} move ({2},{3}) for {4} frames".format(file_name, line_number, dx, dy,
+                                                                                    frames))
+
+                for i in range(frames):
+                    yield dx, dy
@@ -0,0 +1,221 @@
+import struct
+import time
+
+import model as model
+
+'''
+This module contains the classes for recording the inputs to a game and replaying them exactly:-
+    - InputRecording - the inputs for each step of a game and the state that the game ended up in
+    - ReplayRunner - replays a recording without a display as fast as possible and checks that it ends
+      up in the same state as the recorded game did
+'''
+
+
+class InputRecording:
+    '''
+    The inputs for each step of a game stored as a run length encoded list of (inputs, steps) where inputs
+    has a bit for each direction key that was held down and a bit for whether the game was ticked,
+    along with the state that the game ended up in so that a replay can be checked against it.
+
+    The file is laid out as:-
+        - header: magic, version, move step and the total number of steps
+        - player name
+        - runs: count, then the inputs and number of steps of each run
+        - final state: floor ID, x, y, treasure, keys, boss keys and HP of the player and the game's state hash
+    '''
+
+    MAGIC = b"ZQIR"
+    VERSION = 1
+
+    HEADER = struct.Struct("<4sHhI")
+    STRING_SIZE = struct.Struct("<H")
+    COUNT = struct.Struct("<I")
+    RUN = struct.Struct("<BH")
+    FINAL_STATE = struct.Struct("<iiiiiii20s")
+
+    LEFT = 1
+    RIGHT = 2
+    UP = 4
+    DOWN = 8
+    TICK = 16
+
+    # The direction that each key moves the player in the order that the keys get applied
+    MOVES = ((LEFT, (-1, 0)), (RIGHT, (1, 0)), (UP, (0, -1)), (DOWN, (0, 1)))
+
+    MAX_RUN = 0xFFFF
+
+    def __init__(self, player_name: str = "player1", move_step: int = 2):
+        self.player_name = player_name
+        self.move_step = move_step
+        self.runs = []
+        self.step_count = 0
+
+        # The (floor ID, x, y, treasure, keys, boss keys, HP) of the player and the game's state hash at the end
+        self.final_state = None
+        self.final_hash = None
+
+    def __iter__(self):
+
+        for inputs, steps in self.runs:
+            for i in range(steps):
+                yield inputs
+
+    @staticmethod
+    def get_inputs(left: bool = False, right: bool = False, up: bool = False, down: bool = False,
+                   tick: bool = False):
+
+        return (InputRecording.LEFT if left else 0) | (InputRecording.RIGHT if right else 0) | \
+               (InputRecording.UP if up else 0) | (InputRecording.DOWN if down else 0) | \
+               (InputRecording.TICK if tick else 0)
+
+    @staticmethod
+    def apply(game: model.Game, inputs: int, move_step: int):
+        """Move the player for each direction key held down and tick the game if it was ticked"""
+
+        for key, (dx, dy) in InputRecording.MOVES:
+            if inputs & key:
+                game.move_player(dx * move_step, dy * move_step)
+
+        if inputs & InputRecording.TICK:
+            try:
+                game.tick()
+            except Exception as err:
+                print(str(err))
+
+    def add(self, inputs: int):
+
+        if len(self.runs) > 0 and self.runs[-1][0] == inputs and self.runs[-1][1] < InputRecording.MAX_RUN:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([inputs, 1])
+
+        self.step_count += 1
+
+    @staticmethod
+    def get_state(game: model.Game):
+        """Get the state of the current player and the hash of the state of the whole game"""
+
+        player = game.current_player
+
+        return ((game.current_floor_id,) + tuple(player.get_pos()) +
+                (player.treasure, player.keys, player.boss_keys, player.HP)), game.get_state_hash()
+
+    def finish(self, game: model.Game):
+        """Record the state that the game ended up in"""
+
+        self.final_state, self.final_hash = InputRecording.get_state(game)
+
+    def save(self, file_name: str):
+
+        encoded_name = self.player_name.encode()
+
+        data = [InputRecording.HEADER.pack(InputRecording.MAGIC, InputRecording.VERSION, self.move_step,
+                                           self.step_count),
+                InputRecording.STRING_SIZE.pack(len(encoded_name)), encoded_name,
+                InputRecording.COUNT.pack(len(self.runs))]
+        data += [InputRecording.RUN.pack(inputs, steps) for inputs, steps in self.runs]
+        data.append(InputRecording.FINAL_STATE.pack(*[int(value) for value in self.final_state],
+                                                    bytes.fromhex(self.final_hash)))
+
+        with open(file_name, 'wb') as recording_file:
+            recording_file.write(b"".join(data))
+
+    @staticmethod
+    def load(file_name: str):
+
+        with open(file_name, 'rb') as recording_file:
+            data = recording_file.read()
+
+        magic, version, move_step, step_count = InputRecording.HEADER.unpack_from(data, 0)
+        if magic != InputRecording.MAGIC or version != InputRecording.VERSION:
+            raise Exception("{0} is not a version {1} input recording".format(file_name, InputRecording.VERSION))
+        offset = InputRecording.HEADER.size
+
+        size, = InputRecording.STRING_SIZE.unpack_from(data, offset)
+        offset += InputRecording.STRING_SIZE.size
+        recording = InputRecording(data[offset:offset + size].decode(), move_step)
+        offset += size
+
+        run_count, = InputRecording.COUNT.unpack_from(data, offset)
+        offset += InputRecording.COUNT.size
+        recording.runs = [list(run) for run in InputRecording.RUN.iter_unpack(
+            data[offset:offset + run_count * InputRecording.RUN.size])]
+        offset += run_count * InputRecording.RUN.size
+        recording.step_count = step_count
+
+        final_state = InputRecording.FINAL_STATE.unpack_from(data, offset)
+        recording.final_state = final_state[:-1]
+        recording.final_hash = final_state[-1].hex()
+
+        return recording
+
+
+class ReplayRunner:
+    '''
+    Replays an InputRecording on a new Game without a display as fast as possible and checks that the
+    game ends up in the same state as the recorded one did.
+    '''
+
+    def __init__(self):
+        self.game = None
+        self.elapsed = 0
+        self.step_count = 0
+        self.move_count = 0
+        self.tick_count = 0
+        self.final_state = None
+        self.final_hash = None
+
+    def initialise(self, player_name: str):
+
+        self.game = model.Game("Zelda Quest")
+        self.game.initialise()
+        self.game.add_player(self.game.create_player(player_name))
+        self.game.start()
+
+        self.elapsed = 0
+        self.step_count = 0
+        self.move_count = 0
+        self.tick_count = 0
+
+    def run(self, recording: InputRecording):
+
+        self.initialise(recording.player_name)
+
+        game = self.game
+        move_step = recording.move_step
+        apply = InputRecording.apply
+
+        start = time.perf_counter()
+
+        for inputs in recording:
+            apply(game, inputs, move_step)
+
+        self.elapsed = time.perf_counter() - start
+
+        for inputs, steps in recording.runs:
+            self.move_count += bin(inputs & ~InputRecording.TICK).count("1") * steps
+            if inputs & InputRecording.TICK:
+                self.tick_count += steps
+        self.step_count = recording.step_count
+
+        self.final_state, self.final_hash = InputRecording.get_state(game)
+
+        return self.get_stats(recording)
+
+    def get_stats(self, recording: InputRecording):
+
+        elapsed = max(self.elapsed, 1e-9)
+
+        return {"steps": self.step_count,
+                "moves": self.move_count,
+                "ticks": self.tick_count,
+                "elapsed": self.elapsed,
+                "steps_per_second": self.step_count / elapsed,
+                "moves_per_second": self.move_count / elapsed,
+                "dirty_rects": self.game.get_dirty_rect_count() if self.game is not None else 0,
+                "matched": tuple(self.final_state) == tuple(recording.final_state) and
+                           self.final_hash == recording.final_hash,
+                "final_state": self.final_state,
+                "final_hash": self.final_hash,
+                "recorded_state": recording.final_state,
+                "recorded_hash": recording.final_hash}
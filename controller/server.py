@@ -0,0 +1,595 @@
+import asyncio
+import json
+import logging
+import random
+import struct
+import time
+
+import model as model
+import utils.profiler as profiler
+from .headless import HeadlessController
+
+
+class GameSession:
+    '''
+    A Game shared by a group of players along with the move that each of them is currently holding down
+    and the connection that their state gets sent to.
+    '''
+
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.game = model.Game("Zelda Quest {0}".format(session_id))
+        self.game.initialise()
+        self.game.start()
+
+        # The (dx, dy) move being held by each player and where to send each player's state
+        self.moves = {}
+        self.writers = {}
+
+        # The snapshots of each floor that deltas get made from and the (floor ID, sequence) of the
+        # latest snapshot that each player has acknowledged
+        self.snapshot_encoders = {}
+        self.acks = {}
+
+        # The [type, message] of each event that has happened to each player since they were last sent
+        self.player_events = {}
+        self.game.events.subscribe(self.add_events)
+
+    def __len__(self):
+        return len(self.game.players)
+
+    def add_player(self, player_name: str, writer):
+
+        new_player = self.game.create_player(player_name)
+        self.game.add_player(new_player)
+        self.moves[player_name] = (0, 0)
+        self.writers[player_name] = writer
+
+        return new_player
+
+    def remove_player(self, player_name: str):
+
+        self.game.remove_player(player_name)
+        del self.moves[player_name]
+        del self.writers[player_name]
+        self.acks.pop(player_name, None)
+        self.player_events.pop(player_name, None)
+
+    def add_events(self, events: list):
+        """Subscriber that keeps the events that happened to each player until they get sent to them"""
+
+        for event in events:
+            if event.player_name in self.writers.keys():
+                self.player_events.setdefault(event.player_name, []).append([event.type, event.get_text()])
+
+    def pop_player_events(self):
+
+        self.game.events.process()
+
+        player_events = self.player_events
+        self.player_events = {}
+
+        return player_events
+
+    def step(self, tick: bool):
+        """Move every player that is holding down a move and then tick the game if it is due a tick"""
+
+        for player_name, (dx, dy) in self.moves.items():
+            if dx != 0 or dy != 0:
+                self.game.select_player(player_name)
+                self.game.move_player(dx, dy)
+
+        if tick is True:
+            self.game.tick()
+
+    def get_floor_players(self):
+        """Get the names of the players on each floor that has any players on it as {floor id: [names]}"""
+
+        floor_players = {}
+        for player_name, floor_id in self.game.player_floor_ids.items():
+            floor_players.setdefault(floor_id, []).append(player_name)
+
+        return floor_players
+
+    def get_floor_state(self, floor_id: int):
+
+        floor = self.game.floor_factory.floors[floor_id]
+
+        return {"type": "state",
+                "tick": self.game.tick_count,
+                "floor": floor_id,
+                "players": {player.name: [player.rect.x, player.rect.y, player.HP]
+                            for player in floor.players.values()},
+                "monsters": [[monster.rect.x, monster.rect.y] for monster in floor.monsters]}
+
+    def get_snapshot(self, floor_id: int, sequence: int):
+        """Snapshot a floor and keep the snapshot for later deltas to be made from"""
+
+        snapshot = model.FloorSnapshot.capture(floor_id, self.game.floor_factory.floors[floor_id], sequence)
+
+        encoder = self.snapshot_encoders.setdefault(floor_id, model.SnapshotEncoder())
+        encoder.add(snapshot)
+
+        return snapshot
+
+    def encode_snapshot(self, snapshot: model.FloorSnapshot, player_name: str):
+        """Encode a snapshot as a delta from the latest snapshot of its floor that the player has acknowledged"""
+
+        ack_floor_id, ack_sequence = self.acks.get(player_name, (None, None))
+
+        return self.snapshot_encoders[snapshot.floor_id].encode(snapshot, ack_sequence if
+                                                                ack_floor_id == snapshot.floor_id else None)
+
+
+class GameServer:
+    '''
+    An authoritative server that hosts a number of Game sessions with several players in each. Clients
+    connect over TCP and send a command per line:-
+        JOIN <name> - join the first session with room for another player
+        FORMAT JSON|DELTA - get state as lines of JSON or as framed binary delta snapshots
+        ACK <floor> <sequence> - acknowledge a snapshot so that the next ones are sent as deltas from it
+        MOVE [UP|DOWN|LEFT|RIGHT ...] - hold down a move until the next MOVE, or stop with no directions
+        PING <token> - get a pong back once the next step of the simulation has been run
+        STATS - get the server's tick timings
+        QUIT - leave the game
+    The server steps every session at a fixed rate and sends each player the state of their floor
+    every BROADCAST_INTERVAL steps along with the events that have happened to them since the last one.
+    '''
+
+    HOST = "127.0.0.1"
+    PORT = 8765
+
+    # The model moves on in fixed steps at this rate with a game tick every TICK_INTERVAL milliseconds
+    SIMULATION_RATE = 75
+    TICK_INTERVAL = 250
+    BROADCAST_INTERVAL = 3
+
+    # If the server falls this many steps behind then give up on catching up
+    MAX_STEPS_BEHIND = 5
+
+    MAX_PLAYERS_PER_SESSION = 8
+
+    # Stop sending state to a client that has this many bytes waiting to go rather than let them pile up
+    MAX_WRITE_BUFFER = 256 * 1024
+
+    # Clients can have their state sent as lines of JSON or as binary delta snapshots. Once a client
+    # switches to deltas every message is sent as a frame of its size followed by a snapshot or a
+    # JSON_MESSAGE kind byte and a JSON message
+    JSON_FORMAT = "JSON"
+    DELTA_FORMAT = "DELTA"
+    FRAME_SIZE = struct.Struct("<I")
+    JSON_MESSAGE = b"\x00"
+
+    MOVES = HeadlessController.MOVES
+
+    def __init__(self, host: str = HOST, port: int = PORT, max_players_per_session: int = MAX_PLAYERS_PER_SESSION):
+        self.host = host
+        self.port = port
+        self.max_players_per_session = max_players_per_session
+        self.sessions = []
+        self.player_sessions = {}
+        self.server = None
+        self.next_session_id = 1
+
+        # The (writer, token) of each ping waiting for the next step to be run
+        self.pings = []
+
+        # The connections that get delta snapshots rather than JSON
+        self.delta_writers = set()
+
+        self.peak_players = 0
+        self.step_count = 0
+        self.late_steps = 0
+        self.dropped_steps = 0
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.bytes_sent = 0
+        self.step_timer = profiler.Timer("step", window=10000)
+        self.broadcast_timer = profiler.Timer("broadcast", window=10000)
+
+    async def start(self):
+
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+        logging.info("{0}: Listening on {1}:{2}".format(__class__, self.host, self.port))
+
+    async def run(self, duration: float = None):
+        """Run the simulation at a fixed rate for duration seconds or forever"""
+
+        if self.server is None:
+            await self.start()
+
+        loop = asyncio.get_running_loop()
+        step_time = 1.0 / GameServer.SIMULATION_RATE
+        steps_per_tick = max(1, round(GameServer.TICK_INTERVAL / 1000 * GameServer.SIMULATION_RATE))
+
+        start_time = loop.time()
+        next_step_time = start_time
+
+        while duration is None or loop.time() - start_time < duration:
+
+            step_start = time.perf_counter()
+            self.step(steps_per_tick)
+            self.step_timer.add(time.perf_counter() - step_start)
+
+            if self.step_count % GameServer.BROADCAST_INTERVAL == 0:
+                broadcast_start = time.perf_counter()
+                self.broadcast()
+                self.broadcast_timer.add(time.perf_counter() - broadcast_start)
+
+            self.send_pongs()
+
+            # Wait for the next step but if the server has fallen too far behind then start again from now
+            next_step_time += step_time
+            now = loop.time()
+            if now > next_step_time:
+                self.late_steps += 1
+                if now - next_step_time > step_time * GameServer.MAX_STEPS_BEHIND:
+                    self.dropped_steps += int((now - next_step_time) / step_time)
+                    next_step_time = now
+
+            await asyncio.sleep(max(0, next_step_time - now))
+
+    async def stop(self):
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    def step(self, steps_per_tick: int):
+
+        self.step_count += 1
+        tick = self.step_count % steps_per_tick == 0
+
+        for session in self.sessions:
+            try:
+                session.step(tick)
+            except Exception as err:
+                logging.exception("{0}: Session {1} failed to step - {2}".format(__class__, session.session_id, err))
+
+    def broadcast(self):
+        """Send each player the state of the floor that they are on"""
+
+        for session in self.sessions:
+
+            # Send each player what has happened to them since the last broadcast
+            for player_name, events in session.pop_player_events().items():
+                self.send_message(session.writers[player_name], {"type": "events", "events": events})
+
+            for floor_id, player_names in session.get_floor_players().items():
+
+                # Only get the state of the floor in each format that is needed and only encode each delta once
+                json_message = None
+                snapshot = None
+                frames = {}
+
+                for player_name in player_names:
+
+                    writer = session.writers[player_name]
+
+                    if writer in self.delta_writers:
+                        if snapshot is None:
+                            snapshot = session.get_snapshot(floor_id, self.step_count)
+                        message = session.encode_snapshot(snapshot, player_name)
+                        if message not in frames.keys():
+                            frames[message] = GameServer.FRAME_SIZE.pack(len(message)) + message
+                        self.send(writer, frames[message])
+
+                    else:
+                        if json_message is None:
+                            json_message = self.encode_message(session.get_floor_state(floor_id))
+                        self.send(writer, json_message)
+
+    def send(self, writer, message: bytes, drop: bool = True):
+        """Send a message to a client unless it isn't keeping up and the message can be dropped"""
+
+        if writer.is_closing() is True:
+            return
+
+        if drop is True and writer.transport.get_write_buffer_size() > GameServer.MAX_WRITE_BUFFER:
+            self.messages_dropped += 1
+            return
+
+        writer.write(message)
+        self.messages_sent += 1
+        self.bytes_sent += len(message)
+
+    def send_message(self, writer, message: dict):
+        self.send(writer, self.encode_message(message, writer in self.delta_writers), drop=False)
+
+    def encode_message(self, message: dict, framed: bool = False):
+
+        if framed is True:
+            encoded = GameServer.JSON_MESSAGE + json.dumps(message, separators=(",", ":")).encode()
+            return GameServer.FRAME_SIZE.pack(len(encoded)) + encoded
+
+        return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+    def send_pongs(self):
+
+        pings = self.pings
+        self.pings = []
+
+        for writer, token in pings:
+            self.send_message(writer, {"type": "pong", "token": token, "step": self.step_count})
+
+    def join(self, player_name: str, writer):
+        """Add a player to the first session with room for them or to a new session if they are all full"""
+
+        if player_name in self.player_sessions.keys():
+            raise Exception("Player {0} is already playing!".format(player_name))
+
+        for session in self.sessions:
+            if len(session) < self.max_players_per_session:
+                break
+        else:
+            session = GameSession(self.next_session_id)
+            self.next_session_id += 1
+            self.sessions.append(session)
+            logging.info("{0}: Started session {1}".format(__class__, session.session_id))
+
+        player = session.add_player(player_name, writer)
+        self.player_sessions[player_name] = session
+        self.peak_players = max(self.peak_players, len(self.player_sessions))
+
+        return session, player
+
+    def leave(self, player_name: str):
+
+        session = self.player_sessions.pop(player_name)
+        session.remove_player(player_name)
+
+        if len(session) == 0:
+            self.sessions.remove(session)
+            logging.info("{0}: Closed session {1}".format(__class__, session.session_id))
+
+    def get_move(self, words: list):
+        """Add up the moves for a list of directions"""
+
+        dx = 0
+        dy = 0
+        for word in words:
+            if word not in GameServer.MOVES.keys():
+                raise Exception("{0} is not a valid move".format(word))
+            dx += GameServer.MOVES[word][0]
+            dy += GameServer.MOVES[word][1]
+
+        return dx, dy
+
+    def get_stats(self):
+
+        return {"sessions": len(self.sessions),
+                "players": len(self.player_sessions),
+                "peak_players": self.peak_players,
+                "steps": self.step_count,
+                "late_steps": self.late_steps,
+                "dropped_steps": self.dropped_steps,
+                "messages_sent": self.messages_sent,
+                "messages_dropped": self.messages_dropped,
+                "bytes_sent": self.bytes_sent,
+                "dirty_rects": sum([session.game.get_dirty_rect_count() for session in self.sessions]),
+                "step": self.step_timer.get_summary(),
+                "broadcast": self.broadcast_timer.get_summary()}
+
+    async def handle_connection(self, reader, writer):
+
+        player_name = None
+
+        try:
+            while True:
+
+                line = await reader.readline()
+                if len(line) == 0:
+                    break
+
+                words = line.decode().upper().split()
+                if len(words) == 0:
+                    continue
+
+                command = words[0]
+
+                try:
+                    if command == "JOIN":
+                        if player_name is not None:
+                            raise Exception("You have already joined as {0}".format(player_name))
+                        if len(words) != 2:
+                            raise Exception("JOIN needs a player name")
+                        session, player = self.join(line.decode().split()[1], writer)
+                        player_name = player.name
+                        self.send_message(writer, {"type": "welcome", "player": player_name,
+                                                   "session": session.session_id,
+                                                   "floor": session.game.player_floor_ids[player_name]})
+
+                    elif command == "MOVE":
+                        if player_name is None:
+                            raise Exception("You need to JOIN first")
+                        self.player_sessions[player_name].moves[player_name] = self.get_move(words[1:])
+
+                    elif command == "FORMAT":
+                        if len(words) != 2 or words[1] not in (GameServer.JSON_FORMAT, GameServer.DELTA_FORMAT):
+                            raise Exception("FORMAT needs to be {0} or {1}".format(GameServer.JSON_FORMAT,
+                                                                                   GameServer.DELTA_FORMAT))
+                        if words[1] == GameServer.DELTA_FORMAT:
+                            self.delta_writers.add(writer)
+                        else:
+                            self.delta_writers.discard(writer)
+
+                    elif command == "ACK":
+                        if player_name is None:
+                            raise Exception("You need to JOIN first")
+                        if len(words) != 3:
+                            raise Exception("ACK needs a floor and a snapshot sequence")
+                        self.player_sessions[player_name].acks[player_name] = (int(words[1]), int(words[2]))
+
+                    elif command == "PING":
+                        self.pings.append((writer, words[1] if len(words) > 1 else ""))
+
+                    elif command == "STATS":
+                        self.send_message(writer, dict(type="stats", **self.get_stats()))
+
+                    elif command == "QUIT":
+                        break
+
+                    else:
+                        raise Exception("{0} is not a valid command".format(command))
+
+                except Exception as err:
+                    self.send_message(writer, {"type": "error", "message": str(err)})
+
+                await writer.drain()
+
+        except (ConnectionError, asyncio.IncompleteReadError) as err:
+            logging.info("{0}: Lost connection to {1} - {2}".format(__class__, player_name, err))
+
+        finally:
+            if player_name is not None:
+                self.leave(player_name)
+            self.delta_writers.discard(writer)
+            writer.close()
+
+
+class LoadTester:
+    '''
+    Opens a number of connections to a GameServer that each join the game and wander about at random
+    while pinging the server to see how long it takes for an input to make it through a step. The clients
+    can get their state as JSON or as delta snapshots that they decode and acknowledge.
+    '''
+
+    MOVE_INTERVAL = 0.1
+    PING_INTERVAL = 0.5
+    CONNECT_TIMEOUT = 10
+
+    def __init__(self, host: str = GameServer.HOST, port: int = GameServer.PORT, seed: int = 1,
+                 state_format: str = GameServer.JSON_FORMAT):
+        self.host = host
+        self.port = port
+        self.seed = seed
+        self.state_format = state_format
+        self.connected = 0
+        self.failed = 0
+        self.states_received = 0
+        self.bytes_received = 0
+        self.errors = []
+        self.latency_timer = profiler.Timer("latency", window=100000)
+        self.server_stats = None
+
+    async def run_client(self, client_id: int, duration: float):
+
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                    LoadTester.CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError) as err:
+            self.failed += 1
+            logging.warning("{0}: Client {1} failed to connect - {2}".format(__class__, client_id, err))
+            return
+
+        self.connected += 1
+
+        rnd = random.Random(self.seed * 100000 + client_id)
+        directions = sorted(GameServer.MOVES.keys())
+        pings = {}
+
+        async def send_inputs():
+            writer.write("FORMAT {0}\nJOIN bot{1}\n".format(self.state_format, client_id).encode())
+            next_ping = 0
+            ping_count = 0
+            while True:
+                writer.write("MOVE {0}\n".format(rnd.choice(directions)).encode())
+                now = time.perf_counter()
+                if now >= next_ping:
+                    ping_count += 1
+                    pings[str(ping_count)] = now
+                    writer.write("PING {0}\n".format(ping_count).encode())
+                    next_ping = now + LoadTester.PING_INTERVAL
+                await writer.drain()
+                await asyncio.sleep(LoadTester.MOVE_INTERVAL)
+
+        decoder = model.SnapshotDecoder()
+
+        async def read_messages():
+            while True:
+
+                if self.state_format == GameServer.DELTA_FORMAT:
+                    frame_size, = GameServer.FRAME_SIZE.unpack(await reader.readexactly(GameServer.FRAME_SIZE.size))
+                    frame = await reader.readexactly(frame_size)
+                    self.bytes_received += GameServer.FRAME_SIZE.size + frame_size
+
+                    if frame[:1] != GameServer.JSON_MESSAGE:
+                        snapshot = decoder.decode(frame)
+                        writer.write("ACK {0} {1}\n".format(snapshot.floor_id, snapshot.sequence).encode())
+                        self.states_received += 1
+                        continue
+
+                    message = json.loads(frame[1:])
+
+                else:
+                    line = await reader.readline()
+                    if len(line) == 0:
+                        break
+                    self.bytes_received += len(line)
+                    message = json.loads(line)
+
+                if message["type"] == "state":
+                    self.states_received += 1
+                elif message["type"] == "pong":
+                    self.latency_timer.add(time.perf_counter() - pings.pop(message["token"]))
+                elif message["type"] == "error":
+                    self.errors.append(message["message"])
+
+        sender = asyncio.ensure_future(send_inputs())
+        receiver = asyncio.ensure_future(read_messages())
+
+        try:
+            done, pending = await asyncio.wait([sender, receiver], timeout=duration,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None and not isinstance(task.exception(), asyncio.IncompleteReadError):
+                    self.errors.append(str(task.exception()))
+        finally:
+            sender.cancel()
+            receiver.cancel()
+            writer.close()
+
+    async def get_server_stats(self):
+
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(b"STATS\n")
+        await writer.drain()
+
+        message = json.loads(await reader.readline())
+        writer.close()
+
+        return message
+
+    async def run(self, clients: int, duration: float, ramp_up: float = 1.0):
+        """Connect clients spread over ramp_up seconds and keep them all playing for duration seconds"""
+
+        start = time.perf_counter()
+
+        tasks = []
+        for client_id in range(clients):
+            tasks.append(asyncio.ensure_future(self.run_client(client_id, duration)))
+            await asyncio.sleep(ramp_up / clients)
+
+        await asyncio.gather(*tasks)
+
+        self.elapsed = time.perf_counter() - start
+        self.server_stats = await self.get_server_stats()
+
+        return self.get_stats()
+
+    def get_stats(self):
+
+        elapsed = max(self.elapsed, 1e-9)
+
+        return {"clients": self.connected,
+                "failed": self.failed,
+                "elapsed": self.elapsed,
+                "states_received": self.states_received,
+                "states_per_second": self.states_received / elapsed,
+                "bytes_per_second": self.bytes_received / elapsed,
+                "errors": len(self.errors),
+                "latency": self.latency_timer.get_summary(),
+                "server": self.server_stats}
@@ -0,0 +1,93 @@
+import os
+
+# Nothing gets displayed but make sure that SDL never tries to open a real window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import model
+from controller import GameSession
+
+
+def new_session(player_names=("player1", "player2")):
+
+    session = GameSession(1)
+    for player_name in player_names:
+        session.add_player(player_name, None)
+
+    return session
+
+
+def test_players_join_and_leave():
+
+    session = new_session()
+    assert len(session) == 2
+    assert session.game.state == model.Game.PLAYING
+    assert session.get_floor_players() == {model.Game.START_FLOOR_ID: ["player1", "player2"]}
+
+    session.remove_player("player1")
+    assert len(session) == 1
+    assert list(session.moves.keys()) == ["player2"]
+    assert list(session.writers.keys()) == ["player2"]
+    assert session.get_floor_players() == {model.Game.START_FLOOR_ID: ["player2"]}
+
+
+def test_step_moves_the_players_holding_down_a_move():
+
+    session = new_session()
+    player1, player2 = session.game.players["player1"], session.game.players["player2"]
+    position1, position2 = player1.get_pos(), player2.get_pos()
+
+    session.moves["player1"] = (2, 0)
+    for step in range(5):
+        session.step(tick=step == 4)
+
+    assert player1.get_pos() == (position1[0] + 10, position1[1])
+    assert player2.get_pos() == position2
+    assert session.game.tick_count == 1
+
+    floor_state = session.get_floor_state(model.Game.START_FLOOR_ID)
+    assert floor_state["tick"] == 1
+    assert floor_state["players"]["player1"][:2] == list(player1.get_pos())
+    assert sorted(floor_state["players"].keys()) == ["player1", "player2"]
+
+
+def test_events_are_kept_for_each_player_until_they_are_sent():
+
+    session = new_session()
+
+    player_events = session.pop_player_events()
+    assert [event_type for event_type, text in player_events["player1"]] == [model.Event.PLAYER_ADDED]
+    assert player_events["player2"] == [[model.Event.PLAYER_ADDED, "player2 joined the game"]]
+    assert session.pop_player_events() == {}
+
+
+def test_snapshots_are_sent_as_deltas_once_acknowledged():
+
+    session = new_session()
+    floor_id = model.Game.START_FLOOR_ID
+    decoder = model.SnapshotDecoder()
+
+    first = session.get_snapshot(floor_id, 1)
+    assert decoder.decode(session.encode_snapshot(first, "player1")) == first
+    session.acks["player1"] = (floor_id, 1)
+
+    session.moves["player2"] = (0, 2)
+    for step in range(20):
+        session.step(tick=step % 19 == 0)
+
+    second = session.get_snapshot(floor_id, 2)
+    delta = session.encode_snapshot(second, "player1")
+    assert len(delta) < len(session.encode_snapshot(second, "player2"))
+    assert decoder.decode(delta) == second
+
+
+def test_sessions_leave_no_dirty_rects():
+
+    session = new_session()
+    session.moves["player1"] = (2, 2)
+    session.moves["player2"] = (-2, 0)
+
+    for step in range(2000):
+        session.step(tick=step % 19 == 0)
+
+    assert session.game.get_dirty_rect_count() == 0
@@ -4,4 +4,13 @@ from .model import Objects
 from .model import Player
 from .model import RPGObject
 from .model import Monster
+from .model import MonsterEngine
+from .model import PathFinder
+from .model import StaticTile
+from .model import FloorSnapshot
+from .model import SnapshotEncoder
+from .model import SnapshotDecoder
+from .model import Event
+from .model import EventQueue
 
+from .model import FloorObjectLoader
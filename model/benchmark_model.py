@@ -0,0 +1,638 @@
+import contextlib
+import copy
+import csv
+import json
+import logging
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import model
+import utils.trpg as trpg
+from model.model import FloorBuilder, FloorLayoutLoader, FloorObjectLoader, Game, LazyFloorMap, SnapshotDecoder, \
+    SnapshotEncoder
+
+DATA_FILES_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+TILE_WIDTH = 32
+TILE_DEPTH = 32
+
+
+def generate_floor(width: int, depth: int, seed: int = 1, density: float = 0.15, collision_backend: str = None):
+    '''
+    Build a Floor of width x depth tiles with a tiled floor on layer 0 and a walled room
+    on layer 1 where density of the inside tiles are scattered with random blocks, treasure and keys.
+    '''
+
+    rnd = random.Random(seed)
+
+    new_floor = model.Floor(seed, "Benchmark{0}x{1}".format(width, depth), (0, 0, 0, 0),
+                            collision_backend=collision_backend)
+    new_objects = []
+
+    for y in range(depth):
+        for x in range(width):
+            new_objects.append(model.RPGObject("tile1", (x * TILE_WIDTH, y * TILE_DEPTH, TILE_WIDTH, TILE_DEPTH),
+                                               layer=0, solid=False, interactable=False))
+
+            if x in (0, width - 1) or y in (0, depth - 1):
+                name, solid, interactable = "wall", True, False
+            else:
+                roll = rnd.random() / density
+                if roll < 10 / 15:
+                    name, solid, interactable = "wall block", True, False
+                elif roll < 13 / 15:
+                    name, solid, interactable = "treasure", True, True
+                elif roll < 1:
+                    name, solid, interactable = "key", True, True
+                else:
+                    continue
+
+            new_objects.append(model.RPGObject(name, (x * TILE_WIDTH, y * TILE_DEPTH, TILE_WIDTH, TILE_DEPTH),
+                                               layer=1, solid=solid, interactable=interactable))
+
+    new_floor.add_objects(new_objects)
+
+    return new_floor
+
+
+def generate_probes(floor: model.Floor, count: int, seed: int = 1):
+    '''Random player sized objects scattered across the floor to query with.'''
+
+    rnd = random.Random(seed)
+
+    probes = []
+    for i in range(count):
+        x = rnd.randint(floor.rect.left, floor.rect.right - TILE_WIDTH)
+        y = rnd.randint(floor.rect.top, floor.rect.bottom - TILE_DEPTH)
+        probes.append(model.Player("probe{0}".format(i), (x, y, 32, 16)))
+
+    return probes
+
+
+def linear_colliding_objects(floor: model.Floor, target: model.RPGObject):
+    return [object for object in floor.layers[target.layer] if object.is_colliding(target)]
+
+
+def linear_touching_objects(floor: model.Floor, target: model.RPGObject):
+    return [object for object in floor.layers[target.layer] if object.is_touching(target)]
+
+
+def time_queries(query, floor: model.Floor, probes: list):
+
+    start = time.perf_counter()
+    results = [query(floor, probe) for probe in probes]
+    elapsed = time.perf_counter() - start
+
+    return elapsed, results
+
+
+def benchmark_collision(sizes=(20, 50, 100, 200), probe_count: int = 2000):
+
+    print("{0:>10} {1:>8} {2:>14} {3:>14} {4:>14} {5:>14} {6:>14} {7:>14}".format(
+        "floor", "objects", "linear collide", "grid collide", "numpy collide", "linear touch", "grid touch",
+        "numpy touch"))
+
+    for size in sizes:
+        floor = generate_floor(size, size, collision_backend=model.Floor.PYTHON_COLLISIONS)
+        probes = generate_probes(floor, probe_count)
+
+        linear_collide, expected_colliding = time_queries(linear_colliding_objects, floor, probes)
+        grid_collide, colliding = time_queries(model.Floor.colliding_objects, floor, probes)
+        linear_touch, expected_touching = time_queries(linear_touching_objects, floor, probes)
+        grid_touch, touching = time_queries(model.Floor.touching_objects, floor, probes)
+
+        if colliding != expected_colliding or touching != expected_touching:
+            raise Exception("Spatial index results differ from the linear scan for {0}".format(floor.name))
+
+        # The NumPy backend is optional so only time it if NumPy is installed
+        if model.model.numpy is not None:
+            numpy_floor = generate_floor(size, size, collision_backend=model.Floor.NUMPY_COLLISIONS)
+            numpy_collide, colliding = time_queries(model.Floor.colliding_objects, numpy_floor, probes)
+            numpy_touch, touching = time_queries(model.Floor.touching_objects, numpy_floor, probes)
+
+            # Compare by position as the two floors have their own copies of the objects
+            if [[object.get_pos() for object in found] for found in colliding] != \
+                    [[object.get_pos() for object in found] for found in expected_colliding] or \
+                    [[object.get_pos() for object in found] for found in touching] != \
+                    [[object.get_pos() for object in found] for found in expected_touching]:
+                raise Exception("NumPy results differ from the linear scan for {0}".format(floor.name))
+
+            numpy_collide = "{0:>12.2f}us".format(numpy_collide / probe_count * 1e6)
+            numpy_touch = "{0:>12.2f}us".format(numpy_touch / probe_count * 1e6)
+        else:
+            numpy_collide = numpy_touch = "{0:>14}".format("-")
+
+        print("{0:>10} {1:>8} {2:>13.2f}us {3:>13.2f}us {4} {5:>13.2f}us {6:>13.2f}us {7}".format(
+            "{0}x{0}".format(size), floor.object_count,
+            linear_collide / probe_count * 1e6, grid_collide / probe_count * 1e6, numpy_collide,
+            linear_touch / probe_count * 1e6, grid_touch / probe_count * 1e6, numpy_touch))
+
+
+def generate_layout_file(file_name: str, scale: int):
+    '''
+    Write a copy of the default floor layouts with every floor scale times wider and deeper
+    i.e. with scale squared times as many tiles.
+    '''
+
+    with open(os.path.join(DATA_FILES_DIR, "default_floor_layouts.csv"), 'r') as layout_file:
+        reader = csv.DictReader(layout_file)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+
+    with open(file_name, 'w', newline='') as scaled_file:
+        writer = csv.DictWriter(scaled_file, fieldnames=fieldnames)
+        writer.writeheader()
+
+        i = 0
+        while i < len(rows):
+
+            # Find the rows that make up the current floor layer
+            j = i
+            while j < len(rows) and (rows[j]["ID"], rows[j]["Layer"]) == (rows[i]["ID"], rows[i]["Layer"]):
+                j += 1
+
+            for repeat in range(scale):
+                for row in rows[i:j]:
+                    scaled_row = dict(row)
+                    scaled_row["Layout"] = row["Layout"] * scale
+                    writer.writerow(scaled_row)
+
+            i = j
+
+
+def per_insert_add_objects(floor: model.Floor, new_objects: list):
+    '''The old way of building a floor, re-sorting the layer after every object.'''
+    for new_object in new_objects:
+        floor.add_object(new_object)
+
+
+def time_layout_load(file_name: str, per_insert: bool = False, flyweight: bool = False):
+
+    add_objects = model.Floor.add_objects
+    if per_insert is True:
+        model.Floor.add_objects = per_insert_add_objects
+
+    try:
+        start = time.perf_counter()
+        loader = FloorLayoutLoader(file_name, flyweight=flyweight)
+        loader.load()
+        elapsed = time.perf_counter() - start
+    finally:
+        model.Floor.add_objects = add_objects
+
+    object_count = sum([floor.object_count for floor in FloorLayoutLoader.floor_layouts.values()])
+    FloorLayoutLoader.floor_layouts.clear()
+
+    return elapsed, object_count
+
+
+def benchmark_loading(scales=(1, 3, 10), max_per_insert_scale: int = 3):
+
+    FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+    print("{0:>8} {1:>8} {2:>12} {3:>12}".format("scale", "objects", "per insert", "batched"))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for scale in scales:
+            file_name = os.path.join(temp_dir, "scaled_floor_layouts.csv")
+            generate_layout_file(file_name, scale)
+
+            batched, object_count = time_layout_load(file_name)
+            if scale <= max_per_insert_scale:
+                per_insert = "{0:>11.3f}s".format(time_layout_load(file_name, per_insert=True)[0])
+            else:
+                per_insert = "{0:>12}".format("-")
+
+            print("{0:>7}x {1:>8} {2} {3:>11.3f}s".format(scale * scale, object_count, per_insert, batched))
+
+
+def deepcopy_object_copy_by_code(object_code: str, x: int = 0, y: int = 0):
+    '''The old way of copying a floor object from the code cache.'''
+
+    new_object = copy.deepcopy(FloorObjectLoader.floor_objects[object_code])
+    new_object.rect.x = x
+    new_object.rect.y = y
+
+    return new_object
+
+
+def benchmark_cloning(tile_count: int = 10000, scales=(1, 3)):
+
+    FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+    codes = list(FloorObjectLoader.floor_objects.keys())
+    tiles = [(codes[i % len(codes)], (i % 20) * TILE_WIDTH, (i // 20) * TILE_DEPTH) for i in range(tile_count)]
+
+    start = time.perf_counter()
+    copies = [deepcopy_object_copy_by_code(*tile) for tile in tiles]
+    deepcopy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clones = [FloorObjectLoader.get_object_copy_by_code(*tile) for tile in tiles]
+    clone_time = time.perf_counter() - start
+
+    for original, clone in zip(copies, clones):
+        if original.get_prototype() != clone.get_prototype() or original.rect != clone.rect:
+            raise Exception("Clone of {0} does not match its deep copy".format(original.name))
+
+    print("{0:>8} {1:>12} {2:>12}".format("tiles", "deepcopy", "clone"))
+    print("{0:>8} {1:>11.2f}us {2:>11.2f}us".format(tile_count, deepcopy_time / tile_count * 1e6,
+                                                    clone_time / tile_count * 1e6))
+
+    print("{0:>8} {1:>8} {2:>12} {3:>12}".format("scale", "objects", "deepcopy", "clone"))
+
+    get_object_copy_by_code = FloorObjectLoader.get_object_copy_by_code
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for scale in scales:
+            file_name = os.path.join(temp_dir, "scaled_floor_layouts.csv")
+            generate_layout_file(file_name, scale)
+
+            FloorObjectLoader.get_object_copy_by_code = staticmethod(deepcopy_object_copy_by_code)
+            try:
+                deepcopy_load, object_count = time_layout_load(file_name)
+            finally:
+                FloorObjectLoader.get_object_copy_by_code = staticmethod(get_object_copy_by_code)
+
+            clone_load, object_count = time_layout_load(file_name)
+
+            print("{0:>7}x {1:>8} {2:>11.3f}s {3:>11.3f}s".format(scale * scale, object_count, deepcopy_load,
+                                                                  clone_load))
+
+
+def benchmark_memory(sizes=(20, 100, 200)):
+
+    print("{0:>10} {1:>8} {2:>14} {3:>14}".format("floor", "objects", "bytes/object", "total bytes"))
+
+    for size in sizes:
+        floor = generate_floor(size, size)
+        report = floor.memory_report()["total"]
+
+        print("{0:>10} {1:>8} {2:>14.1f} {3:>14}".format("{0}x{0}".format(size), report["objects"],
+                                                         report["bytes_per_object"], report["total_bytes"]))
+
+
+def benchmark_flyweight(scales=(1, 3, 10)):
+
+    FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+    print("{0:>8} {1:>8} {2:>12} {3:>12} {4:>14} {5:>14}".format("scale", "objects", "objects load",
+                                                                 "flyweight load", "objects bytes",
+                                                                 "flyweight bytes"))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for scale in scales:
+            file_name = os.path.join(temp_dir, "scaled_floor_layouts.csv")
+            generate_layout_file(file_name, scale)
+
+            results = []
+            for flyweight in (False, True):
+                start = time.perf_counter()
+                FloorLayoutLoader(file_name, flyweight=flyweight).load()
+                elapsed = time.perf_counter() - start
+
+                floors = FloorLayoutLoader.floor_layouts.values()
+                object_count = sum([floor.object_count for floor in floors])
+                total_bytes = sum([floor.memory_report()["total"]["total_bytes"] for floor in floors])
+                FloorLayoutLoader.floor_layouts.clear()
+
+                results.append((elapsed, total_bytes))
+
+            (objects_load, objects_bytes), (flyweight_load, flyweight_bytes) = results
+
+            print("{0:>7}x {1:>8} {2:>11.3f}s {3:>13.3f}s {4:>14} {5:>15}".format(scale * scale, object_count,
+                                                                                  objects_load, flyweight_load,
+                                                                                  objects_bytes, flyweight_bytes))
+
+
+def benchmark_lazy_loading(scales=(1, 3, 10), first_floor_id: int = 1):
+
+    FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+    print("{0:>8} {1:>12} {2:>12} {3:>12}".format("scale", "eager load", "lazy index", "first floor"))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for scale in scales:
+            file_name = os.path.join(temp_dir, "scaled_floor_layouts.csv")
+            generate_layout_file(file_name, scale)
+
+            eager_load = time_layout_load(file_name, flyweight=True)[0]
+
+            start = time.perf_counter()
+            floors = LazyFloorMap(FloorLayoutLoader(file_name, flyweight=True))
+            lazy_index = time.perf_counter() - start
+
+            start = time.perf_counter()
+            floors[first_floor_id]
+            first_floor = time.perf_counter() - start
+
+            print("{0:>7}x {1:>11.3f}s {2:>11.3f}s {3:>11.3f}s".format(scale * scale, eager_load, lazy_index,
+                                                                       first_floor))
+
+
+def time_startup(data_file_directory: str, use_cache: bool):
+
+    start = time.perf_counter()
+
+    floor_factory = FloorBuilder(data_file_directory, flyweight=True, use_cache=use_cache)
+    floor_factory.initialise()
+    floor_factory.load_floors()
+
+    maps = trpg.MapFactory()
+    maps.load("Benchmark", 1, os.path.join(data_file_directory, "maplinks.csv"),
+              cache_file_name=os.path.join(data_file_directory, "maplinks.cache") if use_cache else None)
+
+    return time.perf_counter() - start
+
+
+def benchmark_startup(scales=(1, 3, 10)):
+    '''
+    Compare starting up from the CSV data files with a cold start that compiles the data cache
+    and a warm start that loads straight from the existing cache.
+    '''
+
+    print("{0:>8} {1:>12} {2:>12} {3:>12}".format("scale", "csv only", "cold cache", "warm cache"))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+
+        data_file_directory = temp_dir + os.sep
+        for file_name in ("default_floor_objects.csv", "maplinks.csv"):
+            shutil.copy(os.path.join(DATA_FILES_DIR, file_name), data_file_directory)
+
+        for scale in scales:
+            generate_layout_file(data_file_directory + "default_floor_layouts.csv", scale)
+            for file_name in ("default_floors.cache", "maplinks.cache"):
+                if os.path.exists(data_file_directory + file_name):
+                    os.remove(data_file_directory + file_name)
+
+            csv_only = time_startup(data_file_directory, use_cache=False)
+            cold = time_startup(data_file_directory, use_cache=True)
+            warm = time_startup(data_file_directory, use_cache=True)
+
+            print("{0:>7}x {1:>11.3f}s {2:>11.3f}s {3:>11.3f}s".format(scale * scale, csv_only, cold, warm))
+
+
+def random_walk(rnd: random.Random, step: int = 2, max_hold: int = 40):
+    """An endless stream of (dx, dy) moves that holds a random direction (or nothing) for a random number of steps"""
+
+    moves = ((0, 0), (-step, 0), (step, 0), (0, -step), (0, step))
+
+    while True:
+        move = rnd.choice(moves)
+        for i in range(rnd.randint(1, max_hold)):
+            yield move
+
+
+def time_snapshots(step, get_floors, steps: int, interval: int = 3, ack_lag: int = 1):
+    '''
+    Run step() and every interval steps snapshot each of the floors from get_floors() and add up the bytes
+    needed to send them in full, as deltas from the snapshot ack_lag snapshots earlier and as JSON.
+    '''
+
+    encoders = {}
+    decoders = {}
+    snapshot_count = 0
+    full_bytes = 0
+    delta_bytes = 0
+    json_bytes = 0
+    encode_time = 0
+
+    for sequence in range(1, steps + 1):
+
+        step(sequence)
+
+        if sequence % interval != 0:
+            continue
+
+        for floor_id, floor in get_floors().items():
+
+            encoder = encoders.setdefault(floor_id, SnapshotEncoder())
+            decoder = decoders.setdefault(floor_id, SnapshotDecoder())
+
+            start = time.perf_counter()
+            snapshot = model.FloorSnapshot.capture(floor_id, floor, sequence)
+            encoder.add(snapshot)
+            delta = encoder.encode(snapshot, sequence - interval * ack_lag)
+            encode_time += time.perf_counter() - start
+
+            if decoder.decode(delta) != snapshot:
+                raise Exception("Snapshot {0} of floor {1} did not decode to what was encoded".format(sequence,
+                                                                                                     floor_id))
+
+            snapshot_count += 1
+            delta_bytes += len(delta)
+            full_bytes += len(encoder.encode(snapshot))
+            json_bytes += len(json.dumps({"players": snapshot.players, "monsters": snapshot.monsters,
+                                          "changes": snapshot.changes}, separators=(",", ":")))
+
+    snapshot_count = max(snapshot_count, 1)
+
+    return (snapshot_count, full_bytes / snapshot_count, delta_bytes / snapshot_count, json_bytes / snapshot_count,
+            encode_time / snapshot_count)
+
+
+def benchmark_snapshots(player_counts=(1, 8), monster_counts=(20, 80), steps: int = 3000, steps_per_tick: int = 19):
+    '''
+    Compare the size of full floor snapshots, delta snapshots and JSON for games with players wandering
+    about picking things up and for floors crowded with monsters.
+    '''
+
+    print("{0:>14} {1:>10} {2:>10} {3:>10} {4:>10} {5:>8} {6:>10}".format("floor", "snapshots", "json", "full",
+                                                                           "delta", "ratio", "encode"))
+
+    def print_result(name, result):
+        snapshot_count, full_size, delta_size, json_size, encode_time = result
+        print("{0:>14} {1:>10} {2:>9.0f}B {3:>9.0f}B {4:>9.0f}B {5:>7.1f}% {6:>8.1f}us".format(
+            name, snapshot_count, json_size, full_size, delta_size, delta_size / full_size * 100, encode_time * 1e6))
+
+    for player_count in player_counts:
+
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            game = model.Game("Benchmark")
+            game.initialise()
+            walks = {}
+            for i in range(player_count):
+                player = game.create_player("player{0}".format(i))
+                game.add_player(player)
+                walks[player.name] = random_walk(random.Random(i))
+
+            def game_step(sequence):
+                for player_name, walk in walks.items():
+                    dx, dy = next(walk)
+                    if dx != 0 or dy != 0:
+                        game.select_player(player_name)
+                        game.move_player(dx, dy)
+                if sequence % steps_per_tick == 0:
+                    game.tick()
+
+            def game_floors():
+                return {floor_id: game.floor_factory.floors[floor_id] for floor_id in
+                        set(game.player_floor_ids.values())}
+
+            result = time_snapshots(game_step, game_floors, steps)
+
+        print_result("{0} players".format(player_count), result)
+
+    for monster_count in monster_counts:
+
+        rnd = random.Random(monster_count)
+        floor = generate_floor(50, 50)
+        for i in range(monster_count):
+            floor.add_monster(model.Monster("monster{0}".format(i), (rnd.randint(TILE_WIDTH, floor.rect.width - 64),
+                                                                     rnd.randint(TILE_DEPTH, floor.rect.height - 64),
+                                                                     32, 16), height=32))
+
+        def monster_step(sequence):
+            if sequence % steps_per_tick == 0:
+                floor.monster_engine.tick(sequence // steps_per_tick)
+
+        result = time_snapshots(monster_step, lambda: {1: floor}, steps)
+
+        print_result("{0} monsters".format(monster_count), result)
+
+
+def generate_floor_copies_file(file_name: str, copies: int):
+    """Write a copy of the default floor layouts with copies times as many floors by repeating them with new IDs"""
+
+    with open(os.path.join(DATA_FILES_DIR, "default_floor_layouts.csv"), 'r') as layout_file:
+        reader = csv.DictReader(layout_file)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+
+    max_floor_id = max([int(row["ID"]) for row in rows])
+
+    with open(file_name, 'w', newline='') as copies_file:
+        writer = csv.DictWriter(copies_file, fieldnames=fieldnames)
+        writer.writeheader()
+        for copy_number in range(copies):
+            for row in rows:
+                copied_row = dict(row)
+                copied_row["ID"] = int(row["ID"]) + copy_number * max_floor_id
+                writer.writerow(copied_row)
+
+
+def play_game(game: model.Game, steps: int = 20000, changed_floors: int = 10, seed: int = 1):
+    """Wander a player around and pick up or open the first few things on a spread of floors"""
+
+    rnd = random.Random(seed)
+
+    player = game.create_player("player1")
+    game.add_player(player)
+
+    walk = random_walk(rnd)
+    for step in range(steps):
+        game.move_player(*next(walk))
+        if step % 19 == 0:
+            game.tick()
+
+    floor_ids = sorted(game.floor_factory.floors.keys())
+    for floor_id in rnd.sample(floor_ids, min(changed_floors, len(floor_ids))):
+        floor = game.floor_factory.floors[floor_id]
+        for object in [object for object in floor.layers.get(1, []) if object.is_interactable is True][:3]:
+            floor.remove_object(object)
+
+    game.current_map.lock(1, "NORTH", True)
+
+
+def time_save_and_load(data_file_directory: str, lazy: bool, use_cache: bool, save, load):
+
+    Game.DATA_FILES_DIR = data_file_directory
+    Game.LAZY_FLOORS = lazy
+    Game.USE_DATA_CACHE = use_cache
+
+    game = Game("Benchmark")
+    game.initialise()
+    play_game(game)
+    floor_count = len(game.floor_factory.floors)
+
+    start = time.perf_counter()
+    saved = save(game)
+    save_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    load(saved)
+    load_time = time.perf_counter() - start
+
+    return floor_count, len(saved), save_time, load_time
+
+
+def benchmark_saving(copies=(1, 10, 50)):
+    '''
+    Compare saving and loading a game by pickling the whole Game with all of its floors loaded with saving
+    just what has changed since the game was loaded and putting the changes back as floors get loaded.
+    '''
+
+    print("{0:>8} {1:>10} {2:>12} {3:>12} {4:>10} {5:>12} {6:>12} {7:>10}".format(
+        "floors", "pickle", "pickle save", "pickle load", "diff", "diff save", "diff load", "restore"))
+
+    settings = (Game.DATA_FILES_DIR, Game.LAZY_FLOORS, Game.USE_DATA_CACHE)
+
+    def pickle_save(game):
+        return pickle.dumps(game, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def diff_save(game):
+        game.save(save_file_name)
+        with open(save_file_name, 'rb') as save_file:
+            return save_file.read()
+
+    def diff_load(saved):
+        Game("Benchmark").load(save_file_name)
+
+    with tempfile.TemporaryDirectory() as temp_dir, contextlib.redirect_stdout(open(os.devnull, 'w')):
+
+        data_file_directory = temp_dir + os.sep
+        save_file_name = data_file_directory + "benchmark.sav"
+        for file_name in ("default_floor_objects.csv", "maplinks.csv"):
+            shutil.copy(os.path.join(DATA_FILES_DIR, file_name), data_file_directory)
+
+        try:
+            for copy_count in copies:
+                generate_floor_copies_file(data_file_directory + "default_floor_layouts.csv", copy_count)
+                for file_name in ("default_floors.cache", "maplinks.cache"):
+                    if os.path.exists(data_file_directory + file_name):
+                        os.remove(data_file_directory + file_name)
+
+                # A pickle needs every floor loaded and can't hold the memory mapped data cache
+                floor_count, pickle_size, pickle_save_time, pickle_load_time = time_save_and_load(
+                    data_file_directory, False, False, pickle_save, pickle.loads)
+
+                floor_count, diff_size, diff_save_time, diff_load_time = time_save_and_load(
+                    data_file_directory, True, True, diff_save, diff_load)
+
+                # How long does it take to put a floor's changes back when it is first loaded?
+                game = Game("Benchmark")
+                game.load(save_file_name)
+                floor_ids = list(game.saved_floor_changes.keys())
+                start = time.perf_counter()
+                for floor_id in floor_ids:
+                    game.floor_factory.floors[floor_id]
+                restore_time = (time.perf_counter() - start) / max(len(floor_ids), 1)
+
+                print("{0:>8} {1:>9}B {2:>10.2f}ms {3:>10.2f}ms {4:>9}B {5:>10.2f}ms {6:>10.2f}ms {7:>8.2f}ms".format(
+                    floor_count, pickle_size, pickle_save_time * 1000, pickle_load_time * 1000, diff_size,
+                    diff_save_time * 1000, diff_load_time * 1000, restore_time * 1000), file=sys.__stdout__)
+
+        finally:
+            Game.DATA_FILES_DIR, Game.LAZY_FLOORS, Game.USE_DATA_CACHE = settings
+
+
+def main():
+    benchmark_collision()
+    benchmark_loading()
+    benchmark_cloning()
+    benchmark_memory()
+    benchmark_flyweight()
+    benchmark_lazy_loading()
+    benchmark_startup()
+    benchmark_snapshots()
+    benchmark_saving()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARN)
+    main()
@@ -1,12 +1,29 @@
-import copy
+import array
+import collections
+import collections.abc
 import csv
+import hashlib
+import heapq
+import io
+import json
 import logging
+import mmap
 import os
+import random
+import struct
+import sys
+import threading
 
 import pygame
 
 import utils.trpg as trpg
 
+# NumPy is only needed for the vectorised collision backend
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class Objects:
     PLAYER = "player"
@@ -57,6 +74,11 @@ class RPGObject(object):
     TOUCH_FIELD_X = 3
     TOUCH_FIELD_Y = 3
 
+    # The number of fields in an RPGObject prototype record
+    PROTOTYPE_SIZE = 8
+
+    __slots__ = ("name", "_rect", "_old_rect", "layer", "height", "is_solid", "is_visible", "is_interactable")
+
     def __init__(self, name: str,
                  rect: pygame.Rect,
                  layer: int = 1,
@@ -68,17 +90,15 @@ class RPGObject(object):
         self._rect = pygame.Rect(rect)
 
         self.layer = layer
-        self._old_rect = self._rect.copy()
+
+        # Static objects never move so only get an old rect the first time that they do
+        self._old_rect = None
         if height is None:
             height = self._rect.height
         self.height = height
         self.is_solid = solid
         self.is_visible = visible
         self.is_interactable = interactable
-        self.dx = 0
-        self.dy = 0
-        self.d2x = 0
-        self.d2y = 0
 
     @property
     def rect(self):
@@ -90,6 +110,11 @@ class RPGObject(object):
         self._rect = new_rect
 
     def back(self):
+
+        # If the object has never moved then there is nowhere to go back to
+        if self._old_rect is None:
+            return
+
         logging.info("Moving Player {0} back from {1} to {2}".format(self.name, self._rect, self._old_rect))
         self._rect = self._old_rect.copy()
 
@@ -122,8 +147,49 @@ class RPGObject(object):
     def get_pos(self):
         return self._rect.x, self._rect.y
 
+    def get_prototype(self):
+        """Get a compact record of everything that is needed to build a copy of this object"""
+        return (self.name, self._rect.width, self._rect.height, self.layer, self.height,
+                self.is_solid, self.is_visible, self.is_interactable)
+
+    def set_prototype(self, prototype: tuple, x: int = 0, y: int = 0):
+
+        self.name, width, depth, self.layer, self.height, \
+        self.is_solid, self.is_visible, self.is_interactable = prototype[:RPGObject.PROTOTYPE_SIZE]
+
+        self._rect = pygame.Rect(x, y, width, depth)
+        self._old_rect = None
+
+    @classmethod
+    def from_prototype(cls, prototype: tuple, x: int = 0, y: int = 0):
+        """Build a new object at the specified position straight from a prototype record"""
+
+        new_object = cls.__new__(cls)
+        new_object.set_prototype(prototype, x, y)
+
+        return new_object
+
+    def clone(self):
+        x, y = self.get_pos()
+        return self.from_prototype(self.get_prototype(), x, y)
+
+    def get_size(self):
+        """Get the approximate number of bytes used by this object and the rects that it owns"""
+
+        size = sys.getsizeof(self) + sys.getsizeof(self._rect)
+
+        if self._old_rect is not None:
+            size += sys.getsizeof(self._old_rect)
+
+        if hasattr(self, "__dict__"):
+            size += sys.getsizeof(self.__dict__)
+
+        return size
+
 
 class Player(RPGObject):
+    __slots__ = ("treasure", "keys", "boss_keys", "HP")
+
     def __init__(self, name: str,
                  rect: pygame.Rect,
                  height: int = 40):
@@ -135,14 +201,406 @@ class Player(RPGObject):
         self.HP = 10
         self.layer = 1
 
+    def get_prototype(self):
+        return super(Player, self).get_prototype() + (self.treasure, self.keys, self.boss_keys, self.HP)
+
+    def set_prototype(self, prototype: tuple, x: int = 0, y: int = 0):
+        super(Player, self).set_prototype(prototype, x, y)
+        self.treasure, self.keys, self.boss_keys, self.HP = prototype[RPGObject.PROTOTYPE_SIZE:]
+
 
 class Monster(RPGObject):
+    __slots__ = ()
+
     def __init__(self, name: str,
                  rect: pygame.Rect,
                  height: int = 30):
         super(Monster, self).__init__(name=name, rect=rect, height=height)
 
 
+class SpatialIndex:
+    '''
+    A uniform grid of tile sized buckets used to quickly find the items that are near to a rect.
+    Each item is stored in every bucket that the rect it was added with overlaps so a query only
+    needs to visit the buckets that the query rect overlaps.
+    '''
+
+    def __init__(self, cell_width: int = 32, cell_height: int = 32):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.buckets = {}
+        self.item_cells = {}
+
+    def __len__(self):
+        return len(self.item_cells)
+
+    def cells(self, rect: pygame.Rect):
+
+        # Zero sized rects still occupy the cell that they sit in
+        left = rect.left // self.cell_width
+        right = max(rect.right - 1, rect.left) // self.cell_width
+        top = rect.top // self.cell_height
+        bottom = max(rect.bottom - 1, rect.top) // self.cell_height
+
+        return [(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)]
+
+    def add(self, item, rect: pygame.Rect):
+
+        if item in self.item_cells.keys():
+            self.remove(item)
+
+        cells = self.cells(rect)
+        for cell in cells:
+            bucket = self.buckets.get(cell)
+            if bucket is None:
+                bucket = []
+                self.buckets[cell] = bucket
+            bucket.append(item)
+
+        self.item_cells[item] = cells
+
+    def remove(self, item):
+
+        for cell in self.item_cells.pop(item, ()):
+            bucket = self.buckets[cell]
+            bucket.remove(item)
+            if len(bucket) == 0:
+                del self.buckets[cell]
+
+    def query(self, rect: pygame.Rect):
+
+        found = []
+        seen = set()
+
+        for cell in self.cells(rect):
+            for item in self.buckets.get(cell, ()):
+                if item not in seen:
+                    seen.add(item)
+                    found.append(item)
+
+        return found
+
+
+class ArrayIndex:
+    '''
+    A NumPy structure of arrays holding the rect, touch field, flags and layer of every object in a layer so that
+    collision and touch checks against all of them are done with a few vectorised comparisons rather than a loop.
+    The arrays are kept densely packed by moving the last object into the slot of any object that gets removed.
+    '''
+
+    INITIAL_CAPACITY = 64
+
+    ARRAYS = ("lefts", "tops", "rights", "bottoms", "touch_lefts", "touch_tops", "touch_rights", "touch_bottoms",
+              "layer_ids", "is_solid", "is_visible", "is_interactable")
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+
+        if numpy is None:
+            raise Exception("{0}: NumPy is needed for the {1} collision backend".format(__class__,
+                                                                                       Floor.NUMPY_COLLISIONS))
+
+        self.items = []
+        self.item_slots = {}
+
+        self.lefts = numpy.zeros(capacity, dtype=numpy.int32)
+        self.tops = numpy.zeros(capacity, dtype=numpy.int32)
+        self.rights = numpy.zeros(capacity, dtype=numpy.int32)
+        self.bottoms = numpy.zeros(capacity, dtype=numpy.int32)
+
+        self.touch_lefts = numpy.zeros(capacity, dtype=numpy.int32)
+        self.touch_tops = numpy.zeros(capacity, dtype=numpy.int32)
+        self.touch_rights = numpy.zeros(capacity, dtype=numpy.int32)
+        self.touch_bottoms = numpy.zeros(capacity, dtype=numpy.int32)
+
+        self.layer_ids = numpy.zeros(capacity, dtype=numpy.int32)
+        self.is_solid = numpy.zeros(capacity, dtype=bool)
+        self.is_visible = numpy.zeros(capacity, dtype=bool)
+        self.is_interactable = numpy.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item: RPGObject, touch_field: pygame.Rect):
+
+        if item in self.item_slots.keys():
+            self.remove(item)
+
+        slot = len(self.items)
+        if slot == len(self.lefts):
+            for name in ArrayIndex.ARRAYS:
+                values = getattr(self, name)
+                setattr(self, name, numpy.concatenate((values, numpy.zeros_like(values))))
+
+        self.items.append(item)
+        self.item_slots[item] = slot
+        self.set_slot(slot, item, touch_field)
+
+    def set_slot(self, slot: int, item: RPGObject, touch_field: pygame.Rect):
+
+        # Store empty rects as inside out spans so that they never collide with anything just like pygame.Rect
+        rect = item.rect
+        self.lefts[slot], self.rights[slot] = ArrayIndex.get_span(rect.x, rect.width, rect.height)
+        self.tops[slot], self.bottoms[slot] = ArrayIndex.get_span(rect.y, rect.height, rect.width)
+        self.touch_lefts[slot], self.touch_rights[slot] = ArrayIndex.get_span(touch_field.x, touch_field.width,
+                                                                             touch_field.height)
+        self.touch_tops[slot], self.touch_bottoms[slot] = ArrayIndex.get_span(touch_field.y, touch_field.height,
+                                                                             touch_field.width)
+
+        self.layer_ids[slot] = item.layer
+        self.is_solid[slot] = item.is_solid
+        self.is_visible[slot] = item.is_visible
+        self.is_interactable[slot] = item.is_interactable
+
+    EMPTY_SPAN = (2 ** 31 - 1, -2 ** 31)
+
+    @staticmethod
+    def get_span(start: int, size: int, other_size: int):
+        """Get the (low, high) span of a rect along one axis allowing for negative sizes"""
+
+        if size == 0 or other_size == 0:
+            return ArrayIndex.EMPTY_SPAN
+
+        return min(start, start + size), max(start, start + size)
+
+    def remove(self, item: RPGObject):
+
+        slot = self.item_slots.pop(item, None)
+        if slot is None:
+            return
+
+        # Fill the gap with the last item
+        last_item = self.items.pop()
+        last_slot = len(self.items)
+        if slot != last_slot:
+            self.items[slot] = last_item
+            self.item_slots[last_item] = slot
+            for name in ArrayIndex.ARRAYS:
+                values = getattr(self, name)
+                values[slot] = values[last_slot]
+
+    def overlapping(self, lefts, tops, rights, bottoms, rect: pygame.Rect):
+        """Get a mask of the spans that overlap the specified rect in the same way that pygame.Rect.colliderect does"""
+
+        count = len(self.items)
+
+        left, right = ArrayIndex.get_span(rect.x, rect.width, rect.height)
+        top, bottom = ArrayIndex.get_span(rect.y, rect.height, rect.width)
+
+        # An empty rect never overlaps anything
+        if (left, right) == ArrayIndex.EMPTY_SPAN:
+            return numpy.zeros(count, dtype=bool)
+
+        return (lefts[:count] < right) & (rights[:count] > left) & (tops[:count] < bottom) & (bottoms[:count] > top)
+
+    def get_items(self, mask, exclude=None):
+
+        items = [self.items[slot] for slot in numpy.flatnonzero(mask)]
+
+        if exclude is not None and exclude in self.item_slots.keys():
+            items.remove(exclude)
+
+        return items
+
+    def query(self, rect: pygame.Rect):
+        """Get the items whose touch field overlaps the specified rect treating an empty rect as a single point"""
+
+        rect = pygame.Rect(rect.x, rect.y, max(rect.width, 1), max(rect.height, 1))
+
+        return self.get_items(self.overlapping(self.touch_lefts, self.touch_tops, self.touch_rights,
+                                               self.touch_bottoms, rect))
+
+    def colliding(self, target: RPGObject):
+        """Get the items that RPGObject.is_colliding() would say were colliding with the target"""
+
+        mask = self.overlapping(self.lefts, self.tops, self.rights, self.bottoms, target.rect)
+        mask &= self.layer_ids[:len(self.items)] == target.layer
+
+        return self.get_items(mask, exclude=target)
+
+    def touching(self, target: RPGObject):
+        """Get the items that RPGObject.is_touching() would say were touching the target"""
+
+        count = len(self.items)
+
+        mask = self.overlapping(self.touch_lefts, self.touch_tops, self.touch_rights, self.touch_bottoms,
+                                target.rect)
+        mask &= (self.layer_ids[:count] == target.layer) & self.is_visible[:count] & self.is_interactable[:count]
+
+        return self.get_items(mask, exclude=target)
+
+    def solid_colliding(self, rect: pygame.Rect):
+        """Get a mask of the solid items that collide with the specified rect"""
+
+        return self.overlapping(self.lefts, self.tops, self.rights, self.bottoms, rect) & \
+               self.is_solid[:len(self.items)]
+
+
+# A lightweight read only view of a tile in a StaticLayer
+StaticTile = collections.namedtuple("StaticTile", "name rect layer height is_solid is_visible is_interactable")
+
+
+class StaticLayer:
+    '''
+    A compact store of the immutable scenery on one layer of a floor.
+    Each tile is just a (type id, x, y) entry in a set of arrays with everything else about it
+    shared from the object type prototype records in FloorObjectLoader.
+    Tiles are only turned into full RPGObjects when something needs to change them.
+    '''
+
+    REMOVED = -1
+
+    def __init__(self, layer: int, cell_width: int = 32, cell_height: int = 32):
+        self.layer = layer
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.type_ids = array.array('h')
+        self.xs = array.array('i')
+        self.ys = array.array('i')
+        self.count = 0
+
+        # A grid of cells each holding the entries whose rect overlaps it, stored as offsets into a flat array
+        self.grid_rect = None
+        self.grid_offsets = None
+        self.grid_entries = None
+
+    def __len__(self):
+        return self.count
+
+    def add(self, type_id: int, x: int, y: int):
+        self.type_ids.append(type_id)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.count += 1
+        self.grid_rect = None
+
+    def get_rect(self, entry: int):
+        object_class, prototype = FloorObjectLoader.object_types[self.type_ids[entry]]
+        return pygame.Rect(self.xs[entry], self.ys[entry], prototype[1], prototype[2])
+
+    def get_tile(self, entry: int):
+        object_class, prototype = FloorObjectLoader.object_types[self.type_ids[entry]]
+        name, width, depth, layer, height, solid, visible, interactable = prototype
+        return StaticTile(name, pygame.Rect(self.xs[entry], self.ys[entry], width, depth), self.layer, height,
+                          solid, visible, interactable)
+
+    def entries(self):
+        return [entry for entry in range(len(self.type_ids)) if self.type_ids[entry] != StaticLayer.REMOVED]
+
+    def tiles(self):
+        return [self.get_tile(entry) for entry in self.entries()]
+
+    def get_bounds(self):
+
+        rects = [self.get_rect(entry) for entry in self.entries()]
+        if len(rects) == 0:
+            return None
+
+        bounds = rects[0].unionall(rects[1:])
+
+        return bounds
+
+    def build_grid(self):
+
+        self.grid_rect = self.get_bounds()
+        if self.grid_rect is None:
+            self.grid_rect = pygame.Rect(0, 0, 0, 0)
+
+        columns, rows = self.grid_size()
+        cells = [[] for i in range(columns * rows)]
+
+        for entry in self.entries():
+            for cell in self.grid_cells(self.get_rect(entry)):
+                cells[cell].append(entry)
+
+        self.grid_offsets = array.array('i', [0])
+        self.grid_entries = array.array('i')
+        for cell in cells:
+            self.grid_entries.extend(cell)
+            self.grid_offsets.append(len(self.grid_entries))
+
+    def grid_size(self):
+        columns = (self.grid_rect.width + self.cell_width - 1) // self.cell_width
+        rows = (self.grid_rect.height + self.cell_height - 1) // self.cell_height
+        return columns, rows
+
+    def grid_cells(self, rect: pygame.Rect):
+
+        columns, rows = self.grid_size()
+
+        left = max((rect.left - self.grid_rect.left) // self.cell_width, 0)
+        right = min((max(rect.right - 1, rect.left) - self.grid_rect.left) // self.cell_width, columns - 1)
+        top = max((rect.top - self.grid_rect.top) // self.cell_height, 0)
+        bottom = min((max(rect.bottom - 1, rect.top) - self.grid_rect.top) // self.cell_height, rows - 1)
+
+        return [y * columns + x for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+    def query(self, rect: pygame.Rect):
+        """Get the entries whose rect collides with the specified rect"""
+
+        if self.grid_rect is None:
+            self.build_grid()
+
+        found = []
+        seen = set()
+
+        for cell in self.grid_cells(rect):
+            for i in range(self.grid_offsets[cell], self.grid_offsets[cell + 1]):
+                entry = self.grid_entries[i]
+                if entry not in seen and self.type_ids[entry] != StaticLayer.REMOVED:
+                    seen.add(entry)
+                    if self.get_rect(entry).colliderect(rect):
+                        found.append(entry)
+
+        return found
+
+    def is_solid_colliding(self, rect: pygame.Rect):
+
+        for entry in self.query(rect):
+            object_class, prototype = FloorObjectLoader.object_types[self.type_ids[entry]]
+            if prototype[5] is True:
+                return True
+
+        return False
+
+    def get_colliding_tiles(self, rect: pygame.Rect):
+        """Get the entries that collide with the specified rect as read only tiles"""
+
+        return [self.get_tile(entry) for entry in self.query(rect)]
+
+    def get_solid_rects(self, rect: pygame.Rect):
+        """Get the rects of the solid entries that collide with the specified rect"""
+
+        solid_rects = []
+
+        for entry in self.query(rect):
+            object_class, prototype = FloorObjectLoader.object_types[self.type_ids[entry]]
+            if prototype[5] is True:
+                solid_rects.append(self.get_rect(entry))
+
+        return solid_rects
+
+    def materialise(self, entry: int):
+        """Turn an entry into a full RPGObject and remove it from the layer"""
+
+        object_class, prototype = FloorObjectLoader.object_types[self.type_ids[entry]]
+        new_object = object_class.from_prototype(prototype, self.xs[entry], self.ys[entry])
+        new_object.layer = self.layer
+
+        self.type_ids[entry] = StaticLayer.REMOVED
+        self.count -= 1
+
+        return new_object
+
+    def get_size(self):
+
+        size = sys.getsizeof(self) + sys.getsizeof(self.type_ids) + sys.getsizeof(self.xs) + sys.getsizeof(self.ys)
+
+        if self.grid_offsets is not None:
+            size += sys.getsizeof(self.grid_offsets) + sys.getsizeof(self.grid_entries)
+
+        return size
+
+
 class Floor:
     EXIT_NORTH = "NORTH"
     EXIT_SOUTH = "SOUTH"
@@ -165,156 +623,937 @@ class Floor:
                          EXIT_UP: EXIT_DOWN,
                          EXIT_DOWN: EXIT_UP}
 
-    def __init__(self, id: int, name: str, rect: pygame.Rect, skin_name: str = "default"):
+    # How collisions are checked - looping over the nearby objects or vectorised over a whole layer with NumPy
+    PYTHON_COLLISIONS = "python"
+    NUMPY_COLLISIONS = "numpy"
+    COLLISION_BACKEND = PYTHON_COLLISIONS
+
+    # If this many regions have changed without the floor being drawn then just redraw the whole of each layer
+    MAX_DIRTY_RECTS = 256
+
+    def __init__(self, id: int, name: str, rect: pygame.Rect, skin_name: str = "default",
+                 collision_backend: str = None):
         self.id = id
         self.name = name
         self.skin_name = skin_name
         self.rect = pygame.Rect(rect)
+
+        if collision_backend is None:
+            collision_backend = Floor.COLLISION_BACKEND
+        if collision_backend not in (Floor.PYTHON_COLLISIONS, Floor.NUMPY_COLLISIONS):
+            raise Exception("{0}: {1} is not a valid collision backend".format(__class__, collision_backend))
+        self.collision_backend = collision_backend
         self.players = {}
         self.objects = []
         self.monsters = []
         self.layers = {}
         self.exits = {}
 
+        # A spatial index and a draw order lookup for each layer of objects
+        self.layer_indexes = {}
+        self.layer_positions = {}
+
+        # The flyweight scenery tiles for each layer
+        self.static_layers = {}
+
+        # Has anything happened to the floor since it was loaded?
+        self.modified = False
+
+        # The (layer, x, y, new object name or None if it was removed) of each object that has been removed
+        # or swapped since the floor was loaded in the order that it happened
+        self.changes = []
+
+        # The (layer, rect, actor) regions that have changed since the floor was last drawn where actor
+        # is True if only players or monsters changed and the scenery in the region is the same.
+        # They are only recorded while a view is drawing the floor as nothing else ever collects them
+        self.dirty_rects = []
+        self.viewed = False
+
+        # Finds paths around the solid objects for anything that walks around the floor
+        self.path_finder = PathFinder(self)
+
+        # Moves the monsters around each tick
+        self.monster_engine = MonsterEngine(self)
+
     def __str__(self):
         return "Floor {0}: rect={1}, objects={2}, monsters={3}".format(self.name, self.rect, self.object_count,
                                                                        len(self.monsters))
 
-    @property
-    def object_count(self):
-        count = 0
-        for layer in self.layers.values():
-            count += len(layer)
-        return count
+    @property
+    def object_count(self):
+        count = 0
+        for layer in self.layers.values():
+            count += len(layer)
+        for static_layer in self.static_layers.values():
+            count += len(static_layer)
+        return count
+
+    def memory_report(self):
+        """Get the approximate number of bytes used by the objects on each layer of the floor"""
+
+        report = {}
+
+        for layer_id, layer in self.layers.items():
+            object_bytes = sum([object.get_size() for object in layer])
+            object_count = len(layer)
+            total_bytes = object_bytes + sys.getsizeof(layer)
+
+            static_layer = self.static_layers.get(layer_id)
+            if static_layer is not None:
+                object_count += len(static_layer)
+                object_bytes += static_layer.get_size()
+                total_bytes += static_layer.get_size()
+
+            report[layer_id] = {"objects": object_count,
+                                "object_bytes": object_bytes,
+                                "bytes_per_object": object_bytes / object_count if object_count > 0 else 0,
+                                "total_bytes": total_bytes}
+
+        object_count = sum([layer["objects"] for layer in report.values()])
+        object_bytes = sum([layer["object_bytes"] for layer in report.values()])
+
+        report["total"] = {"objects": object_count,
+                           "object_bytes": object_bytes,
+                           "bytes_per_object": object_bytes / object_count if object_count > 0 else 0,
+                           "total_bytes": sum([layer["total_bytes"] for layer in report.values()])}
+
+        return report
+
+    def add_player(self, new_player: Player, position: str = None):
+
+        self.players[new_player.name] = new_player
+
+        if position in self.exits.keys():
+            exit_rect = self.exits[position].rect
+            player_rect = new_player.rect
+            x = exit_rect.centerx - int(player_rect.width / 2)
+            y = exit_rect.centery - int(player_rect.height / 2)
+
+            if position == Floor.EXIT_NORTH:
+                y = exit_rect.bottom + RPGObject.TOUCH_FIELD_Y + 1
+            elif position == Floor.EXIT_SOUTH:
+                y = exit_rect.top - new_player.rect.height - RPGObject.TOUCH_FIELD_Y - 1
+            elif position == Floor.EXIT_WEST:
+                x = exit_rect.right + RPGObject.TOUCH_FIELD_X + 1
+            elif position == Floor.EXIT_EAST:
+                x = exit_rect.left - new_player.rect.width - RPGObject.TOUCH_FIELD_X - 1
+        else:
+            x = (self.rect.width / 2)
+            y = (self.rect.height / 2)
+
+        logging.info("{0}: Adding player {1} at {2},{3}".format(self.name, new_player.name, x, y))
+        new_player.set_pos(x, y)
+        self.mark_dirty(new_player.layer, new_player.rect, actor=True)
+
+    def remove_player(self, player_name: str):
+
+        if player_name in self.players.keys():
+            player = self.players.pop(player_name)
+            self.mark_dirty(player.layer, player.rect, actor=True)
+
+    def add_object(self, new_object: RPGObject):
+
+        self.insert_object(new_object)
+        self.rect.union_ip(new_object.rect)
+        self.sort_layer(new_object.layer)
+        self.path_finder.invalidate()
+
+        logging.info("Added {0} at location ({1},{2})".format(new_object.name, new_object.rect.x, new_object.rect.y))
+
+    def add_objects(self, new_objects: list):
+        """Add a batch of objects only sorting each layer and growing the floor bounds once at the end"""
+
+        layers = set()
+
+        for new_object in new_objects:
+            self.insert_object(new_object)
+            layers.add(new_object.layer)
+
+        if len(new_objects) > 0:
+            self.rect.unionall_ip([new_object.rect for new_object in new_objects])
+
+        for layer in layers:
+            self.sort_layer(layer)
+
+        self.path_finder.invalidate()
+
+        logging.info("Added {0} objects to floor {1}".format(len(new_objects), self.name))
+
+    def add_static_tiles(self, layer: int, tiles: list):
+        """Add a batch of (type id, x, y) flyweight scenery tiles to a layer"""
+
+        self.add_layer(layer)
+
+        static_layer = self.static_layers.get(layer)
+        if static_layer is None:
+            static_layer = StaticLayer(layer, FloorLayoutLoader.DEFAULT_OBJECT_WIDTH,
+                                       FloorLayoutLoader.DEFAULT_OBJECT_DEPTH)
+            self.static_layers[layer] = static_layer
+
+        for type_id, x, y in tiles:
+            static_layer.add(type_id, x, y)
+
+        bounds = static_layer.get_bounds()
+        if bounds is not None:
+            self.rect.union_ip(bounds)
+
+        self.path_finder.invalidate()
+
+        logging.info("Added {0} static tiles to floor {1}".format(len(tiles), self.name))
+
+    def get_static_tiles(self, layer: int):
+        static_layer = self.static_layers.get(layer)
+        return [] if static_layer is None else static_layer.tiles()
+
+    def materialise_static_tiles(self, layer: int, rect: pygame.Rect):
+        """Turn any flyweight tiles that collide with the specified rect into full objects on the floor"""
+
+        static_layer = self.static_layers.get(layer)
+        if static_layer is None:
+            return
+
+        entries = static_layer.query(rect)
+        if len(entries) > 0:
+            for entry in entries:
+                self.insert_object(static_layer.materialise(entry))
+            self.sort_layer(layer)
+
+    def add_layer(self, layer: int):
+
+        if layer not in self.layers.keys():
+            self.layers[layer] = []
+            if self.collision_backend == Floor.NUMPY_COLLISIONS:
+                self.layer_indexes[layer] = ArrayIndex()
+            else:
+                self.layer_indexes[layer] = SpatialIndex(FloorLayoutLoader.DEFAULT_OBJECT_WIDTH,
+                                                         FloorLayoutLoader.DEFAULT_OBJECT_DEPTH)
+
+    def insert_object(self, new_object: RPGObject):
+
+        self.add_layer(new_object.layer)
+        self.layers[new_object.layer].append(new_object)
+        self.index_object(new_object)
+
+        if new_object.name in Objects.DIRECTIONS:
+            self.exits[Floor.OBJECT_TO_DIRECTION[new_object.name]] = new_object
+
+    def sort_layer(self, layer: int):
+
+        objects = self.layers[layer]
+        self.layers[layer] = sorted(objects, key=lambda obj: obj.layer * 1000 + obj.rect.y, reverse=False)
+        self.layer_positions.pop(layer, None)
+
+    def remove_object(self, object: RPGObject):
+        objects = self.layers[object.layer]
+        objects.remove(object)
+        self.unindex_object(object)
+        self.modified = True
+        self.changes.append((object.layer, object.rect.x, object.rect.y, None))
+        self.mark_dirty(object.layer, object.rect)
+        self.path_finder.update(object.layer, object.rect)
+
+    def get_object_at(self, layer: int, x: int, y: int):
+        """Get the object on a layer whose top left corner is at x, y or None if there isn't one"""
+
+        rect = pygame.Rect(x, y, 1, 1)
+        self.materialise_static_tiles(layer, rect)
+
+        for object in self.nearby_objects(layer, rect):
+            if object.rect.x == x and object.rect.y == y:
+                return object
+
+        return None
+
+    def swap_object(self, object: RPGObject, new_object_type: str):
+
+        objects = self.layers[object.layer]
+
+        x, y = object.get_pos()
+
+        swap_object = FloorObjectLoader.get_object_copy_by_name(new_object_type, x, y)
+        swap_object.layer = object.layer
+        objects.remove(object)
+        self.unindex_object(object)
+        objects.append(swap_object)
+        self.index_object(swap_object)
+        self.modified = True
+        self.changes.append((object.layer, x, y, new_object_type))
+        self.mark_dirty(object.layer, object.rect.union(swap_object.rect))
+        self.path_finder.update(object.layer, object.rect.union(swap_object.rect))
+
+    def index_object(self, object: RPGObject):
+
+        # Index the object by its touch field as that covers its rect as well
+        touch_field = object.rect.inflate(RPGObject.TOUCH_FIELD_X, RPGObject.TOUCH_FIELD_Y)
+        self.layer_indexes[object.layer].add(object, touch_field)
+        self.layer_positions.pop(object.layer, None)
+
+    def unindex_object(self, object: RPGObject):
+
+        self.layer_indexes[object.layer].remove(object)
+        self.layer_positions.pop(object.layer, None)
+
+    def nearby_objects(self, layer: int, rect: pygame.Rect):
+        """Get the objects in a layer whose touch field overlaps the specified rect in draw order"""
+
+        return self.sort_objects(layer, self.layer_indexes[layer].query(rect))
+
+    def sort_objects(self, layer: int, objects: list):
+        """Put a list of objects from a layer into draw order"""
+
+        if len(objects) > 1:
+            positions = self.layer_positions.get(layer)
+            if positions is None:
+                positions = {object: i for i, object in enumerate(self.layers[layer])}
+                self.layer_positions[layer] = positions
+            objects.sort(key=positions.__getitem__)
+
+        return objects
+
+    def add_monster(self, new_object: Monster):
+
+        self.monsters.append(new_object)
+        self.monster_engine.add_monster(new_object)
+        self.mark_dirty(new_object.layer, new_object.rect, actor=True)
+
+    def mark_dirty(self, layer: int, rect: pygame.Rect, actor: bool = False):
+        """Record that a region of a layer has changed and needs to be redrawn if a view is drawing the floor"""
+
+        if self.viewed is False:
+            return
+
+        self.dirty_rects.append((layer, pygame.Rect(rect), actor))
+
+        if len(self.dirty_rects) > Floor.MAX_DIRTY_RECTS:
+            self.coalesce_dirty_rects()
+
+    def coalesce_dirty_rects(self):
+        """Replace the changed regions with the whole of each layer that has changed"""
+
+        layers = {}
+        for layer, rect, actor in self.dirty_rects:
+            layers[layer] = layers.get(layer, True) and actor
+
+        self.dirty_rects = [(layer, self.rect.copy(), actor) for layer, actor in sorted(layers.items())]
+
+    def set_viewed(self, viewed: bool):
+        """Start or stop recording the regions that change for a view that is drawing the floor"""
+
+        self.viewed = viewed
+        self.dirty_rects = []
+
+    def pop_dirty_rects(self):
+        """Get the (layer, rect, actor) regions that have changed since the last call and start again"""
+
+        dirty_rects = self.dirty_rects
+        self.dirty_rects = []
+        return dirty_rects
+
+    def is_player_collide(self, target: RPGObject):
+
+        collide = False
+
+        for player in self.players.values():
+            if target.is_colliding(player):
+                collide = True
+                break
+
+        return collide
+
+    def colliding_objects(self, target: RPGObject):
+        """Get the objects and flyweight tiles that the target collides with, with any tiles read only"""
+
+        if self.collision_backend == Floor.NUMPY_COLLISIONS:
+            colliding = self.sort_objects(target.layer, self.layer_indexes[target.layer].colliding(target))
+
+        else:
+            objects = self.nearby_objects(target.layer, target.rect)
+
+            # print("colliding check {0} objects".format(len(objects)))
+
+            colliding = []
+
+            for object in objects:
+                if object.is_colliding(target):
+                    colliding.append(object)
+
+        # Only look at the flyweight tiles rather than turning them into objects that would then stay as objects
+        static_layer = self.static_layers.get(target.layer)
+        if static_layer is not None:
+            colliding.extend(static_layer.get_colliding_tiles(target.rect))
+
+        return colliding
+
+    def touching_objects(self, target: RPGObject):
+
+        if self.collision_backend == Floor.NUMPY_COLLISIONS:
+            return self.sort_objects(target.layer, self.layer_indexes[target.layer].touching(target))
+
+        objects = self.nearby_objects(target.layer, target.rect)
+
+        # print("touching check {0} objects".format(len(objects)))
+
+        touching = []
+
+        for object in objects:
+            if object.is_touching(target):
+                touching.append(object)
+
+        return touching
+
+    def move_player(self, name: str, dx: int = 0, dy: int = 0):
+
+        if name not in self.players.keys():
+            raise Exception("{0}:move_player() - Player {1} is not on floor (2).".format(__class__, name, self.name))
+
+        self.move_actor(self.players[name], dx, dy)
+
+    def move_actor(self, actor: RPGObject, dx: int = 0, dy: int = 0):
+        """Move a player or monster as far as it can go towards dx, dy and get how far it actually went"""
+
+        start_rect = actor.rect.copy()
+
+        # Slide along each axis in turn as far as the actor can go towards where it wants to be
+        if dx != 0:
+            dx = self.sweep(actor, dx, 0)
+            actor.move(dx, 0)
+
+        if dy != 0:
+            dy = self.sweep(actor, 0, dy)
+            actor.move(0, dy)
+
+        # Redraw where the actor was and where it is now
+        if actor.rect != start_rect:
+            self.mark_dirty(actor.layer, start_rect.union(actor.rect), actor=True)
+
+        return dx, dy
+
+    def sweep(self, target: RPGObject, dx: int = 0, dy: int = 0):
+        '''
+        Get how far the target can move along one axis, up to dx or dy, before it comes into contact
+        with something solid or the edge of the floor. Only the solid objects in the region swept by
+        the move are checked so a big move costs no more than a small one and can't pass through anything.
+        Solid objects that the target already overlaps don't stop it so that it can move out of them.
+        '''
+
+        rect = target.rect
+        solid_rects = self.solid_rects(target.layer, rect.union(rect.move(dx, dy)))
+
+        if dx > 0:
+            gaps = [self.rect.right - rect.right] + \
+                   [solid_rect.left - rect.right for solid_rect in solid_rects if solid_rect.left >= rect.right]
+        elif dx < 0:
+            gaps = [rect.left - self.rect.left] + \
+                   [rect.left - solid_rect.right for solid_rect in solid_rects if solid_rect.right <= rect.left]
+        elif dy > 0:
+            gaps = [self.rect.bottom - rect.bottom] + \
+                   [solid_rect.top - rect.bottom for solid_rect in solid_rects if solid_rect.top >= rect.bottom]
+        else:
+            gaps = [rect.top - self.rect.top] + \
+                   [rect.top - solid_rect.bottom for solid_rect in solid_rects if solid_rect.bottom <= rect.top]
+
+        distance = max(0, min([abs(dx + dy)] + gaps))
+
+        return distance if dx + dy > 0 else -distance
+
+    def solid_rects(self, layer: int, rect: pygame.Rect):
+        """Get the rects of the solid objects and tiles on a layer that collide with the specified rect"""
+
+        solid_rects = []
+
+        layer_index = self.layer_indexes.get(layer)
+        if layer_index is not None and self.collision_backend == Floor.NUMPY_COLLISIONS:
+            solid_rects.extend([object.rect for object in layer_index.get_items(layer_index.solid_colliding(rect))])
+        elif layer_index is not None:
+            for object in layer_index.query(rect):
+                if object.is_solid is True and object.rect.colliderect(rect):
+                    solid_rects.append(object.rect)
+
+        static_layer = self.static_layers.get(layer)
+        if static_layer is not None:
+            solid_rects.extend(static_layer.get_solid_rects(rect))
+
+        return solid_rects
+
+    def is_solid_colliding(self, target: RPGObject):
+
+        layer_index = self.layer_indexes[target.layer]
+
+        if self.collision_backend == Floor.NUMPY_COLLISIONS:
+            for object in layer_index.colliding(target):
+                if object.is_solid is True:
+                    return True
+        else:
+            for object in layer_index.query(target.rect):
+                if object.is_solid is True and object.is_colliding(target):
+                    return True
+
+        static_layer = self.static_layers.get(target.layer)
+
+        return static_layer is not None and static_layer.is_solid_colliding(target.rect)
+
+
+class PathFinder:
+    '''
+    A walkability grid of the tiles of one layer of a floor with A* paths and a flow field over it.
+    A tile is blocked if any solid object overlaps it. The grid is built the first time that it is needed after
+    anything is added to the floor and only the tiles under an object are looked at again when it is removed or
+    swapped e.g. when a door is opened. The flow field gives the next tile towards a target from every tile so
+    any number of monsters can share it and it is only worked out again when the target moves to another tile
+    or the grid changes.
+    '''
+
+    # The neighbouring tiles that can be moved to from a tile
+    NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+    UNREACHABLE = -1
+
+    def __init__(self, floor: Floor, layer: int = 1, cell_width: int = None, cell_height: int = None):
+        self.floor = floor
+        self.layer = layer
+        self.cell_width = cell_width if cell_width is not None else FloorLayoutLoader.DEFAULT_OBJECT_WIDTH
+        self.cell_height = cell_height if cell_height is not None else FloorLayoutLoader.DEFAULT_OBJECT_DEPTH
+
+        self.grid_rect = None
+        self.columns = 0
+        self.rows = 0
+        self.walkable = None
+
+        # Goes up every time the grid changes so cached flow fields know when they are out of date
+        self.version = 0
+
+        # The (target cell, version) that the flow field was worked out for and each cell's distance to the target
+        self.flow_key = None
+        self.flow_distances = None
+
+    def invalidate(self):
+        self.walkable = None
+
+    def build(self):
+        """Mark every tile that a solid object overlaps as blocked"""
+
+        self.grid_rect = self.floor.rect.copy()
+        self.columns = (self.grid_rect.width + self.cell_width - 1) // self.cell_width
+        self.rows = (self.grid_rect.height + self.cell_height - 1) // self.cell_height
+        self.walkable = bytearray(b"\x01" * (self.columns * self.rows))
+
+        for solid_rect in self.floor.solid_rects(self.layer, self.grid_rect):
+            for cell in self.get_cells(solid_rect):
+                self.walkable[cell] = 0
+
+        self.version += 1
+
+        logging.info("{0}: Built {1}x{2} grid for floor {3}".format(__class__, self.columns, self.rows,
+                                                                    self.floor.name))
+
+    def check_built(self):
+        if self.walkable is None:
+            self.build()
+
+    def update(self, layer: int, rect: pygame.Rect):
+        """Look again at the tiles under a rect where something has changed"""
+
+        if self.walkable is None or layer != self.layer:
+            return
+
+        for cell in self.get_cells(rect):
+            blocked = len(self.floor.solid_rects(self.layer, self.get_cell_rect(cell))) > 0
+            self.walkable[cell] = 0 if blocked else 1
+
+        self.version += 1
+
+    def get_cells(self, rect: pygame.Rect):
+        """Get the index of every tile in the grid that a rect overlaps"""
+
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+
+        left = max((rect.left - self.grid_rect.left) // self.cell_width, 0)
+        right = min((rect.right - 1 - self.grid_rect.left) // self.cell_width, self.columns - 1)
+        top = max((rect.top - self.grid_rect.top) // self.cell_height, 0)
+        bottom = min((rect.bottom - 1 - self.grid_rect.top) // self.cell_height, self.rows - 1)
+
+        return [row * self.columns + column for row in range(top, bottom + 1) for column in range(left, right + 1)]
+
+    def get_cell(self, x: int, y: int):
+        """Get the index of the tile that a point is in or None if it is off the grid"""
+
+        self.check_built()
+
+        column = (x - self.grid_rect.left) // self.cell_width
+        row = (y - self.grid_rect.top) // self.cell_height
+
+        if column < 0 or column >= self.columns or row < 0 or row >= self.rows:
+            return None
+
+        return row * self.columns + column
+
+    def get_cell_rect(self, cell: int):
+        row, column = divmod(cell, self.columns)
+        return pygame.Rect(self.grid_rect.left + column * self.cell_width, self.grid_rect.top + row * self.cell_height,
+                           self.cell_width, self.cell_height)
+
+    def get_cell_centre(self, cell: int):
+        return self.get_cell_rect(cell).center
+
+    def is_walkable(self, x: int, y: int):
+
+        cell = self.get_cell(x, y)
+
+        return cell is not None and self.walkable[cell] == 1
+
+    def get_neighbours(self, cell: int):
+        """Get the walkable tiles next to a tile"""
+
+        row, column = divmod(cell, self.columns)
+        neighbours = []
+
+        for dx, dy in PathFinder.NEIGHBOURS:
+            if 0 <= column + dx < self.columns and 0 <= row + dy < self.rows:
+                neighbour = cell + dy * self.columns + dx
+                if self.walkable[neighbour] == 1:
+                    neighbours.append(neighbour)
+
+        return neighbours
+
+    def find_path(self, start: tuple, goal: tuple):
+        '''
+        Get the centres of the tiles on the shortest path from the tile that the start point is in to the
+        tile that the goal point is in using A*, or None if there is no way through. The start tile isn't on
+        the path and doesn't have to be walkable so that something half in a blocked tile can still find its way.
+        '''
+
+        start_cell = self.get_cell(*start)
+        goal_cell = self.get_cell(*goal)
+
+        if start_cell is None or goal_cell is None or self.walkable[goal_cell] == 0:
+            return None
+
+        goal_row, goal_column = divmod(goal_cell, self.columns)
+
+        def heuristic(cell):
+            row, column = divmod(cell, self.columns)
+            return abs(row - goal_row) + abs(column - goal_column)
+
+        came_from = {start_cell: None}
+        costs = {start_cell: 0}
+        open_cells = [(heuristic(start_cell), 0, start_cell)]
+
+        while len(open_cells) > 0:
+
+            estimate, cost, cell = heapq.heappop(open_cells)
+
+            if cell == goal_cell:
+                path = []
+                while cell != start_cell:
+                    path.append(self.get_cell_centre(cell))
+                    cell = came_from[cell]
+                path.reverse()
+                return path
+
+            # Skip any out of date entries for cells that have since been reached more cheaply
+            if cost > costs[cell]:
+                continue
+
+            for neighbour in self.get_neighbours(cell):
+                new_cost = cost + 1
+                if new_cost < costs.get(neighbour, new_cost + 1):
+                    costs[neighbour] = new_cost
+                    came_from[neighbour] = cell
+                    heapq.heappush(open_cells, (new_cost + heuristic(neighbour), new_cost, neighbour))
+
+        return None
+
+    def get_flow_field(self, target: tuple):
+        '''
+        Get the number of steps from every tile to the tile that the target point is in, or UNREACHABLE,
+        only working them out again if the target has moved to another tile or the grid has changed.
+        The distances get worked out from scratch rather than repaired as moving the target by a tile changes
+        the distance to nearly every tile in an open room, so a repair has to visit them all anyway.
+        '''
+
+        target_cell = self.get_cell(*target)
+
+        if (target_cell, self.version) == self.flow_key:
+            return self.flow_distances
+
+        distances = array.array('i', [PathFinder.UNREACHABLE]) * (self.columns * self.rows)
+
+        # A breadth first search out from the target
+        if target_cell is not None:
+            distances[target_cell] = 0
+            frontier = collections.deque([target_cell])
+            while len(frontier) > 0:
+                cell = frontier.popleft()
+                for neighbour in self.get_neighbours(cell):
+                    if distances[neighbour] == PathFinder.UNREACHABLE:
+                        distances[neighbour] = distances[cell] + 1
+                        frontier.append(neighbour)
+
+        self.flow_key = (target_cell, self.version)
+        self.flow_distances = distances
+
+        return distances
+
+    def get_flow_step(self, position: tuple, target: tuple):
+        '''
+        Get the centre of the next tile to head for from a position to get to the target following the
+        flow field, the target itself if they are in the same tile or None if there is no way there.
+        '''
+
+        distances = self.get_flow_field(target)
+
+        cell = self.get_cell(*position)
+        if cell is None:
+            return None
+
+        if distances[cell] == 0:
+            return target
+
+        # Head for whichever walkable neighbour is closest to the target
+        best = None
+        for neighbour in self.get_neighbours(cell):
+            distance = distances[neighbour]
+            if distance != PathFinder.UNREACHABLE and (best is None or distance < distances[best]):
+                best = neighbour
+
+        if best is None:
+            return None
+
+        return self.get_cell_centre(best)
+
 
-    def add_player(self, new_player: Player, position: str = None):
+class MonsterEngine:
+    '''
+    Moves all of the monsters on a floor in one batch each tick. Monsters wander in a random direction that they
+    keep for a few ticks, or until they bump into something, unless a player is close enough for them to chase
+    in which case they all follow the floor's shared flow field towards the player.
+    The state that only the engine needs - each monster's heading, ticks until it picks a new one and the tick it was
+    last moved on - is kept in arrays in the same order as Floor.monsters. At most MAX_UPDATES_PER_TICK monsters
+    are moved each tick taking turns round robin so that a crowded floor can't blow the tick budget, and a monster
+    that misses a turn catches up with a longer move the next time as the swept movement can't go through anything.
+    '''
+
+    SPEED = 4
+    CHASE_DISTANCE = 160
+    MIN_HEADING_TICKS = 4
+    MAX_HEADING_TICKS = 16
+    MAX_UPDATES_PER_TICK = 100
+    MAX_CATCH_UP_TICKS = 8
+
+    # The headings that a wandering monster can pick from including standing still
+    HEADINGS = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+    def __init__(self, floor: Floor):
+        self.floor = floor
+
+        # Seed from the floor so that the monsters on a floor always do the same thing given the same inputs
+        self.rnd = random.Random(floor.id)
+
+        self.dxs = array.array('b')
+        self.dys = array.array('b')
+        self.heading_ticks = array.array('i')
+        self.last_ticks = array.array('i')
 
-        self.players[new_player.name] = new_player
+        self.tick_count = 0
+        self.next_monster = 0
 
-        if position in self.exits.keys():
-            exit_rect = self.exits[position].rect
-            player_rect = new_player.rect
-            x = exit_rect.centerx - int(player_rect.width / 2)
-            y = exit_rect.centery - int(player_rect.height / 2)
+    def __len__(self):
+        return len(self.dxs)
 
-            if position == Floor.EXIT_NORTH:
-                y = exit_rect.bottom + RPGObject.TOUCH_FIELD_Y + 1
-            elif position == Floor.EXIT_SOUTH:
-                y = exit_rect.top - new_player.rect.height - RPGObject.TOUCH_FIELD_Y - 1
-            elif position == Floor.EXIT_WEST:
-                x = exit_rect.right + RPGObject.TOUCH_FIELD_X + 1
-            elif position == Floor.EXIT_EAST:
-                x = exit_rect.left - new_player.rect.width - RPGObject.TOUCH_FIELD_X - 1
-        else:
-            x = (self.rect.width / 2)
-            y = (self.rect.height / 2)
+    def add_monster(self, new_monster: Monster):
 
-        print("Adding player at {0},{1}".format(x, y))
-        new_player.set_pos(x, y)
+        self.dxs.append(0)
+        self.dys.append(0)
+        self.heading_ticks.append(0)
+        self.last_ticks.append(self.tick_count)
 
-    def add_object(self, new_object: RPGObject):
+    def tick(self, tick_count: int, target: RPGObject = None):
+        """Move the monsters that are due a turn on to the specified tick chasing the target if they are close to it"""
 
-        if new_object.layer not in self.layers.keys():
-            self.layers[new_object.layer] = []
+        self.tick_count = tick_count
 
-        objects = self.layers[new_object.layer]
-        objects.append(new_object)
-        self.rect.union_ip(new_object.rect)
+        monsters = self.floor.monsters
+        count = len(monsters)
+        if count == 0:
+            return
 
-        self.layers[new_object.layer] = sorted(objects, key=lambda obj: obj.layer * 1000 + obj.rect.y, reverse=False)
+        updates = min(count, MonsterEngine.MAX_UPDATES_PER_TICK)
 
-        if new_object.name in Objects.DIRECTIONS:
-            self.exits[Floor.OBJECT_TO_DIRECTION[new_object.name]] = new_object
+        for j in range(updates):
+            i = (self.next_monster + j) % count
+            ticks = min(tick_count - self.last_ticks[i], MonsterEngine.MAX_CATCH_UP_TICKS)
+            self.last_ticks[i] = tick_count
+            if ticks > 0:
+                self.move_monster(i, monsters[i], ticks, target)
 
-        logging.info("Added {0} at location ({1},{2})".format(new_object.name, new_object.rect.x, new_object.rect.y))
+        self.next_monster = (self.next_monster + updates) % count
 
-    def remove_object(self, object: RPGObject):
-        objects = self.layers[object.layer]
-        objects.remove(object)
+    def move_monster(self, i: int, monster: Monster, ticks: int, target: RPGObject = None):
 
-    def swap_object(self, object: RPGObject, new_object_type: str):
+        distance = MonsterEngine.SPEED * ticks
 
-        objects = self.layers[object.layer]
+        if target is not None and abs(target.rect.centerx - monster.rect.centerx) < MonsterEngine.CHASE_DISTANCE and \
+                abs(target.rect.centery - monster.rect.centery) < MonsterEngine.CHASE_DISTANCE:
 
-        x, y = object.get_pos()
+            # Follow the flow field towards the target or head straight for it if there is no way round
+            x, y = self.floor.path_finder.get_flow_step(monster.rect.center, target.rect.center) or \
+                   target.rect.center
 
-        swap_object = FloorObjectLoader.get_object_copy_by_name(new_object_type)
-        swap_object.set_pos(x, y)
-        objects.remove(object)
-        objects.append(swap_object)
+            dx = max(-distance, min(distance, x - monster.rect.centerx))
+            dy = max(-distance, min(distance, y - monster.rect.centery))
+            self.heading_ticks[i] = 0
 
-    def add_monster(self, new_object: Monster):
+        else:
+            self.heading_ticks[i] -= ticks
+            if self.heading_ticks[i] <= 0:
+                self.dxs[i], self.dys[i] = self.rnd.choice(MonsterEngine.HEADINGS)
+                self.heading_ticks[i] = self.rnd.randint(MonsterEngine.MIN_HEADING_TICKS,
+                                                         MonsterEngine.MAX_HEADING_TICKS)
+            dx = self.dxs[i] * distance
+            dy = self.dys[i] * distance
+
+        if dx == 0 and dy == 0:
+            return
+
+        moved_dx, moved_dy = self.floor.move_actor(monster, dx, dy)
+
+        # Pick a new heading next time if the monster bumped into something
+        if (moved_dx, moved_dy) != (dx, dy):
+            self.heading_ticks[i] = 0
+
+    def touching(self, target: RPGObject):
+        """Get the monsters whose rect is inside the touch field of the target"""
+
+        touch_field = target.rect.inflate(RPGObject.TOUCH_FIELD_X, RPGObject.TOUCH_FIELD_Y)
+        monsters = self.floor.monsters
+
+        return [monsters[i] for i in touch_field.collidelistall([monster.rect for monster in monsters])]
+
+
+class Event:
+    '''
+    Something that happened in the game that other parts of the program might want to react to.
+    The text is a format string that only gets filled in with the args when a subscriber asks for it.
+    '''
+
+    __slots__ = ("type", "text", "args", "player_name", "floor_id", "tick")
+
+    # Pickups
+    TREASURE = "TREASURE"
+    KEY = "KEY"
+    BOSS_KEY = "BOSS_KEY"
+    CHEST_OPENED = "CHEST_OPENED"
+    CHEST_LOCKED = "CHEST_LOCKED"
+
+    # Doors and exits
+    DOOR_FOUND = "DOOR_FOUND"
+    DOOR_OPENED = "DOOR_OPENED"
+    DOOR_LOCKED = "DOOR_LOCKED"
+    EXIT = "EXIT"
+    EXIT_BLOCKED = "EXIT_BLOCKED"
+    PLAYER_ADDED = "PLAYER_ADDED"
+
+    # Damage
+    TRAP = "TRAP"
+    HIT = "HIT"
+
+    def __init__(self, type: str, text: str, args: tuple = (), player_name: str = None, floor_id: int = None,
+                 tick: int = 0):
+        self.type = type
+        self.text = text
+        self.args = args
+        self.player_name = player_name
+        self.floor_id = floor_id
+        self.tick = tick
 
-        self.monsters.append(new_object)
+    def __str__(self):
+        return self.get_text()
 
-    def is_player_collide(self, target: RPGObject):
+    def get_text(self):
+        return self.text.format(*self.args) if len(self.args) > 0 else self.text
 
-        collide = False
 
-        for player in self.players.values():
-            if target.is_colliding(player):
-                collide = True
-                break
+class EventQueue:
+    '''
+    Queues up the Events that the game publishes and hands them out in one batch per subscriber when process()
+    is called, which should be once per frame. A subscriber is a function that takes a list of events and
+    can ask for only some types of event. Nothing gets created or queued if there are no subscribers for
+    an event's type so publishing is almost free when nobody is listening.
+    '''
 
-        return collide
+    # Stop the queue from growing for ever if nothing is processing it
+    MAX_QUEUED_EVENTS = 1000
 
-    def colliding_objects(self, target: RPGObject):
+    def __init__(self):
+        self.queue = collections.deque(maxlen=EventQueue.MAX_QUEUED_EVENTS)
 
-        objects = self.layers[target.layer]
+        # (subscriber, event types or None for all of them)
+        self.subscribers = []
 
-        # print("colliding check {0} objects".format(len(objects)))
+        # The event types that someone is subscribed to or None if someone is subscribed to all of them
+        self.wanted_types = set()
 
-        colliding = []
+    def subscribe(self, subscriber, event_types=None):
 
-        for object in objects:
-            if object.is_colliding(target):
-                colliding.append(object)
+        self.subscribers.append((subscriber, None if event_types is None else frozenset(event_types)))
+        self.update_wanted_types()
 
-        return colliding
+    def unsubscribe(self, subscriber):
 
-    def touching_objects(self, target: RPGObject):
+        self.subscribers = [(existing, event_types) for existing, event_types in self.subscribers
+                            if existing != subscriber]
+        self.update_wanted_types()
 
-        objects = self.layers[target.layer]
+        if len(self.subscribers) == 0:
+            self.queue.clear()
 
-        # print("touching check {0} objects".format(len(objects)))
+    def update_wanted_types(self):
 
-        touching = []
+        self.wanted_types = set()
+        for subscriber, event_types in self.subscribers:
+            if event_types is None:
+                self.wanted_types = None
+                break
+            self.wanted_types |= event_types
 
-        for object in objects:
-            if object.is_touching(target):
-                touching.append(object)
+    def is_wanted(self, event_type: str):
 
-        return touching
+        return self.wanted_types is None or event_type in self.wanted_types
 
-    def move_player(self, name: str, dx: int = 0, dy: int = 0):
+    def publish(self, event_type: str, text: str, *args, player_name: str = None, floor_id: int = None,
+                tick: int = 0):
 
-        if name not in self.players.keys():
-            raise Exception("{0}:move_player() - Player {1} is not on floor (2).".format(__class__, name, self.name))
+        if self.wanted_types is not None and event_type not in self.wanted_types:
+            return
 
-        selected_player = self.players[name]
+        self.queue.append(Event(event_type, text, args, player_name, floor_id, tick))
 
-        objects = self.layers[selected_player.layer]
+    def process(self):
+        """Hand every queued event out to the subscribers that want it and empty the queue"""
 
-        if dx != 0:
-            selected_player.move(dx, 0)
+        if len(self.queue) == 0:
+            return
 
-            if self.rect.contains(selected_player.rect) == False:
-                selected_player.back()
-            else:
-                for object in objects:
-                    if object.is_solid is True and object.is_colliding(selected_player):
-                        selected_player.back()
-                        break
-        if dy != 0:
-            selected_player.move(0, dy)
+        events = list(self.queue)
+        self.queue.clear()
 
-            if self.rect.contains(selected_player.rect) == False:
-                selected_player.back()
+        for subscriber, event_types in self.subscribers:
+            if event_types is not None:
+                batch = [event for event in events if event.type in event_types]
+                if len(batch) == 0:
+                    continue
             else:
-                for object in objects:
-                    if object.is_solid is True and object.is_colliding(selected_player):
-                        selected_player.back()
-                        break
+                batch = events
+
+            subscriber(batch)
+
+    @staticmethod
+    def print_events(events: list):
+        """A subscriber that prints the text of each event to the console"""
+
+        for event in events:
+            print(event.get_text())
 
 
 class Game:
@@ -332,7 +1571,29 @@ class Game:
     MAX_STATUS_MESSAGES = 5
     STATUS_MESSAGE_LIFETIME = 16
 
-    DATA_FILES_DIR = os.path.dirname(__file__) + "\\data\\"
+    DATA_FILES_DIR = os.path.join(os.path.dirname(__file__), "data", "")
+
+    # Store the static scenery on each floor as flyweight tiles
+    FLYWEIGHT_FLOORS = True
+
+    # Only load floors when they are needed and keep at most this many unmodified floors loaded
+    LAZY_FLOORS = True
+    FLOOR_CACHE_SIZE = 4
+
+    # Load the data files from compiled caches that are rebuilt whenever the CSV files change
+    USE_DATA_CACHE = True
+
+    # Move the monsters on floors that the player isn't on every this many ticks or never if it is 0
+    OFFSCREEN_MONSTER_RATE = 8
+
+    # Start getting the floor through an exit ready once the player is this close to the exit
+    PREFETCH_DISTANCE = 96
+
+    # The floor that new players start on
+    START_FLOOR_ID = 1
+
+    # The version of the saved game format which only holds what has changed since the game was loaded
+    SAVE_VERSION = 1
 
     def __init__(self, name: str):
 
@@ -344,6 +1605,18 @@ class Game:
         self.current_player = None
         self.maps = None
 
+        # Every player in the game and the floor that each of them is on
+        self.players = {}
+        self.player_floor_ids = {}
+
+        # The changes from a saved game to floors that haven't been loaded yet and the (locked, hidden)
+        # state of each map link when the game was loaded
+        self.saved_floor_changes = {}
+        self.initial_link_states = {}
+
+        # The queue of things that have happened for the view, sounds and anything else to react to
+        self.events = EventQueue()
+
     def initialise(self):
 
         logging.info("Initialising {0}...".format(self.name))
@@ -352,17 +1625,45 @@ class Game:
         self.player = None
         self.tick_count = 0
 
-        self.floor_factory = FloorBuilder(Game.DATA_FILES_DIR)
+        # Let go of the floor data from any previous game before loading it all again
+        if self.floor_factory is not None:
+            self.floor_factory.close()
+
+        self.floor_factory = FloorBuilder(Game.DATA_FILES_DIR, flyweight=Game.FLYWEIGHT_FLOORS,
+                                          lazy=Game.LAZY_FLOORS, cache_size=Game.FLOOR_CACHE_SIZE,
+                                          use_cache=Game.USE_DATA_CACHE)
         self.floor_factory.initialise()
         self.floor_factory.load_floors()
 
-        self.current_floor_id = 1
+        self.current_floor_id = Game.START_FLOOR_ID
         self.current_player = None
+        self.players = {}
+        self.player_floor_ids = {}
+        self.saved_floor_changes = {}
 
         self.maps = trpg.MapFactory()
-        self.maps.load("ZeldaQuest", 1, Game.DATA_FILES_DIR + "maplinks.csv")
+        self.maps.load("ZeldaQuest", 1, Game.DATA_FILES_DIR + "maplinks.csv",
+                       cache_file_name=Game.DATA_FILES_DIR + "maplinks.cache" if Game.USE_DATA_CACHE else None)
         self.current_map = self.maps.get_map(1)
         self.current_map.print()
+        self.initial_link_states = self.current_map.get_link_states()
+
+        self.attach_floors()
+
+    def attach_floors(self):
+        """Have lazy floors ask this game how far away they are and for any saved changes when they get loaded"""
+
+        if self.floor_factory.lazy is True:
+            self.floor_factory.floors.distance = self.get_floor_distance
+            self.floor_factory.floors.restore = self.restore_floor
+
+    def start(self):
+        """Start playing a game that is ready, which is when the game starts getting ticked"""
+
+        if self._state != Game.READY:
+            raise Exception("Can't start {0} when it is {1}".format(self.name, self._state))
+
+        self._state = Game.PLAYING
 
     @property
     def state(self):
@@ -373,9 +1674,85 @@ class Game:
     def current_floor(self):
         return self.floor_factory.floors[self.current_floor_id]
 
+    def get_floor_distance(self, floor_id: int):
+        """How many links away from the current floor is the specified floor?"""
+
+        distances = self.current_map.get_distances(self.current_floor_id)
+
+        return distances.get(floor_id, len(self.floor_factory.floors))
+
     def tick(self):
         self.tick_count += 1
-        self.check_collision()
+
+        current_player = self.current_player
+        for player_name in self.players.keys():
+            self.select_player(player_name)
+            self.check_collision()
+        if current_player is not None:
+            self.select_player(current_player.name)
+
+        self.tick_monsters()
+
+    def get_approaching_floor_ids(self):
+        """Get the IDs of the floors through any open exits that the player is close enough to"""
+
+        floor_ids = []
+
+        if self.current_player is None:
+            return floor_ids
+
+        current_floor = self.current_floor
+        near_rect = self.current_player.rect.inflate(Game.PREFETCH_DISTANCE * 2, Game.PREFETCH_DISTANCE * 2)
+
+        for direction, exit_object in current_floor.exits.items():
+            if near_rect.colliderect(exit_object.rect):
+                link = self.current_map.get_link(self.current_floor_id, direction)
+                if link is not None and link.is_passable() is True:
+                    floor_ids.append(link.to_id)
+
+        return floor_ids
+
+    def get_dirty_rect_count(self):
+        """How many changed regions are waiting to be drawn across the loaded floors? Without a view it stays 0"""
+
+        return sum([len(floor.dirty_rects) for floor in self.get_loaded_floors().values()])
+
+    def get_loaded_floors(self):
+        """Get the floors that are currently loaded without loading any more"""
+
+        floors = self.floor_factory.floors
+
+        if isinstance(floors, LazyFloorMap):
+            return floors.loaded_floors()
+
+        return floors
+
+    def tick_monsters(self):
+
+        # Get the players on each floor that has any on it with the current player's floor always included
+        occupied_floors = {self.current_floor_id: []}
+        for player_name, player in self.players.items():
+            occupied_floors.setdefault(self.player_floor_ids[player_name], []).append(player)
+
+        # The monsters on each floor with players on it chase the first player to have got there
+        for floor_id, players in occupied_floors.items():
+            floor = self.floor_factory.floors[floor_id]
+            floor.monster_engine.tick(self.tick_count, players[0] if len(players) > 0 else None)
+
+        # Move the monsters on the other floors on less often in bigger steps
+        if Game.OFFSCREEN_MONSTER_RATE > 0 and self.tick_count % Game.OFFSCREEN_MONSTER_RATE == 0:
+            for floor_id, floor in self.get_loaded_floors().items():
+                if floor_id not in occupied_floors.keys():
+                    floor.monster_engine.tick(self.tick_count)
+
+        if self.tick_count % Game.ENEMY_DAMAGE_RATE == 0:
+            for floor_id, players in occupied_floors.items():
+                floor = self.floor_factory.floors[floor_id]
+                for player in players:
+                    for monster in floor.monster_engine.touching(player):
+                        player.HP -= 1
+                        self.events.publish(Event.HIT, "You were hit by {0}!", monster.name, player_name=player.name,
+                                            floor_id=floor_id, tick=self.tick_count)
 
     def create_player(self, new_player_name: str):
 
@@ -385,9 +1762,37 @@ class Game:
 
         return new_player
 
-    def add_player(self, new_player: Player):
-        self.current_player = new_player
+    def add_player(self, new_player: Player, floor_id: int = START_FLOOR_ID):
+
+        if new_player.name in self.players.keys():
+            raise Exception("Player {0} is already in the game!".format(new_player.name))
+
+        self.players[new_player.name] = new_player
+        self.player_floor_ids[new_player.name] = floor_id
+        self.select_player(new_player.name)
         self.current_floor.add_player(new_player)
+        self.publish(Event.PLAYER_ADDED, "{0} joined the game", new_player.name)
+
+    def select_player(self, player_name: str):
+        """Make one of the players the current player so that moves, exits and collisions apply to them"""
+
+        if player_name not in self.players.keys():
+            raise Exception("Player {0} is not in the game!".format(player_name))
+
+        self.current_player = self.players[player_name]
+        self.current_floor_id = self.player_floor_ids[player_name]
+
+    def remove_player(self, player_name: str):
+
+        if player_name not in self.players.keys():
+            raise Exception("Player {0} is not in the game!".format(player_name))
+
+        player = self.players.pop(player_name)
+        floor_id = self.player_floor_ids.pop(player_name)
+        self.floor_factory.floors[floor_id].remove_player(player_name)
+
+        if player is self.current_player:
+            self.current_player = None
 
     def move_player(self, dx: int, dy: int):
 
@@ -404,44 +1809,44 @@ class Game:
                 try:
                     self.check_exit(direction)
                 except Exception as e:
-                    print(str(e))
+                    self.publish(Event.EXIT_BLOCKED, "{0}", e)
 
             elif object.name == Objects.TREASURE:
                 self.current_player.treasure += 1
                 self.current_floor.remove_object(object)
-                print("You found some treasure!")
+                self.publish(Event.TREASURE, "You found some treasure!")
 
             elif object.name == Objects.TREASURE_CHEST:
                 if self.current_player.keys > 0:
                     self.current_player.keys -= 1
                     self.current_floor.remove_object(object)
-                    print("You opened the chest!")
+                    self.publish(Event.CHEST_OPENED, "You opened the chest!")
                 else:
-                    print("You don't have a key.")
+                    self.publish(Event.CHEST_LOCKED, "You don't have a key.")
 
             elif object.name == Objects.KEY:
                 self.current_player.keys += 1
                 self.current_floor.remove_object(object)
-                print("You found a key!")
+                self.publish(Event.KEY, "You found a key!")
 
             elif object.name == Objects.BOSS_KEY:
                 self.current_player.boss_keys += 1
                 self.current_floor.remove_object(object)
-                print("You found a boss key!")
+                self.publish(Event.BOSS_KEY, "You found a boss key!")
 
             elif object.name == Objects.TRAP:
                 self.current_player.HP -= 1
                 self.current_floor.remove_object(object)
-                print("You stepped on a trap")
+                self.publish(Event.TRAP, "You stepped on a trap")
 
             elif object.name in Objects.DOORS:
-                print("You found a door!")
+                self.publish(Event.DOOR_FOUND, "You found a door!")
                 if self.current_player.keys > 0:
                     self.current_player.keys -= 1
                     self.current_floor.swap_object(object, Objects.DOOR_OPEN)
-                    print("You opened the door with a key!")
+                    self.publish(Event.DOOR_OPENED, "You opened the door with a key!")
                 else:
-                    print("The door is locked!")
+                    self.publish(Event.DOOR_LOCKED, "The door is locked!")
 
                     # dt2 = datetime.now()
                     # print("move={0}".format(dt2.microsecond - dt1.microsecond))
@@ -458,27 +1863,149 @@ class Game:
             raise (Exception("Direction %s is not valid" % direction.title()))
 
         # Now see if the map allows you to go in that direction
-        links = self.current_map.get_location_links_map(self.current_floor_id)
+        link = self.current_map.get_link(self.current_floor_id, direction)
 
         # OK stat direction is valid...
-        if direction in links.keys():
-            link = links[direction]
+        if link is not None:
 
             # ..but see if it is currently locked...
             if link.is_locked() is True:
                 raise (Exception("You can't go %s - %s" % (direction.title(), link.locked_description)))
 
             # If all good move to the new location
-            print("You go %s %s..." % (direction.title(), link.description))
-
-            # self.add_status_message("You go {0} {1}...".format(direction.title(), link.description))
+            self.publish(Event.EXIT, "You go {0} {1}...", direction.title(), link.description)
 
+            self.current_floor.remove_player(self.current_player.name)
             self.current_floor_id = link.to_id
+            self.player_floor_ids[self.current_player.name] = self.current_floor_id
             self.current_floor.add_player(self.current_player, Floor.REVERSE_DIRECTION[direction])
 
         else:
             raise (Exception("You can't go {0} from here!".format(direction)))
 
+    def get_state_hash(self):
+        """Get a hash of the players, the changes to each floor and where the monsters are on the loaded floors"""
+
+        state_hash = hashlib.sha1()
+
+        state_hash.update(repr((self.tick_count, sorted([(player_name, self.player_floor_ids[player_name],
+                                                          player.get_pos(), player.treasure, player.keys,
+                                                          player.boss_keys, player.HP)
+                                                         for player_name, player in self.players.items()]))).encode())
+
+        for floor_id, floor in sorted(self.get_loaded_floors().items()):
+            state_hash.update(repr((floor_id, floor.changes,
+                                    [(monster.rect.x, monster.rect.y) for monster in floor.monsters])).encode())
+
+        return state_hash.hexdigest()
+
+    def get_saved_state(self):
+        """Get everything about the game that has changed since it was loaded"""
+
+        # Any floors that haven't been loaded since the game was restored still have their saved changes
+        floor_changes = dict(self.saved_floor_changes)
+        for floor_id, floor in self.get_loaded_floors().items():
+            if len(floor.changes) > 0:
+                floor_changes[floor_id] = floor.changes
+
+        link_states = [[location_id, direction, locked, hidden] for (location_id, direction), (locked, hidden) in
+                       self.current_map.get_link_states().items()
+                       if self.initial_link_states.get((location_id, direction)) != (locked, hidden)]
+
+        players = {player_name: {"floor": self.player_floor_ids[player_name],
+                                 "position": list(player.get_pos()),
+                                 "treasure": player.treasure,
+                                 "keys": player.keys,
+                                 "boss_keys": player.boss_keys,
+                                 "HP": player.HP} for player_name, player in self.players.items()}
+
+        return {"version": Game.SAVE_VERSION,
+                "tick_count": self.tick_count,
+                "current_player": None if self.current_player is None else self.current_player.name,
+                "players": players,
+                "floors": {str(floor_id): [list(change) for change in changes]
+                           for floor_id, changes in floor_changes.items()},
+                "links": link_states}
+
+    def set_saved_state(self, saved_state: dict):
+        """Put a freshly loaded game into a saved state"""
+
+        if saved_state.get("version") != Game.SAVE_VERSION:
+            raise Exception("Saved game version {0} is not supported".format(saved_state.get("version")))
+
+        self.tick_count = saved_state["tick_count"]
+
+        # Floors only get their saved changes put back when they are loaded...
+        self.saved_floor_changes = {int(floor_id): [tuple(change) for change in changes]
+                                    for floor_id, changes in saved_state["floors"].items()}
+
+        # ...unless they have all been loaded already
+        if self.floor_factory.lazy is False:
+            for floor_id, floor in self.floor_factory.floors.items():
+                self.restore_floor(floor_id, floor)
+
+        for location_id, direction, locked, hidden in saved_state["links"]:
+            self.current_map.lock(location_id, direction, locked)
+            self.current_map.hide(location_id, direction, hidden)
+
+        for player_name, player_state in saved_state["players"].items():
+            player = self.create_player(player_name)
+            self.add_player(player, player_state["floor"])
+            player.set_pos(*player_state["position"])
+            player.treasure = player_state["treasure"]
+            player.keys = player_state["keys"]
+            player.boss_keys = player_state["boss_keys"]
+            player.HP = player_state["HP"]
+
+        if saved_state["current_player"] is not None:
+            self.select_player(saved_state["current_player"])
+
+    def restore_floor(self, floor_id: int, floor: Floor):
+        """Put back any saved changes to a floor that has just been loaded"""
+
+        for layer, x, y, new_object_type in self.saved_floor_changes.pop(floor_id, []):
+            changed_object = floor.get_object_at(layer, x, y)
+            if changed_object is None:
+                logging.warning("{0}: No object at ({1},{2}) on layer {3} of floor {4} to change".format(
+                    __class__, x, y, layer, floor_id))
+            elif new_object_type is None:
+                floor.remove_object(changed_object)
+            else:
+                floor.swap_object(changed_object, new_object_type)
+
+    def save(self, file_name: str):
+
+        # Write to a temporary file first so that a failed save doesn't lose the last one
+        temp_file_name = file_name + ".tmp"
+        with open(temp_file_name, 'w') as save_file:
+            json.dump(self.get_saved_state(), save_file, separators=(",", ":"))
+        os.replace(temp_file_name, file_name)
+
+        logging.info("{0}: Saved game to {1}".format(__class__, file_name))
+
+    def load(self, file_name: str):
+        '''
+        Start the game again from its data files and then put it into the state saved in a file. The saved state
+        is put into a new game first and only swapped in once that has worked so a bad save leaves this game alone.
+        '''
+
+        with open(file_name, 'r') as save_file:
+            saved_state = json.load(save_file)
+
+        loaded_game = Game(self.name)
+        loaded_game.initialise()
+        loaded_game.set_saved_state(saved_state)
+
+        # Take over everything from the loaded game apart from the event queue, which has the subscribers on it
+        if self.floor_factory is not None:
+            self.floor_factory.close()
+        events = self.events
+        vars(self).update(vars(loaded_game))
+        self.events = events
+        self.attach_floors()
+
+        logging.info("{0}: Loaded game from {1}".format(__class__, file_name))
+
     def check_collision(self):
 
         colliding_objects = self.current_floor.colliding_objects(self.current_player)
@@ -487,34 +2014,105 @@ class Game:
             # print("{0} is colliding with {1}".format(self.current_player.name, object.name))
             if object.name == Objects.TRAP and self.tick_count % Game.DOT_DAMAGE_RATE == 0:
                 self.current_player.HP -= 1
-                print("You stepped on a trap!")
+                self.publish(Event.TRAP, "You stepped on a trap!")
+
+    def publish(self, event_type: str, text: str, *args):
+        """Queue up an event that happened to the current player if anyone is subscribed to that type of event"""
+
+        if self.events.is_wanted(event_type) is True:
+            player_name = self.current_player.name if self.current_player is not None else None
+            self.events.publish(event_type, text, *args, player_name=player_name, floor_id=self.current_floor_id,
+                                tick=self.tick_count)
 
 
 class FloorBuilder():
     FLOOR_LAYOUT_FILE_NAME = "_floor_layouts.csv"
     FLOOR_OBJECT_FILE_NAME = "_floor_objects.csv"
+    FLOOR_CACHE_FILE_NAME = "_floors.cache"
 
-    def __init__(self, data_file_directory: str):
+    def __init__(self, data_file_directory: str, flyweight: bool = False, lazy: bool = False,
+                 cache_size: int = None, use_cache: bool = False):
         self.data_file_directory = data_file_directory
+        self.flyweight = flyweight
+        self.lazy = lazy
+        self.cache_size = cache_size
+        self.use_cache = use_cache
+        self.floor_cache = None
         self.floors = {}
 
     def initialise(self, file_prefix: str = "default"):
 
-        self.floor_objects = FloorObjectLoader(
-            self.data_file_directory + file_prefix + FloorBuilder.FLOOR_OBJECT_FILE_NAME)
-        self.floor_objects.load()
+        self.close()
+
+        object_file_name = self.data_file_directory + file_prefix + FloorBuilder.FLOOR_OBJECT_FILE_NAME
+        layout_file_name = self.data_file_directory + file_prefix + FloorBuilder.FLOOR_LAYOUT_FILE_NAME
+
+        if self.use_cache is True:
+            self.floor_cache = FloorDataCache(self.data_file_directory + file_prefix +
+                                              FloorBuilder.FLOOR_CACHE_FILE_NAME,
+                                              [object_file_name, layout_file_name])
+
+        # If there is an up to date compiled cache then load everything from that...
+        if self.floor_cache is not None and self.floor_cache.is_valid():
+
+            for object_code, floor_object in self.floor_cache.open():
+                FloorObjectLoader.add_object_type(object_code, floor_object)
+
+            self.floor_layouts = CompiledFloorLoader(self.floor_cache, flyweight=self.flyweight)
+
+        # ...otherwise fall back to the CSV files and compile a new cache from them
+        else:
+            self.floor_objects = FloorObjectLoader(object_file_name)
+            self.floor_objects.load()
+
+            self.floor_layouts = FloorLayoutLoader(layout_file_name, flyweight=self.flyweight)
+
+            if self.floor_cache is not None:
+                self.compile_cache()
 
-        self.floor_layouts = FloorLayoutLoader(
-            self.data_file_directory + file_prefix + FloorBuilder.FLOOR_LAYOUT_FILE_NAME)
-        self.floor_layouts.load()
+        # Lazy floors get loaded when they are first used so they need the cache to stay open...
+        if self.lazy is False:
+            self.floor_layouts.load()
+
+            # ...but once every floor has been loaded nothing reads the cache again
+            self.close()
+
+    def close(self):
+        if self.floor_cache is not None:
+            self.floor_cache.close()
+
+    def compile_cache(self):
+
+        with open(self.floor_layouts.file_name, 'r') as layout_file:
+            floor_records = self.floor_layouts.parse_tiles(csv.DictReader(layout_file))
+
+        object_types = [(object_code, FloorObjectLoader.floor_objects[object_code]) for object_code in
+                        FloorObjectLoader.floor_objects.keys()]
+
+        try:
+            self.floor_cache.write(object_types, floor_records)
+        except OSError as err:
+            logging.warning("{0}: Unable to write floor cache {1} - {2}".format(__class__,
+                                                                                self.floor_cache.file_name, err))
+            self.floor_cache = None
+            return
+
+        # Switch over to the freshly written cache
+        self.floor_cache.open()
+        self.floor_layouts = CompiledFloorLoader(self.floor_cache, flyweight=self.flyweight)
 
     def load_floors(self):
 
+        if self.lazy is True:
+            self.floors = LazyFloorMap(self.floor_layouts, self.cache_size)
+            logging.info("{0}: Indexed floors {1}".format(__class__, list(self.floors.keys())))
+            return
+
         for floor_id, new_floor in FloorLayoutLoader.floor_layouts.items():
             self.floors[floor_id] = new_floor
 
         for floor in self.floors.values():
-            print(str(floor))
+            logging.info("{0}: Loaded {1}".format(__class__, floor))
 
 
 class FloorLayoutLoader():
@@ -525,9 +2123,16 @@ class FloorLayoutLoader():
 
     EMPTY_OBJECT_CODE = " "
 
-    def __init__(self, file_name):
+    def __init__(self, file_name, flyweight: bool = False):
         self.file_name = file_name
 
+        # Store static scenery as compact flyweight tiles rather than full objects?
+        self.flyweight = flyweight
+
+        # The header row and byte range of the rows for each floor in the file
+        self.header = None
+        self.floor_offsets = {}
+
     def load(self):
 
         # Attempt to open the file
@@ -536,50 +2141,656 @@ class FloorLayoutLoader():
             # Load all rows in as a dictionary
             reader = csv.DictReader(object_file)
 
-            # Get the list of column headers
-            header = reader.fieldnames
+            FloorLayoutLoader.floor_layouts.update(self.build_floors(reader))
+
+    def index(self):
+        """Find where the rows for each floor are in the file so that floors can be loaded one at a time"""
+
+        self.floor_offsets = {}
+
+        # Attempt to open the file
+        with open(self.file_name, 'rb') as layout_file:
+
+            self.header = layout_file.readline()
+            id_column = next(csv.reader([self.header.decode()])).index("ID")
 
             current_floor_id = None
-            current_floor_layer = None
+            offset = layout_file.tell()
 
-            # For each row in the file....
-            for row in reader:
+            # For each row in the file record the byte range that the current floor's rows cover...
+            for line in iter(layout_file.readline, b''):
+
+                end = offset + len(line)
+
+                row = next(csv.reader([line.decode()]), None)
+                if row is not None and len(row) > id_column:
+                    floor_id = int(row[id_column])
+                    if floor_id != current_floor_id:
+                        self.floor_offsets[floor_id] = [offset, end]
+                        current_floor_id = floor_id
+                    else:
+                        self.floor_offsets[floor_id][1] = end
+
+                offset = end
+
+        logging.info("{0}.index(): Indexed {1} floors in {2}".format(__class__, len(self.floor_offsets),
+                                                                     self.file_name))
+
+        return list(self.floor_offsets.keys())
+
+    def load_floor(self, floor_id: int):
+        """Load just the specified floor using the row offsets found by index()"""
+
+        if floor_id not in self.floor_offsets.keys():
+            raise Exception("Can't find floor {0} in {1}".format(floor_id, self.file_name))
+
+        start, end = self.floor_offsets[floor_id]
+
+        with open(self.file_name, 'rb') as layout_file:
+            layout_file.seek(start)
+            rows = layout_file.read(end - start)
+
+        reader = csv.DictReader(io.StringIO((self.header + rows).decode()))
+
+        return self.build_floors(reader)[floor_id]
+
+    def build_floors(self, reader):
+
+        new_floors = collections.OrderedDict()
+
+        for floor_id, (floor_name, floor_skin_name, floor_tiles) in self.parse_tiles(reader).items():
+            new_floors[floor_id] = self.build_floor(floor_id, floor_name, floor_skin_name, floor_tiles)
+
+        return new_floors
+
+    def parse_tiles(self, reader):
+        """Turn the layout rows for each floor into a (name, skin, [(layer, code, x, y)...]) record"""
+
+        floor_records = collections.OrderedDict()
+
+        current_floor_id = None
+        current_floor_layer = None
+
+        # For each row in the file....
+        for row in reader:
+
+            floor_id = int(row.get("ID"))
+            floor_layout_name = row.get("Name")
+            floor_skin_name = row.get("Skin")
+
+            if floor_id != current_floor_id:
+                floor_records[floor_id] = (floor_layout_name, floor_skin_name, [])
+                current_floor_id = floor_id
+                y = 0
+
+            floor_tiles = floor_records[floor_id][2]
+
+            floor_layer = int(row.get("Layer"))
+            if floor_layer != current_floor_layer:
+                current_floor_layer = floor_layer
+                y = 0
+
+            floor_layout = row.get("Layout")
+            x = 0
+            for object_code in floor_layout:
+                if object_code != FloorLayoutLoader.EMPTY_OBJECT_CODE:
+                    floor_tiles.append((floor_layer, object_code, x, y))
+                x += FloorLayoutLoader.DEFAULT_OBJECT_WIDTH
+
+            y += FloorLayoutLoader.DEFAULT_OBJECT_DEPTH
+
+        return floor_records
+
+    def build_floor(self, floor_id: int, floor_name: str, floor_skin_name: str, floor_tiles):
+
+        new_floor = Floor(floor_id, floor_name, (0, 0, 0, 0), skin_name=floor_skin_name)
+
+        # Collect the floor's objects and static tiles so that they can be added in one batch
+        floor_objects = []
+        floor_static_tiles = collections.OrderedDict()
 
-                floor_id = int(row.get("ID"))
-                floor_layout_name = row.get("Name")
-                floor_skin_name = row.get("Skin")
+        for floor_layer, object_code, x, y in floor_tiles:
+            if self.flyweight is True and FloorObjectLoader.is_static(object_code):
+                floor_static_tiles.setdefault(floor_layer, []).append(
+                    (FloorObjectLoader.object_type_ids[object_code], x, y))
+            else:
+                new_floor_object = FloorObjectLoader.get_object_copy_by_code(object_code, x, y)
+                new_floor_object.layer = floor_layer
+                floor_objects.append(new_floor_object)
+
+        new_floor.add_objects(floor_objects)
+        for floor_layer, static_tiles in floor_static_tiles.items():
+            new_floor.add_static_tiles(floor_layer, static_tiles)
+
+        return new_floor
+
+
+class FloorDataCache:
+    '''
+    A compiled copy of the floor object and floor layout data files packed into a binary file that
+    can be memory mapped and read directly instead of parsing the CSV files on every start up.
+    The cache is stamped with a version and a checksum of the source files that it was built from
+    so that it is automatically rebuilt whenever they change.
+
+    The file is laid out as:-
+        - header: magic, version, checksum
+        - object types: count, then code, name, width, depth, height and flags for each
+        - floor index: count, then floor ID, offset and size of the floor record for each
+        - floor records: name, skin, tile count, then a packed (layer, code index, x, y) for each tile
+    '''
+
+    MAGIC = b"ZQFC"
+    VERSION = 1
+
+    HEADER = struct.Struct("<4sH20s")
+    COUNT = struct.Struct("<I")
+    STRING_SIZE = struct.Struct("<H")
+    OBJECT_TYPE = struct.Struct("<iiiB")
+    FLOOR_INDEX = struct.Struct("<iII")
+    TILE = struct.Struct("<hhii")
+
+    SOLID = 1
+    VISIBLE = 2
+    INTERACTABLE = 4
+
+    def __init__(self, file_name: str, source_file_names: list):
+        self.file_name = file_name
+        self.source_file_names = source_file_names
+        self.data = None
+        self.object_codes = []
+        self.floor_offsets = {}
+
+    def get_checksum(self):
+
+        checksum = hashlib.sha1(struct.pack("<H", FloorDataCache.VERSION))
+
+        for source_file_name in self.source_file_names:
+            with open(source_file_name, 'rb') as source_file:
+                checksum.update(source_file.read())
+
+        return checksum.digest()
+
+    def is_valid(self):
+        """Is there a cache file that was built by this version from the current source files?"""
+
+        try:
+            with open(self.file_name, 'rb') as cache_file:
+                header = cache_file.read(FloorDataCache.HEADER.size)
+        except OSError:
+            return False
+
+        if len(header) < FloorDataCache.HEADER.size:
+            return False
+
+        magic, version, checksum = FloorDataCache.HEADER.unpack(header)
+
+        return magic == FloorDataCache.MAGIC and version == FloorDataCache.VERSION and \
+               checksum == self.get_checksum()
+
+    def write(self, object_types: list, floor_records: dict):
+        """Write a new cache from a list of (code, RPGObject) and a map of floor ID to (name, skin, tiles)"""
+
+        codes = {}
+        object_table = bytearray()
+        object_table += FloorDataCache.COUNT.pack(len(object_types))
+        for object_code, floor_object in object_types:
+            codes[object_code] = len(codes)
+            flags = (FloorDataCache.SOLID if floor_object.is_solid else 0) | \
+                    (FloorDataCache.VISIBLE if floor_object.is_visible else 0) | \
+                    (FloorDataCache.INTERACTABLE if floor_object.is_interactable else 0)
+            object_table += FloorDataCache.pack_string(object_code)
+            object_table += FloorDataCache.pack_string(floor_object.name)
+            object_table += FloorDataCache.OBJECT_TYPE.pack(floor_object.rect.width, floor_object.rect.height,
+                                                            floor_object.height, flags)
+
+        floors = []
+        for floor_id, (floor_name, floor_skin_name, floor_tiles) in floor_records.items():
+            floor_record = bytearray()
+            floor_record += FloorDataCache.pack_string(floor_name)
+            floor_record += FloorDataCache.pack_string(floor_skin_name)
+            floor_record += FloorDataCache.COUNT.pack(len(floor_tiles))
+            for floor_layer, object_code, x, y in floor_tiles:
+                floor_record += FloorDataCache.TILE.pack(floor_layer, codes[object_code], x, y)
+            floors.append((floor_id, floor_record))
+
+        # The floor records go after the index so work out where each one will start
+        offset = FloorDataCache.HEADER.size + len(object_table) + FloorDataCache.COUNT.size + \
+                 FloorDataCache.FLOOR_INDEX.size * len(floors)
+
+        floor_index = bytearray()
+        floor_index += FloorDataCache.COUNT.pack(len(floors))
+        for floor_id, floor_record in floors:
+            floor_index += FloorDataCache.FLOOR_INDEX.pack(floor_id, offset, len(floor_record))
+            offset += len(floor_record)
+
+        # Write to a temporary file first so a half written cache is never left behind
+        temp_file_name = self.file_name + ".tmp"
+        with open(temp_file_name, 'wb') as cache_file:
+            cache_file.write(FloorDataCache.HEADER.pack(FloorDataCache.MAGIC, FloorDataCache.VERSION,
+                                                        self.get_checksum()))
+            cache_file.write(object_table)
+            cache_file.write(floor_index)
+            for floor_id, floor_record in floors:
+                cache_file.write(floor_record)
+
+        os.replace(temp_file_name, self.file_name)
+
+        logging.info("{0}.write(): Wrote {1} object types and {2} floors to {3}".format(__class__,
+                                                                                       len(object_types),
+                                                                                       len(floors),
+                                                                                       self.file_name))
+
+    def open(self):
+        """Memory map the cache and read in the object types and the floor index"""
+
+        self.close()
+
+        with open(self.file_name, 'rb') as cache_file:
+            self.data = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offset = FloorDataCache.HEADER.size
+
+        object_types = []
+        count, = FloorDataCache.COUNT.unpack_from(self.data, offset)
+        offset += FloorDataCache.COUNT.size
+        for i in range(count):
+            object_code, offset = self.unpack_string(offset)
+            object_name, offset = self.unpack_string(offset)
+            width, depth, height, flags = FloorDataCache.OBJECT_TYPE.unpack_from(self.data, offset)
+            offset += FloorDataCache.OBJECT_TYPE.size
+            object_types.append((object_code, RPGObject(object_name, (0, 0, width, depth), height=height,
+                                                        solid=flags & FloorDataCache.SOLID != 0,
+                                                        visible=flags & FloorDataCache.VISIBLE != 0,
+                                                        interactable=flags & FloorDataCache.INTERACTABLE != 0)))
+
+        self.object_codes = [object_code for object_code, floor_object in object_types]
+
+        self.floor_offsets = collections.OrderedDict()
+        count, = FloorDataCache.COUNT.unpack_from(self.data, offset)
+        offset += FloorDataCache.COUNT.size
+        for floor_id, floor_offset, floor_size in FloorDataCache.FLOOR_INDEX.iter_unpack(
+                self.data[offset:offset + FloorDataCache.FLOOR_INDEX.size * count]):
+            self.floor_offsets[floor_id] = (floor_offset, floor_size)
+
+        return object_types
+
+    def close(self):
+        """Unmap the cache if it is open"""
+
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+
+    def read_floor(self, floor_id: int):
+        """Read the (name, skin, tiles) record for a floor straight out of the memory mapped cache"""
+
+        offset, size = self.floor_offsets[floor_id]
+
+        floor_name, offset = self.unpack_string(offset)
+        floor_skin_name, offset = self.unpack_string(offset)
+        count, = FloorDataCache.COUNT.unpack_from(self.data, offset)
+        offset += FloorDataCache.COUNT.size
+
+        codes = self.object_codes
+        floor_tiles = [(floor_layer, codes[code_index], x, y) for floor_layer, code_index, x, y in
+                       FloorDataCache.TILE.iter_unpack(self.data[offset:offset + FloorDataCache.TILE.size * count])]
+
+        return floor_name, floor_skin_name, floor_tiles
+
+    def unpack_string(self, offset: int):
+        size, = FloorDataCache.STRING_SIZE.unpack_from(self.data, offset)
+        offset += FloorDataCache.STRING_SIZE.size
+        return self.data[offset:offset + size].decode(), offset + size
+
+    @staticmethod
+    def pack_string(value: str):
+        encoded = value.encode()
+        return FloorDataCache.STRING_SIZE.pack(len(encoded)) + encoded
+
+
+class CompiledFloorLoader(FloorLayoutLoader):
+    '''
+    Loads floors from a FloorDataCache rather than from the floor layouts CSV file.
+    '''
+
+    def __init__(self, floor_cache: FloorDataCache, flyweight: bool = False):
+        super(CompiledFloorLoader, self).__init__(floor_cache.file_name, flyweight=flyweight)
+        self.floor_cache = floor_cache
+
+    def load(self):
+        for floor_id in self.index():
+            FloorLayoutLoader.floor_layouts[floor_id] = self.load_floor(floor_id)
+
+    def index(self):
+        self.floor_offsets = self.floor_cache.floor_offsets
+        return list(self.floor_offsets.keys())
+
+    def load_floor(self, floor_id: int):
+
+        if floor_id not in self.floor_cache.floor_offsets.keys():
+            raise Exception("Can't find floor {0} in {1}".format(floor_id, self.file_name))
+
+        floor_name, floor_skin_name, floor_tiles = self.floor_cache.read_floor(floor_id)
+
+        return self.build_floor(floor_id, floor_name, floor_skin_name, floor_tiles)
+
+
+class LazyFloorMap(collections.abc.Mapping):
+    '''
+    A mapping of floor ID to Floor that only loads a floor the first time that it is asked for.
+    Once more than capacity floors are loaded the floors furthest from the player are evicted, least
+    recently used first, apart from any floors that have been modified which keep their state.
+    '''
+
+    def __init__(self, floor_layouts: FloorLayoutLoader, capacity: int = None):
+        self.floor_layouts = floor_layouts
+        self.floor_ids = floor_layouts.index()
+        self.capacity = capacity
+        self.loaded = collections.OrderedDict()
+
+        # Floors can be loaded by a background thread as well as by the game
+        self.lock = threading.RLock()
+
+        # A function that gives how far away a floor is from the player and one that puts back any
+        # saved changes to a floor when it is loaded
+        self.distance = None
+        self.restore = None
+
+    def __getitem__(self, floor_id: int):
+        return self.load(floor_id)
+
+    def load(self, floor_id: int, evict: bool = True):
+        '''
+        Get a floor loading it if it isn't already. Evicting needs to know where the player is so a background
+        thread should load without evicting and leave it to the next time that the game gets a floor.
+        '''
+
+        with self.lock:
+            if floor_id in self.loaded.keys():
+                self.loaded.move_to_end(floor_id)
+                floor = self.loaded[floor_id]
+                if evict is True and self.capacity is not None and len(self.loaded) > self.capacity:
+                    self.evict()
+                return floor
+
+        if floor_id not in self.floor_layouts.floor_offsets.keys():
+            raise KeyError(floor_id)
+
+        # Load the floor outside of the lock so that a floor being prefetched doesn't hold up the current one...
+        floor = self.floor_layouts.load_floor(floor_id)
+
+        # ...but if someone else got there first then use their copy as it might have already been changed
+        with self.lock:
+            if self.loaded.setdefault(floor_id, floor) is floor and self.restore is not None:
+                self.restore(floor_id, floor)
+            floor = self.loaded[floor_id]
+            self.loaded.move_to_end(floor_id)
+            logging.info("{0}: Loaded floor {1}".format(__class__, floor_id))
+            if evict is True:
+                self.evict()
+
+        return floor
+
+    def __iter__(self):
+        return iter(self.floor_ids)
+
+    def __len__(self):
+        return len(self.floor_ids)
+
+    def __contains__(self, floor_id):
+        return floor_id in self.floor_layouts.floor_offsets.keys()
+
+    def loaded_floors(self):
+        with self.lock:
+            return dict(self.loaded)
+
+    def evict(self):
+
+        if self.capacity is None:
+            return
 
-                if floor_id != current_floor_id:
-                    FloorLayoutLoader.floor_layouts[floor_id] = Floor(floor_id, floor_layout_name, (0, 0, 0, 0),
-                                                                      skin_name=floor_skin_name)
-                    current_floor_id = floor_id
-                    y = 0
+        while len(self.loaded) > self.capacity:
 
-                floor = FloorLayoutLoader.floor_layouts[floor_id]
+            # Never evict the floor that was just used, any floor that has been modified or any floor with players on it
+            candidates = [floor_id for floor_id, floor in list(self.loaded.items())[:-1]
+                          if floor.modified is False and len(floor.players) == 0]
+            if len(candidates) == 0:
+                logging.info("{0}: No floors can be evicted to get down to {1}".format(__class__, self.capacity))
+                break
+
+            if self.distance is None:
+                evict_id = candidates[0]
+            else:
+                evict_id = max(candidates, key=self.distance)
+
+            del self.loaded[evict_id]
+            logging.info("{0}: Evicted floor {1}".format(__class__, evict_id))
+
+
+class FloorSnapshot:
+    '''
+    The state of the things on a floor that change as the game is played at a point in the game:-
+        - players - (x, y, treasure, keys, boss keys, HP) by player name
+        - monsters - (x, y) of each monster in the order that they were added to the floor
+        - changes - the (layer, x, y, new object name or None) of every object removed or swapped since
+          the floor was loaded so that the floor can be rebuilt from its layout
+    '''
+
+    def __init__(self, floor_id: int, sequence: int, players: dict = None, monsters: list = None,
+                 changes: list = None):
+        self.floor_id = floor_id
+        self.sequence = sequence
+        self.players = {} if players is None else players
+        self.monsters = [] if monsters is None else monsters
+        self.changes = [] if changes is None else changes
+
+    def __eq__(self, other):
+        return isinstance(other, FloorSnapshot) and \
+               (self.floor_id, self.players, self.monsters, self.changes) == \
+               (other.floor_id, other.players, other.monsters, other.changes)
+
+    @staticmethod
+    def capture(floor_id: int, floor: Floor, sequence: int):
+
+        players = {player.name: (player.rect.x, player.rect.y, player.treasure, player.keys, player.boss_keys,
+                                 player.HP) for player in floor.players.values()}
+        monsters = [(monster.rect.x, monster.rect.y) for monster in floor.monsters]
+
+        return FloorSnapshot(floor_id, sequence, players, monsters, list(floor.changes))
+
+
+class SnapshotEncoder:
+    '''
+    Encodes FloorSnapshots as compact binary messages either in full or as a delta from an earlier
+    snapshot that the receiver has acknowledged. A delta only holds the players whose state has changed,
+    the monsters that have moved and the objects that have changed since the earlier snapshot.
+
+    A message is laid out as:-
+        - header: kind (FULL or DELTA), floor ID, sequence and the sequence of the snapshot it is a delta from
+        - players: count, then name, x, y, treasure, keys, boss keys and HP of each new or changed player,
+          then count, then name of each player that has left the floor
+        - monsters: total count, then count, then (index, dx, dy) of each monster that moved a little,
+          then count, then (index, x, y) of each monster that moved a lot or is new
+        - object changes: count, then layer, x, y and new object name (empty if removed) of each change
+    '''
+
+    FULL = 1
+    DELTA = 2
+
+    HEADER = struct.Struct("<BHII")
+    COUNT = struct.Struct("<H")
+    STRING_SIZE = struct.Struct("<B")
+    PLAYER = struct.Struct("<hhHBBh")
+    SMALL_MOVE = struct.Struct("<Hbb")
+    BIG_MOVE = struct.Struct("<Hhh")
+    CHANGE = struct.Struct("<Bhh")
+
+    # How many of the latest snapshots to keep for deltas to be made from
+    HISTORY = 64
+
+    def __init__(self, history: int = HISTORY):
+        self.history = history
+        self.snapshots = collections.OrderedDict()
+
+    def add(self, snapshot: FloorSnapshot):
+        """Keep a snapshot so that later snapshots can be sent as deltas from it"""
+
+        self.snapshots[snapshot.sequence] = snapshot
+        self.snapshots.move_to_end(snapshot.sequence)
+        while len(self.snapshots) > self.history:
+            self.snapshots.popitem(last=False)
+
+    def encode(self, snapshot: FloorSnapshot, base_sequence: int = None):
+        """Encode a snapshot as a delta from the specified earlier snapshot or in full if it is not available"""
+
+        base = self.snapshots.get(base_sequence)
+        if base is None or base.floor_id != snapshot.floor_id or base.sequence >= snapshot.sequence:
+            base = FloorSnapshot(snapshot.floor_id, 0)
+            kind = SnapshotEncoder.FULL
+        else:
+            kind = SnapshotEncoder.DELTA
+
+        message = [SnapshotEncoder.HEADER.pack(kind, snapshot.floor_id, snapshot.sequence, base.sequence)]
+
+        changed_players = [(name, state) for name, state in snapshot.players.items()
+                           if base.players.get(name) != state]
+        message.append(SnapshotEncoder.COUNT.pack(len(changed_players)))
+        for name, state in changed_players:
+            message.append(SnapshotEncoder.pack_string(name))
+            message.append(SnapshotEncoder.PLAYER.pack(*state))
+
+        left_players = [name for name in base.players.keys() if name not in snapshot.players.keys()]
+        message.append(SnapshotEncoder.COUNT.pack(len(left_players)))
+        for name in left_players:
+            message.append(SnapshotEncoder.pack_string(name))
+
+        small_moves = []
+        big_moves = []
+        base_monster_count = len(base.monsters)
+        for i, (x, y) in enumerate(snapshot.monsters):
+            if i < base_monster_count:
+                base_x, base_y = base.monsters[i]
+                dx = x - base_x
+                dy = y - base_y
+                if dx == 0 and dy == 0:
+                    continue
+                if -128 <= dx <= 127 and -128 <= dy <= 127:
+                    small_moves.append(SnapshotEncoder.SMALL_MOVE.pack(i, dx, dy))
+                    continue
+            big_moves.append(SnapshotEncoder.BIG_MOVE.pack(i, x, y))
+
+        message.append(SnapshotEncoder.COUNT.pack(len(snapshot.monsters)))
+        message.append(SnapshotEncoder.COUNT.pack(len(small_moves)))
+        message += small_moves
+        message.append(SnapshotEncoder.COUNT.pack(len(big_moves)))
+        message += big_moves
+
+        # The list of changes only ever grows so the new ones are the ones after those in the earlier snapshot
+        new_changes = snapshot.changes[len(base.changes):]
+        message.append(SnapshotEncoder.COUNT.pack(len(new_changes)))
+        for layer, x, y, name in new_changes:
+            message.append(SnapshotEncoder.CHANGE.pack(layer, x, y))
+            message.append(SnapshotEncoder.pack_string("" if name is None else name))
+
+        return b"".join(message)
+
+    @staticmethod
+    def pack_string(value: str):
+        encoded = value.encode()
+        return SnapshotEncoder.STRING_SIZE.pack(len(encoded)) + encoded
 
-                floor_layer = int(row.get("Layer"))
-                if floor_layer != current_floor_layer:
-                    current_floor_layer = floor_layer
-                    y = 0
 
-                floor_layout = row.get("Layout")
-                x = 0
-                for object_code in floor_layout:
-                    if object_code != FloorLayoutLoader.EMPTY_OBJECT_CODE:
-                        new_floor_object = FloorObjectLoader.get_object_copy_by_code(object_code)
-                        new_floor_object.rect.x = x
-                        new_floor_object.rect.y = y
-                        new_floor_object.layer = floor_layer
-                        floor.add_object(new_floor_object)
-                    x += FloorLayoutLoader.DEFAULT_OBJECT_WIDTH
+class SnapshotDecoder:
+    '''
+    Rebuilds the FloorSnapshots encoded by a SnapshotEncoder keeping the latest ones for deltas to be applied to.
+    '''
 
-                y += FloorLayoutLoader.DEFAULT_OBJECT_DEPTH
+    def __init__(self, history: int = SnapshotEncoder.HISTORY):
+        self.history = history
+        self.snapshots = collections.OrderedDict()
+        self.latest = None
+
+    def decode(self, message: bytes):
+
+        kind, floor_id, sequence, base_sequence = SnapshotEncoder.HEADER.unpack_from(message, 0)
+        offset = SnapshotEncoder.HEADER.size
+
+        if kind == SnapshotEncoder.FULL:
+            base = FloorSnapshot(floor_id, 0)
+        elif kind == SnapshotEncoder.DELTA:
+            base = self.snapshots.get(base_sequence)
+            if base is None or base.floor_id != floor_id:
+                raise Exception("Snapshot {0} is a delta from snapshot {1} of floor {2} that is not available".format(
+                    sequence, base_sequence, floor_id))
+        else:
+            raise Exception("Snapshot {0} is of unknown kind {1}".format(sequence, kind))
+
+        players = dict(base.players)
+        count, offset = self.unpack_count(message, offset)
+        for i in range(count):
+            name, offset = self.unpack_string(message, offset)
+            players[name] = SnapshotEncoder.PLAYER.unpack_from(message, offset)
+            offset += SnapshotEncoder.PLAYER.size
+
+        count, offset = self.unpack_count(message, offset)
+        for i in range(count):
+            name, offset = self.unpack_string(message, offset)
+            del players[name]
+
+        monster_count, offset = self.unpack_count(message, offset)
+        monsters = base.monsters[:monster_count] + [None] * max(0, monster_count - len(base.monsters))
+
+        count, offset = self.unpack_count(message, offset)
+        for i in range(count):
+            index, dx, dy = SnapshotEncoder.SMALL_MOVE.unpack_from(message, offset)
+            offset += SnapshotEncoder.SMALL_MOVE.size
+            x, y = monsters[index]
+            monsters[index] = (x + dx, y + dy)
+
+        count, offset = self.unpack_count(message, offset)
+        for i in range(count):
+            index, x, y = SnapshotEncoder.BIG_MOVE.unpack_from(message, offset)
+            offset += SnapshotEncoder.BIG_MOVE.size
+            monsters[index] = (x, y)
+
+        changes = list(base.changes)
+        count, offset = self.unpack_count(message, offset)
+        for i in range(count):
+            layer, x, y = SnapshotEncoder.CHANGE.unpack_from(message, offset)
+            offset += SnapshotEncoder.CHANGE.size
+            name, offset = self.unpack_string(message, offset)
+            changes.append((layer, x, y, None if name == "" else name))
+
+        snapshot = FloorSnapshot(floor_id, sequence, players, monsters, changes)
+
+        self.snapshots[sequence] = snapshot
+        while len(self.snapshots) > self.history:
+            self.snapshots.popitem(last=False)
+        self.latest = snapshot
+
+        return snapshot
+
+    @staticmethod
+    def unpack_count(message: bytes, offset: int):
+        count, = SnapshotEncoder.COUNT.unpack_from(message, offset)
+        return count, offset + SnapshotEncoder.COUNT.size
+
+    @staticmethod
+    def unpack_string(message: bytes, offset: int):
+        size, = SnapshotEncoder.STRING_SIZE.unpack_from(message, offset)
+        offset += SnapshotEncoder.STRING_SIZE.size
+        return bytes(message[offset:offset + size]).decode(), offset + size
 
 
 class FloorObjectLoader():
     floor_objects = {}
+    object_prototypes = {}
     map_object_name_to_code = {}
 
+    # The (class, prototype) record for each object type indexed by type id
+    object_types = []
+    object_type_ids = {}
+
     BOOL_MAP = {"TRUE": True, "FALSE": False}
 
     def __init__(self, file_name: str):
@@ -609,31 +2820,58 @@ class FloorObjectLoader():
                                        interactable=FloorObjectLoader.BOOL_MAP[row.get("interactable").upper()] \
                                        )
 
-                # Store the floor object in the code cache
-                FloorObjectLoader.floor_objects[object_code] = new_object
-
-                # Store mapping of object name to code
-                FloorObjectLoader.map_object_name_to_code[new_object.name] = object_code
+                FloorObjectLoader.add_object_type(object_code, new_object)
 
                 logging.info("{0}.load(): Loaded Floor Object {1}".format(__class__, new_object.name))
 
     @staticmethod
-    def get_object_copy_by_code(object_code: str):
+    def add_object_type(object_code: str, new_object: RPGObject):
+
+        # Store the floor object and the prototype record used to copy it in the code cache
+        FloorObjectLoader.floor_objects[object_code] = new_object
+        FloorObjectLoader.object_prototypes[object_code] = (new_object.__class__, new_object.get_prototype())
+
+        # Give each object code a type id that static tiles can refer to it by
+        if object_code in FloorObjectLoader.object_type_ids.keys():
+            type_id = FloorObjectLoader.object_type_ids[object_code]
+            FloorObjectLoader.object_types[type_id] = FloorObjectLoader.object_prototypes[object_code]
+        else:
+            FloorObjectLoader.object_type_ids[object_code] = len(FloorObjectLoader.object_types)
+            FloorObjectLoader.object_types.append(FloorObjectLoader.object_prototypes[object_code])
+
+        # Store mapping of object name to code
+        FloorObjectLoader.map_object_name_to_code[new_object.name] = object_code
+
+    @staticmethod
+    def is_static(object_code: str):
+        """Is an object type immutable scenery that can be stored as a flyweight tile?"""
 
         if object_code not in FloorObjectLoader.floor_objects.keys():
             raise Exception("Can't find object by code '{0}'".format(object_code))
 
-        return copy.deepcopy(FloorObjectLoader.floor_objects[object_code])
+        floor_object = FloorObjectLoader.floor_objects[object_code]
+
+        return floor_object.is_interactable is False and floor_object.name not in Objects.DIRECTIONS
+
+    @staticmethod
+    def get_object_copy_by_code(object_code: str, x: int = 0, y: int = 0):
+
+        if object_code not in FloorObjectLoader.object_prototypes.keys():
+            raise Exception("Can't find object by code '{0}'".format(object_code))
+
+        object_class, prototype = FloorObjectLoader.object_prototypes[object_code]
+
+        return object_class.from_prototype(prototype, x, y)
 
     @staticmethod
-    def get_object_copy_by_name(object_name: str):
+    def get_object_copy_by_name(object_name: str, x: int = 0, y: int = 0):
 
         if object_name not in FloorObjectLoader.map_object_name_to_code.keys():
             raise Exception("Can't find object by name '{0}'".format(object_name))
 
         object_code = FloorObjectLoader.map_object_name_to_code[object_name]
 
-        if object_code not in FloorObjectLoader.floor_objects.keys():
+        if object_code not in FloorObjectLoader.object_prototypes.keys():
             raise Exception("Can't find object by code '{0}'".format(object_name))
 
-        return FloorObjectLoader.get_object_copy_by_code(object_code)
+        return FloorObjectLoader.get_object_copy_by_code(object_code, x, y)
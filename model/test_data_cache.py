@@ -0,0 +1,99 @@
+import os
+import shutil
+
+import model
+from model.model import FloorBuilder, FloorDataCache
+
+
+def copy_data_files(tmp_path):
+
+    for file_name in ("default" + FloorBuilder.FLOOR_OBJECT_FILE_NAME, "default" + FloorBuilder.FLOOR_LAYOUT_FILE_NAME):
+        shutil.copy(os.path.join(model.Game.DATA_FILES_DIR, file_name), str(tmp_path))
+
+    return os.path.join(str(tmp_path), "")
+
+
+def new_floor_builder(data_file_directory: str, lazy: bool = True):
+
+    floor_builder = FloorBuilder(data_file_directory, flyweight=True, lazy=lazy, use_cache=True)
+    floor_builder.initialise()
+    floor_builder.load_floors()
+
+    return floor_builder
+
+
+def test_cache_is_built_and_matches_the_data_files(tmp_path):
+
+    data_file_directory = copy_data_files(tmp_path)
+    cached_floors = new_floor_builder(data_file_directory)
+
+    assert os.path.exists(cached_floors.floor_cache.file_name)
+    assert cached_floors.floor_cache.is_valid()
+
+    # Now build the floors straight from the CSV files to compare against
+    csv_floors = FloorBuilder(data_file_directory, flyweight=True)
+    csv_floors.initialise()
+    csv_floors.load_floors()
+
+    assert sorted(cached_floors.floors.keys()) == sorted(csv_floors.floors.keys())
+    for floor_id, csv_floor in csv_floors.floors.items():
+        assert str(cached_floors.floors[floor_id]) == str(csv_floor)
+
+
+def test_cache_is_rebuilt_when_the_data_files_change(tmp_path):
+
+    data_file_directory = copy_data_files(tmp_path)
+    floor_cache = new_floor_builder(data_file_directory).floor_cache
+    floor_cache.close()
+
+    # A blank line changes the checksum of the layouts without changing any of the floors
+    with open(data_file_directory + "default" + FloorBuilder.FLOOR_LAYOUT_FILE_NAME, 'a') as layout_file:
+        layout_file.write("\n")
+
+    assert floor_cache.is_valid() is False
+
+    floor_cache = new_floor_builder(data_file_directory).floor_cache
+
+    assert floor_cache.is_valid()
+
+
+def test_cache_from_another_version_is_not_valid(tmp_path):
+
+    data_file_directory = copy_data_files(tmp_path)
+    floor_cache = new_floor_builder(data_file_directory).floor_cache
+    floor_cache.close()
+
+    with open(floor_cache.file_name, 'r+b') as cache_file:
+        magic, version, checksum = FloorDataCache.HEADER.unpack(cache_file.read(FloorDataCache.HEADER.size))
+        cache_file.seek(0)
+        cache_file.write(FloorDataCache.HEADER.pack(magic, version + 1, checksum))
+
+    assert floor_cache.is_valid() is False
+
+
+def test_cache_mapping_is_closed(tmp_path):
+
+    data_file_directory = copy_data_files(tmp_path)
+
+    # Eager floors are all read in one go so the cache doesn't need to stay mapped afterwards
+    eager_floors = new_floor_builder(data_file_directory, lazy=False)
+    assert eager_floors.floor_cache.data is None
+
+    # Lazy floors keep reading from the cache until it is closed
+    lazy_floors = new_floor_builder(data_file_directory, lazy=True)
+    floor_cache = lazy_floors.floor_cache
+    mapping = floor_cache.data
+    assert mapping.closed is False
+
+    # Opening the cache again replaces the old mapping
+    floor_cache.open()
+    assert mapping.closed is True
+    assert floor_cache.data.closed is False
+
+    # As does starting again
+    mapping = floor_cache.data
+    lazy_floors.initialise()
+    assert mapping.closed is True
+
+    lazy_floors.close()
+    assert lazy_floors.floor_cache.data is None
@@ -0,0 +1,57 @@
+import random
+
+import model
+from model.benchmark_model import generate_floor, random_walk
+
+
+def new_floor_with_player():
+
+    floor = generate_floor(20, 20)
+    player = model.Player("player1", (0, 0, 32, 16), height=32)
+    floor.add_player(player)
+
+    return floor, player
+
+
+def test_dirty_rects_not_recorded_without_a_view():
+
+    floor, player = new_floor_with_player()
+
+    rnd = random.Random(1)
+    for i in range(5000):
+        floor.move_actor(player, rnd.choice((-2, 0, 2)), rnd.choice((-2, 0, 2)))
+
+    assert floor.dirty_rects == []
+
+
+def test_dirty_rects_stay_bounded_when_not_drawn():
+
+    floor, player = new_floor_with_player()
+    floor.set_viewed(True)
+
+    rnd = random.Random(1)
+    for i in range(5000):
+        floor.move_actor(player, rnd.choice((-2, 2)), rnd.choice((-2, 2)))
+        assert len(floor.dirty_rects) <= model.Floor.MAX_DIRTY_RECTS
+
+    # Once coalesced the whole floor gets redrawn but only the actors need drawing again
+    floor.coalesce_dirty_rects()
+    assert floor.dirty_rects == [(player.layer, floor.rect, True)]
+
+    floor.set_viewed(False)
+    assert floor.dirty_rects == []
+
+
+def test_headless_game_leaves_no_dirty_rects():
+
+    game = model.Game("Test")
+    game.initialise()
+    game.add_player(game.create_player("player1"))
+
+    walk = random_walk(random.Random(1))
+    for step in range(20000):
+        game.move_player(*next(walk))
+        if step % 19 == 0:
+            game.tick()
+
+    assert game.get_dirty_rect_count() == 0
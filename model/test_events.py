@@ -0,0 +1,134 @@
+import model
+
+
+class FormatCounter:
+    """An event argument that counts how many times it gets turned into text"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __format__(self, format_spec):
+        self.count += 1
+        return "counted"
+
+
+def new_game():
+
+    game = model.Game("Test")
+    game.initialise()
+    game.add_player(game.create_player("player1"))
+
+    return game
+
+
+def test_nothing_is_queued_without_subscribers():
+
+    events = model.EventQueue()
+    events.publish(model.Event.HIT, "You were hit by {0}!", "monster1")
+    assert len(events.queue) == 0
+
+    # Playing a game that nobody is listening to doesn't queue anything either
+    game = new_game()
+    game.publish(model.Event.TRAP, "You stepped on a trap!")
+    for step in range(200):
+        game.move_player(2, 0)
+    assert len(game.events.queue) == 0
+
+
+def test_subscribers_only_get_the_types_they_asked_for():
+
+    events = model.EventQueue()
+    hits, everything = [], []
+    events.subscribe(hits.extend, [model.Event.HIT])
+    events.subscribe(everything.extend)
+
+    events.publish(model.Event.HIT, "You were hit by {0}!", "monster1", player_name="player1", floor_id=1, tick=5)
+    events.publish(model.Event.TRAP, "You stepped on a trap!")
+    events.process()
+
+    assert [event.type for event in hits] == [model.Event.HIT]
+    assert [event.type for event in everything] == [model.Event.HIT, model.Event.TRAP]
+    assert (hits[0].player_name, hits[0].floor_id, hits[0].tick) == ("player1", 1, 5)
+    assert len(events.queue) == 0
+
+
+def test_only_wanted_types_are_queued():
+
+    events = model.EventQueue()
+    hits = []
+    events.subscribe(hits.extend, [model.Event.HIT])
+
+    events.publish(model.Event.TRAP, "You stepped on a trap!")
+    assert len(events.queue) == 0
+    assert events.is_wanted(model.Event.HIT) is True
+    assert events.is_wanted(model.Event.TRAP) is False
+
+    # A subscriber doesn't get called at all if there is nothing that it wants
+    batches = []
+    events.subscribe(batches.append, [model.Event.TRAP])
+    events.publish(model.Event.TRAP, "You stepped on a trap!")
+    events.process()
+    assert len(batches) == 1
+
+    hit_batches = []
+    events.subscribe(hit_batches.append, [model.Event.HIT])
+    events.publish(model.Event.TRAP, "You stepped on a trap!")
+    events.process()
+    assert len(batches) == 2
+    assert hits == [] and hit_batches == []
+
+
+def test_unsubscribing_everyone_empties_the_queue():
+
+    events = model.EventQueue()
+    received = []
+    events.subscribe(received.extend)
+    events.publish(model.Event.HIT, "Ouch")
+
+    events.unsubscribe(received.extend)
+    assert len(events.queue) == 0
+    assert events.is_wanted(model.Event.HIT) is False
+
+    events.process()
+    assert received == []
+
+
+def test_event_text_is_only_made_when_asked_for():
+
+    events = model.EventQueue()
+    received = []
+    events.subscribe(received.extend)
+    counter = FormatCounter()
+
+    events.publish(model.Event.HIT, "You were hit by {0}!", counter)
+    events.process()
+    assert counter.count == 0
+
+    assert received[0].get_text() == "You were hit by counted!"
+    assert str(received[0]) == "You were hit by counted!"
+    assert counter.count == 2
+
+
+def test_queue_is_bounded_when_nothing_processes_it():
+
+    events = model.EventQueue()
+    events.subscribe(lambda batch: None)
+
+    for i in range(model.EventQueue.MAX_QUEUED_EVENTS * 2):
+        events.publish(model.Event.HIT, "Hit {0}", i)
+
+    assert len(events.queue) == model.EventQueue.MAX_QUEUED_EVENTS
+    assert events.queue[-1].args == (model.EventQueue.MAX_QUEUED_EVENTS * 2 - 1,)
+
+
+def test_game_events_without_a_current_player():
+
+    game = new_game()
+    received = []
+    game.events.subscribe(received.extend)
+
+    game.remove_player("player1")
+    game.publish(model.Event.TRAP, "Nobody stepped on a trap")
+    game.events.process()
+
+    assert [(event.type, event.player_name) for event in received] == [(model.Event.TRAP, None)]
@@ -0,0 +1,107 @@
+import concurrent.futures
+
+import pytest
+
+import model
+from model.model import FloorBuilder
+
+
+def new_floor_builder(lazy: bool, cache_size: int = None):
+
+    floor_builder = FloorBuilder(model.Game.DATA_FILES_DIR, flyweight=True, lazy=lazy, cache_size=cache_size,
+                                 use_cache=model.Game.USE_DATA_CACHE)
+    floor_builder.initialise()
+    floor_builder.load_floors()
+
+    return floor_builder
+
+
+def test_lazy_floors_match_eager_floors():
+
+    eager_floors = new_floor_builder(lazy=False).floors
+    lazy_floors = new_floor_builder(lazy=True).floors
+
+    assert sorted(lazy_floors.keys()) == sorted(eager_floors.keys())
+    assert lazy_floors.loaded_floors() == {}
+
+    for floor_id, eager_floor in eager_floors.items():
+        assert str(lazy_floors[floor_id]) == str(eager_floor)
+
+
+def test_least_recently_used_floors_are_evicted():
+
+    floors = new_floor_builder(lazy=True, cache_size=2).floors
+    floor_ids = sorted(floors.keys())[:3]
+
+    first = floors[floor_ids[0]]
+    floors[floor_ids[1]]
+    floors[floor_ids[0]]
+    floors[floor_ids[2]]
+
+    assert sorted(floors.loaded_floors().keys()) == sorted([floor_ids[0], floor_ids[2]])
+    assert floors[floor_ids[0]] is first
+
+
+def test_modified_floors_and_floors_with_players_are_kept():
+
+    floors = new_floor_builder(lazy=True, cache_size=1).floors
+    floor_ids = sorted(floors.keys())[:4]
+
+    modified_floor = floors[floor_ids[0]]
+    modified_floor.remove_object([object for object in modified_floor.layers[1] if object.is_interactable][0])
+
+    occupied_floor = floors[floor_ids[1]]
+    occupied_floor.add_player(model.Player("player1", (0, 0, 32, 16), height=32))
+
+    floors[floor_ids[2]]
+    floors[floor_ids[3]]
+
+    loaded_floors = floors.loaded_floors()
+    assert loaded_floors[floor_ids[0]] is modified_floor
+    assert loaded_floors[floor_ids[1]] is occupied_floor
+    assert floor_ids[2] not in loaded_floors.keys()
+
+
+def test_furthest_floors_are_evicted_first():
+
+    floors = new_floor_builder(lazy=True, cache_size=2).floors
+    floor_ids = sorted(floors.keys())[:3]
+    floors.distance = lambda floor_id: -floor_id
+
+    for floor_id in floor_ids:
+        floors[floor_id]
+
+    # The lowest floor ID counts as the furthest away here
+    assert sorted(floors.loaded_floors().keys()) == floor_ids[1:]
+
+
+def test_background_loads_leave_evicting_to_the_game():
+
+    floors = new_floor_builder(lazy=True, cache_size=2).floors
+    floor_ids = sorted(floors.keys())[:3]
+
+    def distance(floor_id):
+        raise AssertionError("Only the game should work out how far away a floor is")
+
+    floors[floor_ids[0]]
+    floors[floor_ids[1]]
+    floors.distance = distance
+
+    # A floor loaded by a background thread doesn't evict anything...
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        prefetched = executor.submit(floors.load, floor_ids[2], evict=False).result()
+
+    assert sorted(floors.loaded_floors().keys()) == floor_ids
+
+    # ...until the game next gets a floor
+    floors.distance = lambda floor_id: -floor_id
+    assert floors[floor_ids[2]] is prefetched
+    assert sorted(floors.loaded_floors().keys()) == floor_ids[1:]
+
+
+def test_unknown_floors_raise_key_error():
+
+    floors = new_floor_builder(lazy=True).floors
+
+    with pytest.raises(KeyError):
+        floors[max(floors.keys()) + 1]
@@ -3,7 +3,7 @@ import logging
 
 def main():
 
-    new_floor = model.Floor(name = "floor1", rect = (0,0,1000,100))
+    new_floor = model.Floor(1, name = "floor1", rect = (0,0,1000,100))
 
     new_player = model.Player(name = "keith", rect = (10,10,20,20))
     new_floor.add_player(new_player)
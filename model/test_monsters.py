@@ -0,0 +1,102 @@
+import random
+
+import pytest
+
+import model
+from model.benchmark_model import TILE_WIDTH, generate_floor
+
+
+def new_monster_floor(monster_count: int, seed: int = 1):
+    """A walled floor with monsters scattered over the squares that are free"""
+
+    floor = generate_floor(20, 20, seed=seed)
+    rnd = random.Random(seed)
+
+    while len(floor.monsters) < monster_count:
+        monster = model.Monster("monster{0}".format(len(floor.monsters)),
+                                (rnd.randint(1, 18) * TILE_WIDTH, rnd.randint(1, 18) * TILE_WIDTH, 16, 16))
+        if floor.is_solid_colliding(monster) is False:
+            floor.add_monster(monster)
+
+    return floor
+
+
+def new_game():
+
+    game = model.Game("Test")
+    game.initialise()
+    game.add_player(game.create_player("player1"))
+
+    return game
+
+
+def test_game_starts_playing():
+
+    game = model.Game("Test")
+    with pytest.raises(Exception):
+        game.start()
+
+    game.initialise()
+    assert game.state == model.Game.READY
+
+    game.start()
+    assert game.state == model.Game.PLAYING
+
+    with pytest.raises(Exception):
+        game.start()
+
+
+def test_monster_updates_stay_within_budget():
+
+    count = model.MonsterEngine.MAX_UPDATES_PER_TICK * 2 + 50
+    floor = new_monster_floor(count)
+    engine = floor.monster_engine
+
+    # Each tick only the next batch of monsters round robin get a turn
+    engine.tick(1)
+    assert list(engine.last_ticks).count(1) == model.MonsterEngine.MAX_UPDATES_PER_TICK
+    engine.tick(2)
+    assert list(engine.last_ticks).count(2) == model.MonsterEngine.MAX_UPDATES_PER_TICK
+    engine.tick(3)
+    assert list(engine.last_ticks).count(3) == model.MonsterEngine.MAX_UPDATES_PER_TICK
+
+    # So every monster has had a turn within the last few ticks
+    assert min(engine.last_ticks) >= 1
+    assert len(engine) == count
+
+
+def test_monsters_never_end_up_inside_scenery():
+
+    floor = new_monster_floor(50)
+    player = model.Player("player1", (5 * TILE_WIDTH, 5 * TILE_WIDTH, 16, 16), height=32)
+
+    for tick in range(1, 200):
+        floor.monster_engine.tick(tick, player)
+        for monster in floor.monsters:
+            assert floor.is_solid_colliding(monster) is False
+
+
+def test_monsters_touching_the_player_hurt_them(monkeypatch):
+
+    # Stop the monsters moving so that the one next to the player stays there
+    monkeypatch.setattr(model.MonsterEngine, "SPEED", 0)
+
+    game = new_game()
+    game.start()
+    player = game.current_player
+    floor = game.current_floor
+
+    hits = []
+    game.events.subscribe(hits.extend, [model.Event.HIT])
+
+    floor.add_monster(model.Monster("monster1", (player.rect.right, player.rect.y, 16, 16)))
+    floor.add_monster(model.Monster("monster2", (0, 0, 16, 16)))
+    assert floor.monster_engine.touching(player) == [floor.monsters[0]]
+
+    hp = player.HP
+    for tick in range(model.Game.ENEMY_DAMAGE_RATE * 3):
+        game.tick()
+    game.events.process()
+
+    assert player.HP == hp - 3
+    assert [event.args for event in hits] == [("monster1",)] * 3
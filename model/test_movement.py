@@ -0,0 +1,46 @@
+import model
+
+
+def new_walled_floor():
+    """A 320x320 floor with a solid wall running down it at x=100"""
+
+    floor = model.Floor(1, "Sweep", (0, 0, 320, 320))
+    floor.add_objects([model.RPGObject("wall", (100, 0, 32, 320), layer=1, solid=True, interactable=False)])
+
+    player = model.Player("player1", (0, 0, 32, 16), height=32)
+    floor.add_player(player)
+    player.set_pos(50, 50)
+
+    return floor, player
+
+
+def test_sweep_stops_at_contact():
+
+    floor, player = new_walled_floor()
+
+    # The wall is 18 pixels to the right of the player and the edge of the floor 50 pixels to the left
+    assert floor.sweep(player, 40, 0) == 18
+    assert floor.sweep(player, 10, 0) == 10
+    assert floor.sweep(player, -100, 0) == -50
+    assert floor.sweep(player, 0, -100) == -50
+
+
+def test_move_actor_slides_along_walls():
+
+    floor, player = new_walled_floor()
+
+    assert floor.move_actor(player, 40, 10) == (18, 10)
+    assert player.get_pos() == (68, 60)
+
+    # Pushing into the wall only moves along it
+    assert floor.move_actor(player, 5, -20) == (0, -20)
+    assert player.get_pos() == (68, 40)
+
+
+def test_sweep_cannot_pass_through_walls():
+
+    floor, player = new_walled_floor()
+
+    floor.move_actor(player, 500, 0)
+    assert player.rect.right == 100
+    assert floor.is_solid_colliding(player) is False
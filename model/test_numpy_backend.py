@@ -0,0 +1,24 @@
+import pytest
+
+import model
+from model.benchmark_model import generate_floor, generate_probes
+
+
+def get_positions(found: list):
+    return [(object.name, object.get_pos()) for object in found]
+
+
+@pytest.mark.skipif(model.model.numpy is None, reason="NumPy is not installed")
+def test_numpy_backend_matches_python_backend():
+
+    python_floor = generate_floor(30, 30, collision_backend=model.Floor.PYTHON_COLLISIONS)
+    numpy_floor = generate_floor(30, 30, collision_backend=model.Floor.NUMPY_COLLISIONS)
+
+    for probe in generate_probes(python_floor, 500):
+        assert get_positions(numpy_floor.colliding_objects(probe)) == \
+               get_positions(python_floor.colliding_objects(probe))
+        assert get_positions(numpy_floor.touching_objects(probe)) == \
+               get_positions(python_floor.touching_objects(probe))
+        assert numpy_floor.is_solid_colliding(probe) == python_floor.is_solid_colliding(probe)
+        for dx, dy in ((7, 0), (-7, 0), (0, 7), (0, -7)):
+            assert numpy_floor.sweep(probe, dx, dy) == python_floor.sweep(probe, dx, dy)
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+import model
+from model.benchmark_model import DATA_FILES_DIR
+
+
+@pytest.fixture(scope="module", autouse=True)
+def floor_objects():
+    model.FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+
+def test_copies_match_their_prototype():
+
+    for object_code, floor_object in model.FloorObjectLoader.floor_objects.items():
+        copy = model.FloorObjectLoader.get_object_copy_by_code(object_code, 64, 96)
+
+        assert type(copy) is type(floor_object)
+        assert copy.get_pos() == (64, 96)
+        assert copy.get_prototype() == floor_object.get_prototype()
+
+
+def test_copies_are_independent():
+
+    first = model.FloorObjectLoader.get_object_copy_by_name(model.Objects.KEY, 0, 0)
+    second = model.FloorObjectLoader.get_object_copy_by_name(model.Objects.KEY, 0, 0)
+
+    first.move(10, 20)
+    first.is_visible = False
+
+    assert second.get_pos() == (0, 0)
+    assert second.is_visible is True
+    assert first.rect is not second.rect
+
+
+def test_clone_keeps_player_state():
+
+    player = model.Player("player1", (10, 20, 32, 16), height=32)
+    player.treasure, player.keys, player.boss_keys, player.HP = 3, 2, 1, 7
+
+    clone = player.clone()
+
+    assert isinstance(clone, model.Player)
+    assert clone.get_pos() == (10, 20)
+    assert (clone.name, clone.treasure, clone.keys, clone.boss_keys, clone.HP) == ("player1", 3, 2, 1, 7)
+
+
+def test_unknown_objects_are_rejected():
+
+    with pytest.raises(Exception):
+        model.FloorObjectLoader.get_object_copy_by_name("no such object")
+
+    with pytest.raises(Exception):
+        model.FloorObjectLoader.get_object_copy_by_code("no such code")
+
+
+def test_objects_have_no_instance_dict():
+
+    for object_class in (model.RPGObject, model.Player, model.Monster):
+        new_object = object_class("test", (0, 0, 32, 32))
+        assert not hasattr(new_object, "__dict__")
+
+        with pytest.raises(AttributeError):
+            new_object.not_a_slot = 1
+
+
+def test_memory_report_adds_up():
+
+    floor = model.Floor(1, "Report", (0, 0, 0, 0))
+    floor.add_objects([model.FloorObjectLoader.get_object_copy_by_name(model.Objects.KEY, x * 32, 0)
+                       for x in range(10)])
+
+    report = floor.memory_report()
+    layers = [report[layer_id] for layer_id in floor.layers.keys()]
+
+    assert report["total"]["objects"] == sum([layer["objects"] for layer in layers]) == 10
+    assert report["total"]["object_bytes"] == sum([layer["object_bytes"] for layer in layers]) > 0
+    assert report["total"]["total_bytes"] >= report["total"]["object_bytes"]
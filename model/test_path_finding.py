@@ -0,0 +1,113 @@
+import os
+import random
+
+import pytest
+
+import model
+from model.benchmark_model import DATA_FILES_DIR, TILE_WIDTH, generate_floor
+
+
+@pytest.fixture(scope="module", autouse=True)
+def floor_objects():
+    model.FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+
+def new_door_floor():
+    """A 10x10 tile floor split in two by a wall down the middle with a closed door half way along it"""
+
+    floor = model.Floor(1, "Door", (0, 0, 10 * TILE_WIDTH, 10 * TILE_WIDTH))
+
+    walls = [model.RPGObject("wall", (5 * TILE_WIDTH, y * TILE_WIDTH, TILE_WIDTH, TILE_WIDTH), layer=1, solid=True,
+                             interactable=False) for y in range(10) if y != 5]
+    door = model.RPGObject(model.Objects.DOOR, (5 * TILE_WIDTH, 5 * TILE_WIDTH, TILE_WIDTH, TILE_WIDTH), layer=1,
+                           solid=True, interactable=True)
+    floor.add_objects(walls + [door])
+
+    return floor, door
+
+
+def get_centre(column: int, row: int):
+    return column * TILE_WIDTH + TILE_WIDTH // 2, row * TILE_WIDTH + TILE_WIDTH // 2
+
+
+def test_grid_matches_solid_objects():
+
+    floor = generate_floor(20, 20, density=0.3)
+    path_finder = floor.path_finder
+    path_finder.check_built()
+
+    for cell in range(path_finder.columns * path_finder.rows):
+        blocked = len(floor.solid_rects(1, path_finder.get_cell_rect(cell))) > 0
+        assert path_finder.walkable[cell] == (0 if blocked else 1)
+
+
+def test_paths_are_as_short_as_the_flow_field():
+
+    floor = generate_floor(20, 20, density=0.3)
+    path_finder = floor.path_finder
+    path_finder.check_built()
+
+    rnd = random.Random(1)
+    cells = [cell for cell in range(path_finder.columns * path_finder.rows) if path_finder.walkable[cell] == 1]
+
+    for i in range(100):
+        start, goal = [path_finder.get_cell_centre(cell) for cell in rnd.sample(cells, 2)]
+        distance = path_finder.get_flow_field(goal)[path_finder.get_cell(*start)]
+        path = path_finder.find_path(start, goal)
+
+        if distance == model.PathFinder.UNREACHABLE:
+            assert path is None
+            continue
+
+        assert len(path) == distance
+        assert path[-1] == path_finder.get_cell_centre(path_finder.get_cell(*goal))
+
+        # Every step is to the walkable tile next to the last one
+        previous = path_finder.get_cell(*start)
+        for step in path:
+            cell = path_finder.get_cell(*step)
+            assert cell in path_finder.get_neighbours(previous)
+            previous = cell
+
+
+def test_flow_field_is_only_worked_out_again_when_the_target_changes_tile():
+
+    floor, door = new_door_floor()
+    path_finder = floor.path_finder
+
+    x, y = get_centre(2, 2)
+    distances = path_finder.get_flow_field((x, y))
+    assert path_finder.get_flow_field((x + 5, y + 5)) is distances
+    assert path_finder.get_flow_field((x + TILE_WIDTH, y)) is not distances
+
+    # The next step is always to a tile one closer to the target
+    x, y = get_centre(4, 8)
+    distances = path_finder.get_flow_field(get_centre(2, 2))
+    step = path_finder.get_flow_step((x, y), get_centre(2, 2))
+    assert distances[path_finder.get_cell(*step)] == distances[path_finder.get_cell(x, y)] - 1
+
+
+@pytest.mark.parametrize("open_door", ["remove", "swap"])
+def test_opening_a_door_updates_the_paths(open_door):
+
+    floor, door = new_door_floor()
+    path_finder = floor.path_finder
+    start, goal = get_centre(2, 5), get_centre(8, 5)
+
+    assert path_finder.find_path(start, goal) is None
+    assert path_finder.get_flow_field(goal)[path_finder.get_cell(*start)] == model.PathFinder.UNREACHABLE
+    assert path_finder.get_flow_step(start, goal) is None
+
+    if open_door == "remove":
+        floor.remove_object(door)
+    else:
+        floor.swap_object(door, model.Objects.DOOR_OPEN)
+
+    assert len(path_finder.find_path(start, goal)) == 6
+    assert path_finder.get_flow_field(goal)[path_finder.get_cell(*start)] == 6
+    assert path_finder.get_flow_step(start, goal) == get_centre(3, 5)
+
+    # The updated grid is the same as one built from scratch
+    rebuilt = model.PathFinder(floor)
+    rebuilt.build()
+    assert path_finder.walkable == rebuilt.walkable
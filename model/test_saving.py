@@ -0,0 +1,132 @@
+import random
+
+import pytest
+
+import model
+from model.benchmark_model import random_walk
+
+
+@pytest.fixture(params=[True, False], ids=["lazy", "eager"])
+def lazy_floors(request):
+
+    lazy = model.Game.LAZY_FLOORS
+    model.Game.LAZY_FLOORS = request.param
+    yield request.param
+    model.Game.LAZY_FLOORS = lazy
+
+
+def new_game(player_names=("player1",)):
+
+    game = model.Game("Test")
+    game.initialise()
+    for player_name in player_names:
+        game.add_player(game.create_player(player_name))
+
+    return game
+
+
+def play(game: model.Game, steps: int, seed: int = 1):
+    """Move the current player around randomly ticking the game every 19 steps like the controller does"""
+
+    walk = random_walk(random.Random(seed))
+    for step in range(steps):
+        game.move_player(*next(walk))
+        if step % 19 == 0:
+            game.tick()
+
+
+def get_floor_changes(game: model.Game, floor_ids):
+    return {floor_id: list(game.floor_factory.floors[floor_id].changes) for floor_id in floor_ids}
+
+
+def test_save_and_load_round_trip(tmp_path, lazy_floors):
+
+    game = new_game()
+    play(game, 5000)
+
+    # Make changes to a floor that the player hasn't been on and lock a link
+    floor = game.floor_factory.floors[2]
+    for object in [object for object in floor.layers.get(1, []) if object.is_interactable is True][:3]:
+        floor.remove_object(object)
+    game.current_map.lock(1, "NORTH", True)
+
+    changed_floor_ids = [int(floor_id) for floor_id in game.get_saved_state()["floors"].keys()]
+    assert 2 in changed_floor_ids
+    expected_changes = get_floor_changes(game, changed_floor_ids)
+
+    file_name = str(tmp_path / "test.sav")
+    game.save(file_name)
+
+    loaded_game = model.Game("Test")
+    loaded_game.load(file_name)
+
+    assert loaded_game.tick_count == game.tick_count
+    assert loaded_game.current_floor_id == game.current_floor_id
+    assert loaded_game.current_map.get_link_states() == game.current_map.get_link_states()
+
+    loaded_player = loaded_game.players["player1"]
+    player = game.players["player1"]
+    assert loaded_player.get_pos() == player.get_pos()
+    assert (loaded_player.treasure, loaded_player.keys, loaded_player.boss_keys, loaded_player.HP) == \
+           (player.treasure, player.keys, player.boss_keys, player.HP)
+
+    # Floors that weren't loaded get their changes put back when they are
+    assert get_floor_changes(loaded_game, expected_changes.keys()) == expected_changes
+
+    # Saving again straight away gives the same save
+    resaved_file_name = str(tmp_path / "resaved.sav")
+    loaded_game.save(resaved_file_name)
+    with open(file_name) as save_file, open(resaved_file_name) as resaved_file:
+        assert save_file.read() == resaved_file.read()
+
+
+def test_load_rejects_other_versions():
+
+    game = new_game()
+    saved_state = game.get_saved_state()
+    saved_state["version"] = model.Game.SAVE_VERSION + 1
+
+    with pytest.raises(Exception):
+        model.Game("Test").set_saved_state(saved_state)
+
+
+@pytest.mark.parametrize("saved_state", ["{", '{"version": 999}', '{"version": 1, "tick_count": 5}'],
+                         ids=["not json", "other version", "missing state"])
+def test_failed_load_leaves_game_alone(tmp_path, saved_state):
+
+    game = new_game()
+    game.start()
+    play(game, 500)
+
+    file_name = str(tmp_path / "bad.sav")
+    with open(file_name, 'w') as save_file:
+        save_file.write(saved_state)
+
+    expected_state = game.get_saved_state()
+    floor_factory = game.floor_factory
+    player = game.current_player
+
+    with pytest.raises(Exception):
+        game.load(file_name)
+
+    assert game.floor_factory is floor_factory
+    assert game.current_player is player
+    assert game.state == model.Game.PLAYING
+    assert game.get_saved_state() == expected_state
+
+    # The game carries on as if nothing happened
+    play(game, 100)
+
+
+def test_load_keeps_event_subscribers(tmp_path):
+
+    game = new_game()
+    game.save(str(tmp_path / "test.sav"))
+
+    events = []
+    game.events.subscribe(events.extend)
+    game.load(str(tmp_path / "test.sav"))
+
+    game.add_player(game.create_player("player2"))
+    game.events.process()
+    assert [event.args for event in events] == [("player2",)]
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+import model
+from model.benchmark_model import random_walk
+
+
+def new_game(player_names=("player1",)):
+
+    game = model.Game("Test")
+    game.initialise()
+    for player_name in player_names:
+        game.add_player(game.create_player(player_name))
+
+    return game
+
+
+def test_snapshot_encode_and_decode():
+
+    game = new_game(("player1", "player2"))
+    encoder = model.SnapshotEncoder()
+    decoder = model.SnapshotDecoder()
+    walk = random_walk(random.Random(1))
+    acked_sequence = None
+
+    for sequence in range(1, 1500):
+
+        for player_name in ("player1", "player2"):
+            game.select_player(player_name)
+            game.move_player(*next(walk))
+        if sequence % 19 == 0:
+            game.tick()
+
+        if sequence % 3 != 0:
+            continue
+
+        floor_id = game.player_floor_ids["player1"]
+        snapshot = model.FloorSnapshot.capture(floor_id, game.floor_factory.floors[floor_id], sequence)
+        encoder.add(snapshot)
+
+        # Send a full snapshot every so often and deltas from the last acknowledged one otherwise
+        message = encoder.encode(snapshot, acked_sequence if sequence % 90 != 0 else None)
+        decoded = decoder.decode(message)
+
+        assert decoded == snapshot
+        assert decoded.sequence == sequence
+        acked_sequence = sequence
+
+
+def test_delta_from_missing_snapshot_is_rejected():
+
+    game = new_game()
+    encoder = model.SnapshotEncoder()
+    floor = game.current_floor
+
+    first = model.FloorSnapshot.capture(game.current_floor_id, floor, 1)
+    encoder.add(first)
+    encoder.add(model.FloorSnapshot.capture(game.current_floor_id, floor, 2))
+
+    with pytest.raises(Exception):
+        model.SnapshotDecoder().decode(encoder.encode(encoder.snapshots[2], 1))
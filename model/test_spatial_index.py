@@ -0,0 +1,52 @@
+import os
+import random
+
+import model
+from model.benchmark_model import DATA_FILES_DIR, generate_floor, generate_probes, linear_colliding_objects, \
+    linear_touching_objects
+
+
+def get_positions(found: list):
+    return [(object.name, object.get_pos()) for object in found]
+
+
+def test_spatial_index_matches_linear_scan():
+
+    floor = generate_floor(30, 30, collision_backend=model.Floor.PYTHON_COLLISIONS)
+
+    for probe in generate_probes(floor, 500):
+        assert floor.colliding_objects(probe) == linear_colliding_objects(floor, probe)
+        assert floor.touching_objects(probe) == linear_touching_objects(floor, probe)
+
+
+def test_spatial_index_follows_removed_and_swapped_objects():
+
+    model.FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+    floor = generate_floor(20, 20, collision_backend=model.Floor.PYTHON_COLLISIONS)
+    rnd = random.Random(1)
+
+    interactable = [object for object in floor.layers[1] if object.is_interactable is True]
+    for object in rnd.sample(interactable, len(interactable) // 2):
+        if rnd.random() < 0.5:
+            floor.remove_object(object)
+        else:
+            floor.swap_object(object, model.Objects.DOOR_OPEN)
+
+    for probe in generate_probes(floor, 300):
+        assert get_positions(floor.colliding_objects(probe)) == \
+               get_positions(linear_colliding_objects(floor, probe))
+        assert get_positions(floor.touching_objects(probe)) == \
+               get_positions(linear_touching_objects(floor, probe))
+
+
+def test_moved_objects_are_found_where_they_are_now():
+
+    floor = generate_floor(20, 20, collision_backend=model.Floor.PYTHON_COLLISIONS)
+    player = model.Player("player1", (0, 0, 32, 16), height=32)
+    floor.add_player(player)
+
+    rnd = random.Random(1)
+    for i in range(500):
+        floor.move_player("player1", rnd.choice((-4, 0, 4)), rnd.choice((-4, 0, 4)))
+        assert floor.colliding_objects(player) == linear_colliding_objects(floor, player)
@@ -0,0 +1,60 @@
+import pytest
+
+import model
+
+
+@pytest.fixture
+def floor():
+
+    game = model.Game("Test")
+    game.initialise()
+
+    return game.floor_factory.floors[1]
+
+
+def get_tile_counts(floor: model.Floor):
+    return {layer: len(static_layer) for layer, static_layer in floor.static_layers.items()}
+
+
+def test_scenery_is_stored_as_flyweight_tiles(floor):
+
+    assert sum(get_tile_counts(floor).values()) > 0
+
+    for layer, static_layer in floor.static_layers.items():
+        for tile in static_layer.tiles():
+            assert tile.layer == layer
+            assert tile.is_interactable is False
+
+
+def test_colliding_objects_leaves_flyweight_tiles_alone(floor):
+
+    tile_counts = get_tile_counts(floor)
+
+    found = 0
+    for layer, static_layer in floor.static_layers.items():
+        for entry in static_layer.entries()[:50]:
+            rect = static_layer.get_rect(entry)
+            colliding = floor.colliding_objects(model.RPGObject("probe", (rect.x + 1, rect.y + 1, 4, 4), layer=layer))
+            assert rect in [object.rect for object in colliding]
+            found += len(colliding)
+
+    assert found > 0
+    assert get_tile_counts(floor) == tile_counts
+
+
+def test_get_object_at_materialises_just_that_tile(floor):
+
+    layer, static_layer = next(iter(floor.static_layers.items()))
+    entry = static_layer.entries()[0]
+    rect = static_layer.get_rect(entry)
+    tile_count = len(static_layer)
+
+    changed_object = floor.get_object_at(layer, rect.x, rect.y)
+
+    assert isinstance(changed_object, model.RPGObject)
+    assert changed_object.rect == rect
+    assert changed_object in floor.layers[layer]
+    assert len(static_layer) == tile_count - 1
+
+    floor.remove_object(changed_object)
+    assert floor.get_object_at(layer, rect.x, rect.y) is None
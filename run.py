@@ -1,12 +1,18 @@
+import argparse
 import controller
 import logging
 import os
 
 def main():
 
+    parser = argparse.ArgumentParser(description="Play Zelda Quest")
+    parser.add_argument("--record", default=None, help="record the inputs to this file so that the game can be replayed")
+    parser.add_argument("--replay", default=None, help="replay the inputs recorded in this file")
+    args = parser.parse_args()
+
     os.environ["SDL_VIDEO_CENTERED"] = "1"
     c = controller.Controller()
-    c.initialise()
+    c.initialise(record_file_name=args.record, replay_file_name=args.replay)
     c.run()
 
     exit(0)
@@ -14,4 +20,4 @@ def main():
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.WARN)
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,416 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Render the views off screen so the drawing benchmarks can run anywhere
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import model
+import utils.trpg as trpg
+import view
+from model.benchmark_model import DATA_FILES_DIR, TILE_WIDTH, generate_floor, generate_layout_file, generate_probes
+from model.model import FloorLayoutLoader, FloorObjectLoader
+from view.benchmark_view import move_actors
+
+'''
+A reproducible benchmark suite for the loaders, collision checks, movement and rendering.
+Every benchmark runs on generated data that is seeded so the same size always does the same work,
+and the results can be written as JSON and compared with the results from another commit.
+'''
+
+# The generated data for each size of benchmark:-
+#   tiles - width and depth of the generated floor in tiles
+#   density - fraction of the inside tiles of layer 1 that have an object on them
+#   monsters - monsters wandering around the floor
+#   layout scale - how many times wider and deeper the default floor layouts are made
+#   map size - width and depth of the generated grid of map locations
+SIZES = {"small": {"tiles": 20, "density": 0.15, "monsters": 5, "layout scale": 1, "map size": 5},
+         "medium": {"tiles": 50, "density": 0.15, "monsters": 20, "layout scale": 3, "map size": 15},
+         "large": {"tiles": 100, "density": 0.30, "monsters": 80, "layout scale": 10, "map size": 40}}
+
+# How big the floor view gets no matter how big the floor is
+MAX_VIEW_TILES = 25
+
+SEED = 1
+REPEAT = 5
+THRESHOLD = 0.10
+
+
+def generate_map_file(file_name: str, size: int):
+    """Write a map links file for a size x size grid of locations linked to their neighbours"""
+
+    with open(file_name, 'w') as map_file:
+        map_file.write("FromID,ToID,Direction,Description,Lockable,Locked,LockedDescription,Reversible,Hidden\n")
+        for y in range(size):
+            for x in range(size):
+                location_id = y * size + x + 1
+                if x < size - 1:
+                    map_file.write("{0},{1},EAST,through a door way,,,,,\n".format(location_id, location_id + 1))
+                if y < size - 1:
+                    map_file.write("{0},{1},SOUTH,through a door way,,,,,\n".format(location_id, location_id + size))
+
+
+def generate_monster_floor(params: dict, tiles: int = None):
+    """Build a floor of the benchmark size with a player in the middle and monsters scattered around"""
+
+    if tiles is None:
+        tiles = params["tiles"]
+
+    rnd = random.Random(SEED)
+
+    floor = generate_floor(tiles, tiles, SEED, params["density"])
+    floor.add_player(model.Player("player1", (0, 0, 32, 16), height=32))
+
+    for i in range(params["monsters"]):
+        floor.add_monster(model.Monster("monster{0}".format(i),
+                                        (rnd.randint(TILE_WIDTH, floor.rect.width - 2 * TILE_WIDTH),
+                                         rnd.randint(TILE_WIDTH, floor.rect.height - 2 * TILE_WIDTH), 32, 16),
+                                        height=32))
+
+    floor.pop_dirty_rects()
+
+    return floor
+
+
+def measure(setup, run, operations: int, repeat: int):
+    '''
+    Time run(setup()) repeat times, only counting the time spent in run, and get the best, median
+    and mean seconds per operation where each run does the given number of operations.
+    '''
+
+    times = []
+
+    for i in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        times.append((time.perf_counter() - start) / operations)
+
+    return {"operations": operations,
+            "repeat": repeat,
+            "best": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times)}
+
+
+def bench_object_load(params: dict, temp_dir: str, repeat: int):
+
+    file_name = os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")
+    loads = 20
+
+    def run(state):
+        for i in range(loads):
+            FloorObjectLoader(file_name).load()
+
+    return measure(lambda: None, run, loads, repeat)
+
+
+def bench_layout_load(params: dict, temp_dir: str, repeat: int):
+
+    FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+    file_name = os.path.join(temp_dir, "benchmark_floor_layouts.csv")
+    generate_layout_file(file_name, params["layout scale"])
+
+    def setup():
+        FloorLayoutLoader.floor_layouts.clear()
+
+    def run(state):
+        FloorLayoutLoader(file_name, flyweight=model.Game.FLYWEIGHT_FLOORS).load()
+
+    result = measure(setup, run, 1, repeat)
+    FloorLayoutLoader.floor_layouts.clear()
+
+    return result
+
+
+def bench_add_object(params: dict, temp_dir: str, repeat: int):
+
+    source_floor = generate_floor(params["tiles"], params["tiles"], SEED, params["density"])
+    new_objects = [floor_object for layer in source_floor.layers.values() for floor_object in layer]
+
+    def setup():
+        return model.Floor(SEED, "Benchmark", (0, 0, 0, 0))
+
+    def run(floor):
+        for new_object in new_objects:
+            floor.add_object(new_object)
+
+    return measure(setup, run, len(new_objects), repeat)
+
+
+def bench_move_player(params: dict, temp_dir: str, repeat: int, speed: int = 2):
+
+    moves = 2000
+    rnd = random.Random(SEED)
+    steps = [(rnd.choice((-speed, 0, speed)), rnd.choice((-speed, 0, speed))) for i in range(moves)]
+
+    def run(floor):
+        for dx, dy in steps:
+            floor.move_player("player1", dx, dy)
+
+    return measure(lambda: generate_monster_floor(params), run, moves, repeat)
+
+
+def bench_move_player_fast(params: dict, temp_dir: str, repeat: int):
+    return bench_move_player(params, temp_dir, repeat, speed=3 * TILE_WIDTH)
+
+
+def bench_monster_tick(params: dict, temp_dir: str, repeat: int):
+
+    ticks = 200
+
+    def setup():
+        floor = generate_monster_floor(params)
+        return floor, floor.players["player1"]
+
+    def run(state):
+        floor, player = state
+        for tick in range(1, ticks + 1):
+            floor.monster_engine.tick(tick, player)
+
+    return measure(setup, run, ticks, repeat)
+
+
+def bench_find_path(params: dict, temp_dir: str, repeat: int):
+
+    floor = generate_floor(params["tiles"], params["tiles"], SEED, params["density"])
+    floor.path_finder.check_built()
+
+    rnd = random.Random(SEED)
+    points = [(rnd.randint(floor.rect.left, floor.rect.right - 1), rnd.randint(floor.rect.top, floor.rect.bottom - 1))
+              for i in range(200)]
+
+    def run(state):
+        for start, goal in zip(points, reversed(points)):
+            floor.path_finder.find_path(start, goal)
+
+    return measure(lambda: None, run, len(points), repeat)
+
+
+def bench_touching_objects(params: dict, temp_dir: str, repeat: int):
+
+    floor = generate_floor(params["tiles"], params["tiles"], SEED, params["density"])
+    probes = generate_probes(floor, 2000, SEED)
+
+    def run(state):
+        for probe in probes:
+            floor.touching_objects(probe)
+
+    return measure(lambda: None, run, len(probes), repeat)
+
+
+def bench_map_load(params: dict, temp_dir: str, repeat: int, use_cache: bool = False):
+
+    file_name = os.path.join(temp_dir, "benchmark_maplinks.csv")
+    cache_file_name = os.path.join(temp_dir, "benchmark_maplinks.cache") if use_cache is True else None
+    generate_map_file(file_name, params["map size"])
+
+    def run(state):
+        trpg.MapFactory().load("Benchmark", 1, file_name, cache_file_name=cache_file_name)
+
+    # Compile the cache before anything gets timed
+    if use_cache is True:
+        run(None)
+
+    return measure(lambda: None, run, 1, repeat)
+
+
+def bench_map_load_cached(params: dict, temp_dir: str, repeat: int):
+    return bench_map_load(params, temp_dir, repeat, use_cache=True)
+
+
+def bench_floor_view_draw(params: dict, temp_dir: str, repeat: int):
+
+    frames = 200
+    tiles = min(params["tiles"], MAX_VIEW_TILES)
+
+    pygame.display.set_mode((tiles * TILE_WIDTH, tiles * TILE_WIDTH))
+    FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+    def setup():
+        floor = generate_monster_floor(params, tiles)
+        floor_view = view.FloorView(tiles * TILE_WIDTH, tiles * TILE_WIDTH)
+        floor_view.initialise(floor)
+        floor_view.draw()
+        floor_view.pop_dirty_rects()
+
+        # Move the actors up front so that only the drawing gets timed
+        rnd = random.Random(SEED)
+        frame_moves = []
+        for frame in range(frames):
+            move_actors(floor, rnd)
+            frame_moves.append(floor.pop_dirty_rects())
+
+        return floor, floor_view, frame_moves
+
+    def run(state):
+        floor, floor_view, frame_moves = state
+        for dirty_rects in frame_moves:
+            floor.dirty_rects = dirty_rects
+            floor_view.draw()
+
+    return measure(setup, run, frames, repeat)
+
+
+BENCHMARKS = (("FloorObjectLoader.load", bench_object_load),
+              ("FloorLayoutLoader.load", bench_layout_load),
+              ("Floor.add_object", bench_add_object),
+              ("Floor.move_player", bench_move_player),
+              ("Floor.move_player fast", bench_move_player_fast),
+              ("Floor.touching_objects", bench_touching_objects),
+              ("MonsterEngine.tick", bench_monster_tick),
+              ("PathFinder.find_path", bench_find_path),
+              ("MapFactory.load", bench_map_load),
+              ("MapFactory.load cached", bench_map_load_cached),
+              ("FloorView.draw", bench_floor_view_draw))
+
+
+def get_commit():
+    """Get the commit that is being benchmarked if this is a git checkout"""
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True, check=True)
+        return commit.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes: list, names: list = None, repeat: int = REPEAT):
+
+    results = {"meta": {"commit": get_commit(),
+                        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "python": platform.python_version(),
+                        "pygame": pygame.version.ver,
+                        "platform": platform.platform(),
+                        "seed": SEED},
+               "sizes": {size: SIZES[size] for size in sizes},
+               "results": {}}
+
+    pygame.init()
+    view.ImageManager().initialise()
+
+    for size in sizes:
+        results["results"][size] = {}
+        for name, benchmark in BENCHMARKS:
+            if names is not None and name not in names:
+                continue
+
+            # Hide the game's messages as objects are added to the floors
+            with contextlib.ExitStack() as stack:
+                temp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+                stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+                result = benchmark(SIZES[size], temp_dir, repeat)
+
+            results["results"][size][name] = result
+            print("{0:>8} {1:<24} {2:>12} {3:>12} {4:>12}".format(size, name, format_time(result["best"]),
+                                                                  format_time(result["median"]),
+                                                                  format_time(result["mean"])))
+
+    return results
+
+
+def format_time(seconds: float):
+
+    if seconds >= 1:
+        return "{0:.3f}s".format(seconds)
+    elif seconds >= 1e-3:
+        return "{0:.3f}ms".format(seconds * 1e3)
+    else:
+        return "{0:.2f}us".format(seconds * 1e6)
+
+
+def compare(baseline: dict, results: dict, threshold: float = THRESHOLD):
+    '''
+    Print how the median time of every benchmark that is in both sets of results has changed
+    and get the names of the ones that have got slower by more than the threshold.
+    '''
+
+    regressions = []
+
+    print("\nCompared with {0} ({1}):".format(baseline["meta"].get("commit"), baseline["meta"].get("time")))
+    print("{0:>8} {1:<24} {2:>12} {3:>12} {4:>8}".format("size", "benchmark", "baseline", "median", "change"))
+
+    for size, size_results in results["results"].items():
+        for name, result in size_results.items():
+            baseline_result = baseline["results"].get(size, {}).get(name)
+            if baseline_result is None:
+                continue
+
+            change = result["median"] / baseline_result["median"] - 1
+            if change > threshold:
+                flag = "SLOWER"
+                regressions.append("{0} {1}".format(size, name))
+            elif change < -threshold:
+                flag = "faster"
+            else:
+                flag = ""
+
+            print("{0:>8} {1:<24} {2:>12} {3:>12} {4:>+7.1%} {5}".format(size, name,
+                                                                         format_time(baseline_result["median"]),
+                                                                         format_time(result["median"]), change, flag))
+
+    return regressions
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark the loaders, collision checks, movement and rendering")
+    parser.add_argument("--size", choices=SIZES.keys(), action="append", help="size of data to benchmark with "
+                                                                               "(can be repeated, default all)")
+    parser.add_argument("--benchmark", action="append", help="name of a benchmark to run (can be repeated, "
+                                                             "default all)")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="number of times to run each benchmark")
+    parser.add_argument("--output", default=None, help="file to write the results to as JSON")
+    parser.add_argument("--compare", default=None, help="JSON results file from an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="fractional slow down that counts "
+                                                                           "as a regression")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        for name in args.benchmark:
+            if name not in dict(BENCHMARKS).keys():
+                parser.error("unknown benchmark '{0}' - choose from {1}".format(name, ", ".join(dict(BENCHMARKS))))
+
+    # Load the baseline first so that a bad file is found before spending time benchmarking
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    sizes = args.size if args.size is not None else list(SIZES.keys())
+
+    print("{0:>8} {1:<24} {2:>12} {3:>12} {4:>12}".format("size", "benchmark", "best", "median", "mean"))
+    results = run_benchmarks(sizes, args.benchmark, args.repeat)
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        print("Wrote results to {0}".format(args.output))
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+        if len(regressions) > 0:
+            print("{0} benchmark(s) slower by more than {1:.0%}: {2}".format(len(regressions), args.threshold,
+                                                                            ", ".join(regressions)))
+            sys.exit(1)
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARN)
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import contextlib
+import logging
+import os
+
+# Nothing gets displayed but make sure that SDL never tries to open a real window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import controller
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Run Zelda Quest without a display as fast as possible")
+    parser.add_argument("--frames", type=int, default=100000, help="number of frames to run")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the random input stream")
+    parser.add_argument("--script", default=None, help="file of scripted moves to run instead of random ones")
+    parser.add_argument("--quiet", action="store_true", help="hide the game's messages")
+    parser.add_argument("--profile", default=None, help="time the model's hot paths and dump them to PROFILE.json/.csv")
+    args = parser.parse_args()
+
+    # Nobody is listening to the game's messages when they are hidden so don't even queue them up
+    if args.quiet is True:
+        controller.HeadlessController.PRINT_EVENTS = False
+
+    c = controller.HeadlessController()
+
+    if args.profile is not None:
+        c.profiler.enable()
+
+    if args.script is not None:
+        inputs = controller.HeadlessController.scripted_inputs(args.script)
+    else:
+        inputs = controller.HeadlessController.random_inputs(args.seed)
+
+    with contextlib.ExitStack() as stack:
+        if args.quiet is True:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        c.initialise()
+        stats = c.run(inputs, max_frames=args.frames)
+
+    print("{frames} frames, {ticks} ticks and {moves} moves in {elapsed:.2f}s".format(**stats))
+    print("{ticks_per_second:.0f} ticks/s, {moves_per_second:.0f} moves/s, {frames_per_second:.0f} frames/s, "
+          "{floors_visited} floors visited, {dirty_rects} dirty regions pending".format(**stats))
+
+    if args.profile is not None:
+        c.profiler.disable()
+        c.profiler.dump_json(args.profile + ".json")
+        c.profiler.dump_csv(args.profile + ".csv")
+        print("Dumped profile to {0}.json and {0}.csv".format(args.profile))
+
+    exit(0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARN)
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+
+import controller
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Load test a Zelda Quest server with lots of simulated players")
+    parser.add_argument("--host", default=controller.GameServer.HOST, help="address of the server")
+    parser.add_argument("--port", type=int, default=controller.GameServer.PORT, help="port of the server")
+    parser.add_argument("--clients", type=int, default=200, help="number of simulated players")
+    parser.add_argument("--duration", type=float, default=10, help="seconds for each player to play for")
+    parser.add_argument("--ramp-up", type=float, default=2, help="seconds to spread the connections over")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the simulated players' moves")
+    parser.add_argument("--delta", action="store_true", help="get state as delta snapshots rather than JSON")
+    parser.add_argument("--spawn", action="store_true", help="start a server to test rather than use a running one")
+    parser.add_argument("--output", default=None, help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    server_process = None
+    if args.spawn is True:
+        server_process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                        "run_server.py"),
+                                           "--host", args.host, "--port", str(args.port), "--quiet"],
+                                          stdout=subprocess.PIPE, universal_newlines=True)
+        # Wait for the server to say that it is listening
+        for line in server_process.stdout:
+            if line.startswith("Listening") is True:
+                print(line.strip())
+                break
+
+    try:
+        tester = controller.LoadTester(args.host, args.port, args.seed,
+                                       controller.GameServer.DELTA_FORMAT if args.delta is True else
+                                       controller.GameServer.JSON_FORMAT)
+        stats = asyncio.run(tester.run(args.clients, args.duration, args.ramp_up))
+    finally:
+        if server_process is not None:
+            server_process.terminate()
+            server_process.wait()
+
+    latency = stats["latency"]
+    server = stats["server"]
+    print("{clients} clients connected ({failed} failed) for {elapsed:.1f}s".format(**stats))
+    print("{states_per_second:.0f} states/s received, {bytes_per_second:.0f} bytes/s".format(**stats))
+    print("input to step latency p50={0:.2f}ms p90={1:.2f}ms p99={2:.2f}ms".format(latency["p50"] * 1000,
+                                                                                   latency["p90"] * 1000,
+                                                                                   latency["p99"] * 1000))
+    print("server: {peak_players} players, {steps} steps, {late_steps} late, {dropped_steps} dropped, "
+          "{messages_dropped} messages dropped, {dirty_rects} dirty regions pending".format(**server))
+    print("server step p50={0:.3f}ms p99={1:.3f}ms, broadcast p50={2:.3f}ms p99={3:.3f}ms".format(
+        server["step"]["p50"] * 1000, server["step"]["p99"] * 1000,
+        server["broadcast"]["p50"] * 1000, server["broadcast"]["p99"] * 1000))
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(stats, output_file, indent=2)
+
+    exit(1 if stats["failed"] > 0 or stats["errors"] > 0 else 0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARN)
+    main()
@@ -0,0 +1,43 @@
+import argparse
+import contextlib
+import logging
+import os
+
+# Nothing gets displayed but make sure that SDL never tries to open a real window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import controller
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Replay a recorded game of Zelda Quest without a display "
+                                                 "as fast as possible and check that it ends up the same")
+    parser.add_argument("recording", help="file recorded with run.py --record")
+    parser.add_argument("--quiet", action="store_true", help="hide the game's messages")
+    args = parser.parse_args()
+
+    recording = controller.InputRecording.load(args.recording)
+    runner = controller.ReplayRunner()
+
+    with contextlib.ExitStack() as stack:
+        if args.quiet is True:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        stats = runner.run(recording)
+
+    print("{steps} steps, {ticks} ticks and {moves} moves in {elapsed:.2f}s".format(**stats))
+    print("{steps_per_second:.0f} steps/s, {moves_per_second:.0f} moves/s".format(**stats))
+
+    if stats["matched"] is True:
+        print("Replay matched the recording")
+        exit(0)
+
+    print("Replay did not match the recording: {final_state} {final_hash} != "
+          "{recorded_state} {recorded_hash}".format(**stats))
+    exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARN)
+    main()
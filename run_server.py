@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+
+# The server has no display but make sure that SDL never tries to open a real window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import controller
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Host Zelda Quest games for players connecting over TCP")
+    parser.add_argument("--host", default=controller.GameServer.HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=controller.GameServer.PORT, help="port to listen on")
+    parser.add_argument("--players", type=int, default=controller.GameServer.MAX_PLAYERS_PER_SESSION,
+                        help="most players in each game session")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--quiet", action="store_true", help="hide the game's messages")
+    args = parser.parse_args()
+
+    server = controller.GameServer(args.host, args.port, args.players)
+
+    async def serve():
+        await server.start()
+        print("Listening on {0}:{1}".format(server.host, server.port), flush=True)
+        try:
+            with contextlib.ExitStack() as stack:
+                if args.quiet is True:
+                    stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+                await server.run(args.duration)
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+    stats = server.get_stats()
+    print("{steps} steps, {late_steps} late, {dropped_steps} dropped, peak of {peak_players} players".format(**stats))
+    print("step p50={0:.3f}ms p99={1:.3f}ms max={2:.3f}ms".format(stats["step"]["p50"] * 1000,
+                                                                   stats["step"]["p99"] * 1000,
+                                                                   stats["step"]["max"] * 1000))
+
+    exit(0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARN)
+    main()
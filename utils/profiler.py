@@ -0,0 +1,207 @@
+import collections
+import csv
+import functools
+import inspect
+import json
+import logging
+import time
+
+'''
+This module contains a lightweight profiler for timing the hot paths of the game:-
+    - Timer - a rolling window of samples for a named timer with percentiles over the window
+    - Profiler - wraps methods and functions with timers when it is enabled and unwraps them when it is
+      disabled so that profiling costs nothing when it is turned off
+'''
+
+
+class Timer:
+    '''
+    Keeps the last window samples of a named timer (or any other value) along with running totals
+    for everything that has been recorded since it was created.
+    '''
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, name: str, window: int = 1000, units: str = "s"):
+        self.name = name
+        self.units = units
+        self.samples = collections.deque(maxlen=window)
+        self.clear()
+
+    def clear(self):
+        self.samples.clear()
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float, sorted_samples: list = None):
+        """Get the value that percent of the samples in the window are at or below"""
+
+        if sorted_samples is None:
+            sorted_samples = sorted(self.samples)
+
+        if len(sorted_samples) == 0:
+            return 0
+
+        return sorted_samples[min(len(sorted_samples) - 1, int(round(percent / 100 * (len(sorted_samples) - 1))))]
+
+    def get_summary(self):
+
+        sorted_samples = sorted(self.samples)
+
+        summary = {"units": self.units,
+                   "count": self.count,
+                   "total": self.total,
+                   "mean": self.total / self.count if self.count > 0 else 0,
+                   "max": self.max}
+
+        for percent in Timer.PERCENTILES:
+            summary["p{0}".format(percent)] = self.percentile(percent, sorted_samples)
+
+        return summary
+
+
+class Profiler:
+    '''
+    Times named targets - methods of classes or functions of modules - by swapping them for timed wrappers
+    while the profiler is enabled. Other values such as pixels drawn per frame can be recorded with record().
+    '''
+
+    WINDOW = 1000
+
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self.timers = collections.OrderedDict()
+        self.enabled = False
+
+        # The (name, owner, attribute name) of each target and the original attribute of each wrapped target
+        self.targets = []
+        self.originals = {}
+
+    def add_target(self, owner, attribute_name: str, name: str = None):
+        """Time calls to a method of a class or a function of a module whenever the profiler is enabled"""
+
+        if name is None:
+            name = "{0}.{1}".format(owner.__name__.split(".")[-1] if inspect.isclass(owner) else owner.__name__,
+                                    attribute_name)
+
+        self.targets.append((name, owner, attribute_name))
+        self.get_timer(name)
+
+        if self.enabled is True:
+            self.wrap_target(name, owner, attribute_name)
+
+    def get_timer(self, name: str, units: str = "s"):
+
+        if name not in self.timers.keys():
+            self.timers[name] = Timer(name, self.window, units)
+
+        return self.timers[name]
+
+    def enable(self):
+
+        if self.enabled is False:
+            for name, owner, attribute_name in self.targets:
+                self.wrap_target(name, owner, attribute_name)
+            self.enabled = True
+            logging.info("%s.enable(): Profiling %i targets", __class__, len(self.targets))
+
+    def disable(self):
+
+        if self.enabled is True:
+            for name, owner, attribute_name in self.targets:
+                self.unwrap_target(owner, attribute_name)
+            self.enabled = False
+            logging.info("%s.disable(): Stopped profiling", __class__)
+
+    def toggle(self):
+
+        if self.enabled is True:
+            self.disable()
+        else:
+            self.enable()
+
+        return self.enabled
+
+    def reset(self):
+        for timer in self.timers.values():
+            timer.clear()
+
+    def record(self, name: str, value, units: str = "s"):
+        """Record a value for a named timer if profiling is enabled"""
+
+        if self.enabled is True:
+            self.get_timer(name, units).add(value)
+
+    def wrap_target(self, name: str, owner, attribute_name: str):
+
+        # Get the attribute without triggering any descriptors so static and class methods can be put back as they were
+        original = inspect.getattr_static(owner, attribute_name)
+        self.originals[(owner, attribute_name)] = (original, attribute_name in vars(owner))
+
+        if isinstance(original, (staticmethod, classmethod)):
+            wrapped = type(original)(self.timed(name, original.__func__))
+        else:
+            wrapped = self.timed(name, original)
+
+        setattr(owner, attribute_name, wrapped)
+
+    def unwrap_target(self, owner, attribute_name: str):
+
+        original, was_own_attribute = self.originals.pop((owner, attribute_name))
+
+        if was_own_attribute is True:
+            setattr(owner, attribute_name, original)
+        else:
+            delattr(owner, attribute_name)
+
+    def timed(self, name: str, function):
+
+        timer = self.get_timer(name)
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def timed_function(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timer.add(perf_counter() - start)
+
+        return timed_function
+
+    def get_report(self):
+        """Get a summary of every timer that has recorded anything"""
+
+        return collections.OrderedDict([(name, timer.get_summary()) for name, timer in self.timers.items()
+                                        if timer.count > 0])
+
+    def dump_json(self, file_name: str):
+
+        with open(file_name, 'w') as json_file:
+            json.dump(self.get_report(), json_file, indent=2)
+
+        logging.info("%s.dump_json(): Wrote profile to '%s'", __class__, file_name)
+
+    def dump_csv(self, file_name: str):
+
+        report = self.get_report()
+        fields = ["name", "units", "count", "total", "mean", "max"] + \
+                 ["p{0}".format(percent) for percent in Timer.PERCENTILES]
+
+        with open(file_name, 'w', newline='') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=fields)
+            writer.writeheader()
+            for name, summary in report.items():
+                row = dict(summary)
+                row["name"] = name
+                writer.writerow(row)
+
+        logging.info("%s.dump_csv(): Wrote profile to '%s'", __class__, file_name)
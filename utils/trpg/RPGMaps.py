@@ -1,7 +1,12 @@
 __author__ = 'JaneW'
 
+import collections
 import csv
+import hashlib
 import logging
+import mmap
+import os
+import struct
 '''
 This module contains some framework classes for creating maps:-
     - Location - basic description of a location
@@ -59,7 +64,7 @@ class MapLink:
     def get_reverse_link(self):
         return MapLink(self.to_id, self.from_id, self.get_reverse_direction(self.direction), self.description, \
                        is_lockable=self.is_lockable, locked=self.locked, \
-                       locked_description=self.locked_description, reversible=self.reversible)
+                       locked_description=self.locked_description, reversible=self.reversible, hidden=self.hidden)
 
     # Given a valid direction look-up its reverse
     def get_reverse_direction(self, direction):
@@ -89,13 +94,18 @@ class MapLink:
     # Check if the link is hidden
     def is_hidden(self):
 
-        return self.is_hidden
+        return self.hidden
 
     # hide/unhide a link
     def hide(self, is_hidden : bool = True):
 
         self.hidden = is_hidden
 
+    # Check if you can currently go through the link i.e. it is not locked or hidden
+    def is_passable(self):
+
+        return self.is_locked() == False and self.hidden == False
+
     # Convert the MapLink object to a string
     def __str__(self):
         link_description = "Go " + self.direction + " from " + str(
@@ -111,6 +121,9 @@ class LevelMap:
     The LevelMap class holds the details of how all of the locations in the map link together
     The map is stored as a dictionary that for each location ID stores the list of available MapLinks
     These MapLinks represent all of the directions that you can travel in from that location
+    An index of the links by location and direction and the distances from each location that has been asked
+    about are worked out when first needed and kept until the links change. Links should be locked and hidden
+    through the LevelMap rather than the MapLink so that it can throw away any distances that have changed.
     '''
 
     # Constructor
@@ -123,6 +136,14 @@ class LevelMap:
         # A map to store the list of links for each location ID in the map
         self.mapLinks = {}
 
+        # For each location ID a map of direction to link
+        self._link_index = None
+
+        # For each location ID that has been asked about the distance to every location that can be reached from
+        # it using any link and the (distance, links taken) to each location using just the passable links
+        self._distances = {}
+        self._passable_routes = {}
+
     # Add a new link to the map and also add the reverse link
     # e.g. if you can go East from 1 to 2, you can go West from 2 to 1
     def add_link(self, new_link):
@@ -160,45 +181,172 @@ class LevelMap:
             # and store it back in the map of locations to links
             self.mapLinks[new_link.to_id] = list_links
 
+        self.invalidate()
+
+    # Throw away the index and distances so that they get worked out again from the links
+    def invalidate(self):
+
+        self._link_index = None
+        self._distances.clear()
+        self._passable_routes.clear()
+
     # Get the list of links for a specified location in the map
     def get_location_links(self, location_id):
         return self.mapLinks.get(location_id)
 
     # Get the map of links for a specified location in the map keyed by direction
+    # The map is shared so it must not be changed
     def get_location_links_map(self, location_id):
-        link_map = {}
-        for link in self.get_location_links(location_id):
-            link_map[link.direction] = link
-        return link_map
 
-    # lock/unlock the specified link and its reverse link
-    def lock(self, location_id, direction, is_locked):
+        if self._link_index is None:
+
+            # If there is more than one link in the same direction then the last one wins
+            self._link_index = {}
+            for from_id, location_links in self.mapLinks.items():
+                link_map = {}
+                for link in location_links:
+                    link_map[link.direction] = link
+                self._link_index[from_id] = link_map
+
+        return self._link_index.get(location_id, {})
+
+    # Get the link in a specified direction from a location or None if there isn't one
+    def get_link(self, location_id, direction):
+        return self.get_location_links_map(location_id).get(direction)
+
+    # Get how many links you need to go through to get from a location to each location that you can reach
+    # The distances are shared so they must not be changed
+    def get_distances(self, location_id):
+
+        distances = self._distances.get(location_id)
+
+        if distances is None:
+            distances = {location_id: 0}
+            to_visit = collections.deque([location_id])
+
+            while len(to_visit) > 0:
+                selected_location_id = to_visit.popleft()
+                for link in self.mapLinks.get(selected_location_id, []):
+                    if link.to_id not in distances:
+                        distances[link.to_id] = distances[selected_location_id] + 1
+                        to_visit.append(link.to_id)
+
+            self._distances[location_id] = distances
+
+        return distances
+
+    # Get the (distance, last link taken) on the shortest route from a location to each location that you can
+    # currently get to going only through links that are not locked or hidden
+    def get_passable_routes(self, location_id):
+
+        routes = self._passable_routes.get(location_id)
+
+        if routes is None:
+            routes = {location_id: (0, None)}
+            to_visit = collections.deque([location_id])
+
+            while len(to_visit) > 0:
+                selected_location_id = to_visit.popleft()
+                distance = routes[selected_location_id][0] + 1
+                for link in self.mapLinks.get(selected_location_id, []):
+                    if link.to_id not in routes and link.is_passable() == True:
+                        routes[link.to_id] = (distance, link)
+                        to_visit.append(link.to_id)
+
+            self._passable_routes[location_id] = routes
+
+        return routes
+
+    # Get the list of links to go through on the shortest route from one location to another or None if you can't
+    # currently get there because of locked or hidden links
+    def get_route(self, from_id, to_id):
 
-        # get the map of links for the specified location
-        link_map = self.get_location_links_map(location_id)
+        routes = self.get_passable_routes(from_id)
+        if to_id not in routes.keys():
+            return None
 
-        # if specified direction has a link...
-        if (direction in link_map.keys()):
+        route = []
+        link = routes[to_id][1]
+        while link is not None:
+            route.append(link)
+            link = routes[link.from_id][1]
+        route.reverse()
 
-            # get the link and lock/unlock it
-            selected_link = link_map[direction]
-            selected_link.lock(is_locked)
+        return route
 
-            # find out what the reverse link looks like
-            reverse_link = selected_link.get_reverse_link()
+    # Check if you can currently get from one location to another
+    def is_reachable(self, from_id, to_id):
+        return to_id in self.get_passable_routes(from_id).keys()
 
-            # loop through all of the links from the 'to' location
-            for selected in self.mapLinks[selected_link.to_id]:
+    # Get the locations that you can currently get to from a location going through at most the specified number of links
+    def get_locations_within(self, location_id, hops):
+        return [to_id for to_id, (distance, link) in self.get_passable_routes(location_id).items() if distance <= hops]
 
-                # if we find the link that is the reverse then lock/unlock it
-                if selected.to_id == location_id and selected.direction == reverse_link.direction:
-                    selected.lock(is_locked)
+    # Throw away the passable routes that could be changed by a link between two locations being locked or
+    # hidden or unlocked or unhidden. A route from somewhere can only change if it could get to one end of the link.
+    def invalidate_routes(self, link):
+
+        for location_id, routes in list(self._passable_routes.items()):
+            if link.from_id in routes.keys() or link.to_id in routes.keys():
+                del self._passable_routes[location_id]
+
+    # Get the specified link and its reverse link if there is one
+    def get_link_pair(self, location_id, direction):
+
+        selected_link = self.get_link(location_id, direction)
+        if selected_link is None:
+            return []
+
+        links = [selected_link]
+
+        reverse_link = self.get_link(selected_link.to_id, selected_link.get_reverse_direction(direction))
+        if reverse_link is not None and reverse_link.to_id == location_id:
+            links.append(reverse_link)
+
+        return links
+
+    # lock/unlock the specified link and its reverse link
+    def lock(self, location_id, direction, is_locked):
+
+        links = self.get_link_pair(location_id, direction)
+
+        # if specified direction has a link then lock/unlock it and its reverse link
+        if len(links) > 0:
+            self.invalidate_routes(links[0])
+            for selected_link in links:
+                selected_link.lock(is_locked)
 
         # else the specified link could not be found to lock it
         else:
             logging.warning(
                 "Lock(" + str(is_locked) + "): No link found " + direction + " from location " + str(location_id))
 
+    # hide/unhide the specified link and its reverse link
+    def hide(self, location_id, direction, is_hidden):
+
+        links = self.get_link_pair(location_id, direction)
+
+        # if specified direction has a link then hide/unhide it and its reverse link
+        if len(links) > 0:
+            self.invalidate_routes(links[0])
+            for selected_link in links:
+                selected_link.hide(is_hidden)
+
+        # else the specified link could not be found to hide it
+        else:
+            logging.warning(
+                "Hide(" + str(is_hidden) + "): No link found " + direction + " from location " + str(location_id))
+
+    # Get the (locked, hidden) state of every link in the map keyed by (from location ID, direction)
+    def get_link_states(self):
+
+        link_states = {}
+        for location_id, links in self.mapLinks.items():
+            for link in links:
+                link_states[(location_id, link.direction)] = (link.is_locked(), link.is_hidden())
+
+        return link_states
+
     # Print out all of the locations in the Level Map
     def print(self):
 
@@ -224,14 +372,123 @@ class MapFactory(object):
         # A dictionary of level ID to LevelMap
         self._maps = {}
 
-    def load(self, map_name: str, map_level: int, map_file_name: str):
+    # Compiled map link cache format
+    CACHE_MAGIC = b"ZQMC"
+    CACHE_VERSION = 1
+    CACHE_HEADER = struct.Struct("<4sH20sI")
+    CACHE_LINK = struct.Struct("<iiB")
+    CACHE_STRING_SIZE = struct.Struct("<H")
+
+    LOCKABLE = 1
+    LOCKED = 2
+    REVERSIBLE = 4
+    HIDDEN = 8
+
+    def load(self, map_name: str, map_level: int, map_file_name: str, cache_file_name: str = None):
 
         # Create a map of level and add it to the Factory
         new_map = LevelMap(map_level, map_name)
         self._maps[new_map.level] = new_map
 
+        # If there is an up to date compiled cache of the map file then load the links from that
+        if cache_file_name is not None:
+            checksum = MapFactory.get_checksum(map_file_name)
+            map_links = self.load_cache(cache_file_name, checksum)
+            if map_links is not None:
+                logging.info("%s.load(): Loading new map %s from cache '%s'.", __class__, new_map.name,
+                             cache_file_name)
+                for new_map_link in map_links:
+                    new_map.add_link(new_map_link)
+                return
+
+        map_links = self.load_links(new_map, map_file_name)
+
+        # Compile the links that were just loaded so that the next load can skip the CSV parsing
+        if cache_file_name is not None:
+            try:
+                self.write_cache(cache_file_name, checksum, map_links)
+            except OSError as err:
+                logging.warning("%s.load(): Unable to write map cache '%s' - %s", __class__, cache_file_name, err)
+
+    @staticmethod
+    def get_checksum(map_file_name: str):
+        checksum = hashlib.sha1(struct.pack("<H", MapFactory.CACHE_VERSION))
+        with open(map_file_name, 'rb') as data_file:
+            checksum.update(data_file.read())
+        return checksum.digest()
+
+    def load_cache(self, cache_file_name: str, checksum: bytes):
+        """Read the MapLinks out of a memory mapped cache file or return None if it is missing or out of date"""
+
+        try:
+            with open(cache_file_name, 'rb') as cache_file:
+                data = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        with data:
+
+            if len(data) < MapFactory.CACHE_HEADER.size:
+                return None
+
+            magic, version, cache_checksum, count = MapFactory.CACHE_HEADER.unpack_from(data, 0)
+            if magic != MapFactory.CACHE_MAGIC or version != MapFactory.CACHE_VERSION or \
+                    cache_checksum != checksum:
+                return None
+
+            def read_string(offset):
+                size, = MapFactory.CACHE_STRING_SIZE.unpack_from(data, offset)
+                offset += MapFactory.CACHE_STRING_SIZE.size
+                return data[offset:offset + size].decode(), offset + size
+
+            map_links = []
+            offset = MapFactory.CACHE_HEADER.size
+            for i in range(count):
+                from_loc_id, to_loc_id, flags = MapFactory.CACHE_LINK.unpack_from(data, offset)
+                offset += MapFactory.CACHE_LINK.size
+                direction, offset = read_string(offset)
+                description, offset = read_string(offset)
+                locked_description, offset = read_string(offset)
+
+                map_links.append(MapLink(from_loc_id, to_loc_id, direction, description,
+                                         flags & MapFactory.LOCKABLE != 0, flags & MapFactory.LOCKED != 0,
+                                         locked_description, flags & MapFactory.REVERSIBLE != 0,
+                                         flags & MapFactory.HIDDEN != 0))
+
+        return map_links
+
+    def write_cache(self, cache_file_name: str, checksum: bytes, map_links: list):
+
+        def pack_string(value):
+            encoded = ("" if value is None else value).encode()
+            return MapFactory.CACHE_STRING_SIZE.pack(len(encoded)) + encoded
+
+        data = bytearray()
+        data += MapFactory.CACHE_HEADER.pack(MapFactory.CACHE_MAGIC, MapFactory.CACHE_VERSION, checksum,
+                                             len(map_links))
+        for map_link in map_links:
+            flags = (MapFactory.LOCKABLE if map_link.is_lockable else 0) | \
+                    (MapFactory.LOCKED if map_link.locked else 0) | \
+                    (MapFactory.REVERSIBLE if map_link.reversible else 0) | \
+                    (MapFactory.HIDDEN if map_link.hidden else 0)
+            data += MapFactory.CACHE_LINK.pack(map_link.from_id, map_link.to_id, flags)
+            data += pack_string(map_link.direction)
+            data += pack_string(map_link.description)
+            data += pack_string(map_link.locked_description)
+
+        # Write to a temporary file first so a half written cache is never left behind
+        with open(cache_file_name + ".tmp", 'wb') as cache_file:
+            cache_file.write(data)
+        os.replace(cache_file_name + ".tmp", cache_file_name)
+
+        logging.info("%s.write_cache(): Wrote %i map links to '%s'.", __class__, len(map_links), cache_file_name)
+
+    def load_links(self, new_map, map_file_name: str):
+
         logging.info("%s.load(): Loading new map %s from '%s'.", __class__, new_map.name, map_file_name)
 
+        map_links = []
+
         # Attempt to open the map file
         with open(map_file_name, 'r') as data_file:
 
@@ -300,6 +557,9 @@ class MapFactory(object):
                              __class__, new_map_link.from_id, new_map_link.direction, new_map_link.to_id)
 
                 new_map.add_link(new_map_link)
+                map_links.append(new_map_link)
+
+        return map_links
 
     # Return the LevelMap with the specified ID
     def get_map(self, id):
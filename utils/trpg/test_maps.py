@@ -0,0 +1,127 @@
+import collections
+import random
+
+from utils.trpg import LevelMap, MapLink
+
+
+def new_grid_map(size: int):
+    """A size x size grid of locations with a lockable link between each pair of neighbours"""
+
+    level_map = LevelMap(1, "Grid")
+
+    for row in range(size):
+        for column in range(size):
+            location_id = row * size + column
+            if column < size - 1:
+                level_map.add_link(MapLink(location_id, location_id + 1, "EAST", "along a path", is_lockable=True))
+            if row < size - 1:
+                level_map.add_link(MapLink(location_id, location_id + size, "SOUTH", "along a path", is_lockable=True))
+
+    return level_map
+
+
+def get_passable_distances(level_map: LevelMap, location_id):
+    """Work out how far away each location is through the passable links the slow way"""
+
+    distances = {location_id: 0}
+    to_visit = collections.deque([location_id])
+
+    while len(to_visit) > 0:
+        selected_location_id = to_visit.popleft()
+        for link in level_map.get_location_links(selected_location_id):
+            if link.to_id not in distances and link.is_locked() is False and link.is_hidden() is False:
+                distances[link.to_id] = distances[selected_location_id] + 1
+                to_visit.append(link.to_id)
+
+    return distances
+
+
+def test_route_goes_through_linked_locations():
+
+    level_map = new_grid_map(5)
+
+    route = level_map.get_route(0, 24)
+    assert len(route) == 8
+    assert route[0].from_id == 0
+    assert route[-1].to_id == 24
+    for link, next_link in zip(route, route[1:]):
+        assert link.to_id == next_link.from_id
+
+    assert level_map.get_route(12, 12) == []
+    assert sorted(level_map.get_locations_within(12, 1)) == [7, 11, 12, 13, 17]
+
+
+def test_locking_a_link_changes_the_routes_through_it():
+
+    level_map = new_grid_map(3)
+
+    # Shut location 0 in apart from the link EAST to 1
+    level_map.lock(0, "SOUTH", True)
+    assert [link.to_id for link in level_map.get_route(0, 3)] == [1, 4, 3]
+    assert [link.to_id for link in level_map.get_route(3, 0)] == [4, 1, 0]
+
+    level_map.lock(1, "WEST", True)
+    assert level_map.get_route(0, 3) is None
+    assert level_map.is_reachable(3, 0) is False
+    assert level_map.get_locations_within(0, 10) == [0]
+
+    # Unlocking the link puts the shortest route back
+    level_map.lock(3, "NORTH", False)
+    assert [link.to_id for link in level_map.get_route(0, 3)] == [3]
+    assert level_map.is_reachable(3, 0) is True
+
+
+def test_hidden_links_are_not_passable():
+
+    level_map = new_grid_map(2)
+
+    level_map.hide(0, "EAST", True)
+    level_map.hide(0, "SOUTH", True)
+    assert level_map.is_reachable(0, 3) is False
+    assert level_map.get_link(1, "WEST").is_hidden() is True
+
+    level_map.hide(1, "WEST", False)
+    assert len(level_map.get_route(0, 3)) == 2
+
+
+def test_routes_only_thrown_away_if_they_could_change():
+
+    level_map = new_grid_map(4)
+
+    # Cut the map in two down the middle
+    for row in range(4):
+        level_map.lock(row * 4 + 1, "EAST", True)
+
+    left_routes = level_map.get_passable_routes(0)
+    right_routes = level_map.get_passable_routes(3)
+
+    level_map.lock(4, "EAST", True)
+    assert level_map.get_passable_routes(3) is right_routes
+    assert level_map.get_passable_routes(0) is not left_routes
+
+
+def test_routes_match_brute_force_after_locks_and_hides():
+
+    level_map = new_grid_map(6)
+    rnd = random.Random(1)
+
+    for i in range(1000):
+
+        location_id = rnd.randrange(36)
+        direction = rnd.choice(list(level_map.get_location_links_map(location_id).keys()))
+        if rnd.random() < 0.7:
+            level_map.lock(location_id, direction, rnd.random() < 0.5)
+        else:
+            level_map.hide(location_id, direction, rnd.random() < 0.3)
+
+        from_id, to_id = rnd.randrange(36), rnd.randrange(36)
+        distances = get_passable_distances(level_map, from_id)
+        route = level_map.get_route(from_id, to_id)
+
+        assert level_map.is_reachable(from_id, to_id) == (to_id in distances)
+        assert (route is None) == (to_id not in distances)
+        if route is not None:
+            assert len(route) == distances[to_id]
+            assert all(link.is_passable() for link in route)
+        assert sorted(level_map.get_locations_within(from_id, 3)) == \
+               sorted([location_id for location_id, distance in distances.items() if distance <= 3])
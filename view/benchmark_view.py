@@ -0,0 +1,197 @@
+import logging
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+
+import model
+import view
+from model.benchmark_model import DATA_FILES_DIR, generate_floor
+from model.model import FloorLayoutLoader, FloorObjectLoader
+
+RESOURCES_DIR = os.path.join(os.path.dirname(__file__), "resources", "")
+
+FLOOR_WIDTH = 20
+FLOOR_DEPTH = 20
+
+
+def generate_busy_floor(monster_count: int, seed: int = 1):
+    '''
+    Build a floor that fills the view with scenery and has a player and a crowd of monsters on it.
+    '''
+
+    rnd = random.Random(seed)
+
+    floor = generate_floor(FLOOR_WIDTH, FLOOR_DEPTH, seed)
+
+    floor.add_player(model.Player("player1", (0, 0, 32, 16), height=32))
+
+    for i in range(monster_count):
+        floor.add_monster(model.Monster("monster{0}".format(i),
+                                        (rnd.randint(32, floor.rect.width - 64), rnd.randint(32, floor.rect.height - 64),
+                                         32, 16), height=32))
+
+    return floor
+
+
+def move_actors(floor: model.Floor, rnd: random.Random):
+    """Move the player and every monster a couple of pixels in a random direction"""
+
+    floor.move_player("player1", rnd.choice((-2, 0, 2)), rnd.choice((-2, 0, 2)))
+
+    for monster in floor.monsters:
+        start_rect = monster.rect.copy()
+        monster.move(rnd.choice((-2, 0, 2)), rnd.choice((-2, 0, 2)))
+        if floor.rect.contains(monster.rect) is False:
+            monster.back()
+        floor.mark_dirty(monster.layer, start_rect.union(monster.rect), actor=True)
+
+
+def full_redraw(floor_view: view.FloorView):
+    """Draw a frame the old way by redrawing every object on layer 1 and blitting every layer"""
+
+    floor = floor_view.floor
+    floor.pop_dirty_rects()
+
+    floor_view.surface.fill(view.FloorView.BG_COLOUR)
+
+    for layer_id in sorted(floor_view.layer_surfaces.keys()):
+        surface = floor_view.layer_surfaces[layer_id]
+        if layer_id == 1:
+            surface.fill(view.FloorView.TRANSPARENT)
+            view_objects = list(floor.players.values()) + floor_view.get_scenery(1) + floor.monsters
+            for view_object in sorted(view_objects, key=lambda obj: obj.rect.y):
+                floor_view.draw_object(surface, view_object)
+        floor_view.surface.blit(surface, (0, 0))
+
+    # Put the cached layer 1 scenery back for the next method
+    floor_view.draw_layer(floor_view.layer_surfaces[1], 1)
+    floor_view.mark_dirty()
+
+
+def region_redraw(floor_view: view.FloorView):
+    """Draw a frame by redrawing the scenery as well as the actors in each changed region"""
+
+    floor = floor_view.floor
+    floor.dirty_rects = [(layer_id, rect, False) for layer_id, rect, actor in floor.dirty_rects]
+
+    floor_view.draw()
+
+
+def time_frames(draw, floor: model.Floor, frame_count: int):
+
+    floor_view = view.FloorView(FLOOR_WIDTH * 32, FLOOR_DEPTH * 32)
+    floor_view.initialise(floor)
+    floor_view.draw()
+    floor_view.pop_dirty_rects()
+
+    rnd = random.Random(1)
+    elapsed = 0
+    pixels = 0
+
+    for frame in range(frame_count):
+        move_actors(floor, rnd)
+
+        start = time.perf_counter()
+        draw(floor_view)
+        elapsed += time.perf_counter() - start
+
+        pixels += sum([rect.width * rect.height for rect in view.merge_rects(floor_view.pop_dirty_rects())])
+
+    return elapsed / frame_count, pixels / frame_count
+
+
+def benchmark_frames(monster_counts=(0, 10, 40), frame_count: int = 300):
+    '''
+    Compare the time to draw a frame on a busy floor by redrawing all of layer 1, by redrawing the
+    scenery and actors in the changed regions and by drawing just the actors over the cached scenery.
+    '''
+
+    pygame.display.set_mode((FLOOR_WIDTH * 32, FLOOR_DEPTH * 32))
+    view.ImageManager.RESOURCES_DIR = RESOURCES_DIR
+
+    FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+
+    print("{0:>8} {1:>8} {2:>12} {3:>12} {4:>12} {5:>12}".format("monsters", "objects", "full redraw",
+                                                                 "region", "actor pass", "pixels"))
+
+    for monster_count in monster_counts:
+        results = []
+        for draw in (full_redraw, region_redraw, view.FloorView.draw):
+            floor = generate_busy_floor(monster_count)
+            results.append(time_frames(draw, floor, frame_count))
+
+        print("{0:>8} {1:>8} {2:>10.3f}ms {3:>10.3f}ms {4:>10.3f}ms {5:>12.0f}".format(
+            monster_count, floor.object_count, results[0][0] * 1000, results[1][0] * 1000,
+            results[2][0] * 1000, results[2][1]))
+
+
+def time_first_frames(floors: dict, use_atlas: bool, prewarm: bool, prefetch: bool = False):
+    """Time the first frame after moving on to each floor starting with no images loaded"""
+
+    images = view.ImageManager()
+    images.clear()
+    view.FloorView.USE_ATLAS = use_atlas
+
+    start = time.perf_counter()
+    if prewarm is True:
+        sprites = [(floor_object.name, floor_object.rect.width, floor_object.height) for floor_object in
+                   FloorObjectLoader.floor_objects.values() if floor_object.is_visible is True]
+        for skin_name in view.ImageManager.skins.keys():
+            images.prewarm(skin_name, sprites)
+    startup = time.perf_counter() - start
+
+    floor_view = view.FloorView(FLOOR_WIDTH * 32, FLOOR_DEPTH * 32)
+
+    first_frames = []
+    for floor in floors.values():
+        # Getting the floor ready ahead of time would happen in the background while the player heads to the exit
+        if prefetch is True:
+            floor_view.add_prepared(floor, floor_view.prepare(floor))
+        floor_view.initialise(floor)
+        floor_view.draw()
+        first_frames.append(floor_view.first_frame_time)
+
+    return startup, first_frames
+
+
+def benchmark_first_frame():
+    '''
+    Compare the time to draw the first frame of each floor when images are loaded and scaled as they are
+    first drawn, when they are packed into an atlas on floor entry, when they are all prewarmed at start up
+    and when each floor has also been prefetched before the player gets to it.
+    '''
+
+    pygame.display.set_mode((FLOOR_WIDTH * 32, FLOOR_DEPTH * 32))
+    view.ImageManager.RESOURCES_DIR = RESOURCES_DIR
+    view.ImageManager().initialise()
+
+    FloorObjectLoader(os.path.join(DATA_FILES_DIR, "default_floor_objects.csv")).load()
+    FloorLayoutLoader.floor_layouts = {}
+    FloorLayoutLoader(os.path.join(DATA_FILES_DIR, "default_floor_layouts.csv"), flyweight=True).load()
+    floors = FloorLayoutLoader.floor_layouts
+
+    print("{0:>24} {1:>10} {2:>12} {3:>12} {4:>12}".format("images", "startup", "first floor", "mean floor",
+                                                           "worst floor"))
+
+    for name, use_atlas, prewarm, prefetch in (("loaded when drawn", False, False, False),
+                                               ("atlas on floor entry", True, False, False),
+                                               ("atlas at start up", True, True, False),
+                                               ("prefetched", True, True, True)):
+        startup, first_frames = time_first_frames(floors, use_atlas, prewarm, prefetch)
+        print("{0:>24} {1:>8.2f}ms {2:>10.2f}ms {3:>10.2f}ms {4:>10.2f}ms".format(
+            name, startup * 1000, first_frames[0] * 1000, sum(first_frames) / len(first_frames) * 1000,
+            max(first_frames) * 1000))
+
+
+def main():
+    benchmark_frames()
+    benchmark_first_frame()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARN)
+    main()
@@ -0,0 +1,156 @@
+import concurrent.futures
+import os
+import random
+
+# Nothing gets displayed but make sure that SDL never tries to open a real window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import pytest
+
+import model
+import view
+
+MOVE_STEP = 2
+
+
+@pytest.fixture
+def game():
+
+    pygame.display.set_mode((20 * 32, 20 * 32))
+
+    game = model.Game("Test")
+    game.initialise()
+    game.add_player(game.create_player("player1"))
+
+    return game
+
+
+def full_render(floor_view: view.FloorView, actor_offsets: dict):
+    """Draw the whole floor from scratch with a new view"""
+
+    reference = view.FloorView(floor_view.width, floor_view.height)
+    reference.floor = floor_view.floor
+    reference.overhang = floor_view.overhang
+    reference.tick_count = floor_view.tick_count
+    reference.actor_offsets = {actor: offset for actor, offset in actor_offsets.items() if offset != (0, 0)}
+    reference.layer_surfaces = reference.draw_layers()
+    reference.compose(reference.surface.get_rect())
+
+    return reference.surface
+
+
+def get_differences(surface, other_surface):
+    return int((pygame.surfarray.array3d(surface) != pygame.surfarray.array3d(other_surface)).any(axis=2).sum())
+
+
+@pytest.mark.parametrize("alpha", [None, 0.5, 0.25])
+def test_incremental_draw_matches_full_render(game, alpha):
+
+    floor_view = view.FloorView(20 * 32, 20 * 32)
+    floor_view.initialise(game.current_floor)
+    floor_view.draw()
+
+    rnd = random.Random(3)
+    dx, dy = 0, 0
+
+    for frame in range(150):
+
+        if frame % 15 == 0:
+            dx, dy = rnd.choice((-MOVE_STEP, 0, MOVE_STEP)), rnd.choice((-MOVE_STEP, 0, MOVE_STEP))
+
+        player = game.current_player
+        floor_id, x, y = (game.current_floor_id,) + player.get_pos()
+        game.move_player(dx, dy)
+        if frame % 19 == 0:
+            game.tick()
+
+        # Draw the player part way back towards where they were like the controller does
+        actor_offsets = {}
+        if alpha is not None and floor_id == game.current_floor_id:
+            current_x, current_y = player.get_pos()
+            actor_offsets = {player: (round((x - current_x) * (1 - alpha)), round((y - current_y) * (1 - alpha)))}
+
+        floor_view.initialise(game.current_floor)
+        floor_view.set_actor_offsets(actor_offsets)
+        floor_view.draw()
+
+        assert get_differences(floor_view.surface, full_render(floor_view, actor_offsets)) == 0, \
+            "Frame {0} differs from a full render".format(frame)
+
+
+def test_only_the_viewed_floor_records_dirty_rects(game):
+
+    floor_view = view.FloorView(20 * 32, 20 * 32)
+    floor_view.initialise(game.current_floor)
+    first_floor = game.current_floor
+    assert first_floor.viewed is True
+
+    other_floor = game.floor_factory.floors[2]
+    floor_view.initialise(other_floor)
+    assert first_floor.viewed is False
+    assert other_floor.viewed is True
+
+    game.move_player(MOVE_STEP, 0)
+    assert first_floor.dirty_rects == []
+
+
+def test_prepared_floor_is_swapped_in(game):
+
+    floor_view = view.FloorView(20 * 32, 20 * 32)
+    floor_view.initialise(game.current_floor)
+    other_floor = game.floor_factory.floors[2]
+
+    # Getting a floor ready in the background leaves the floor and the view alone
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        prepared = executor.submit(floor_view.prepare, other_floor).result()
+
+    assert other_floor.viewed is False
+    assert floor_view.prepared == {}
+
+    floor_view.add_prepared(other_floor, prepared)
+    floor_view.initialise(other_floor)
+    floor_view.draw()
+
+    assert floor_view.layer_surfaces is prepared[1]
+    assert floor_view.prepared == {}
+    assert get_differences(floor_view.surface, full_render(floor_view, {})) == 0
+
+
+def test_prepared_floor_that_has_changed_is_drawn_again(game):
+
+    floor_view = view.FloorView(20 * 32, 20 * 32)
+    floor_view.initialise(game.current_floor)
+    other_floor = game.floor_factory.floors[2]
+
+    prepared = floor_view.prepare(other_floor)
+    other_floor.remove_object([object for object in other_floor.layers[1] if object.is_interactable is True][0])
+
+    floor_view.add_prepared(other_floor, prepared)
+    floor_view.initialise(other_floor)
+    floor_view.draw()
+
+    assert floor_view.layer_surfaces is not prepared[1]
+    assert get_differences(floor_view.surface, full_render(floor_view, {})) == 0
+
+
+def test_status_is_drawn_without_a_current_player(game):
+
+    pygame.font.init()
+
+    status_view = view.StatusView(20 * 32, 26)
+    status_view.initialise(game)
+    game.events.process()
+    status_view.draw()
+
+    game.remove_player(game.current_player.name)
+    assert game.current_player is None
+
+    # Messages for nobody in particular still get shown
+    game.events.publish(model.Event.PLAYER_ADDED, "{0} joined the game", "player2")
+    game.events.process()
+    status_view.draw()
+
+    assert status_view.status == (None, tuple(status_view.messages))
+    assert [message for message, expiry in status_view.messages] == ["player2 joined the game"]
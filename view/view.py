@@ -1,5 +1,9 @@
+import collections
+import copy
 import logging
 import os
+import threading
+import time
 
 import pygame
 from pygame.locals import *
@@ -24,9 +28,19 @@ class Colours:
 
 class ImageManager:
     DEFAULT_SKIN = "default"
-    RESOURCES_DIR = os.path.dirname(__file__) + "\\resources\\"
+    RESOURCES_DIR = os.path.join(os.path.dirname(__file__), "resources", "")
+    ATLAS_WIDTH = 1024
 
+    # Scaled images by (file name, width, height) and the original images that they were scaled from
     image_cache = {}
+    file_cache = {}
+
+    # A single surface per skin holding all of its pre-scaled images and where each (file name, width, height) is
+    atlases = {}
+
+    # Atlases can be built by a background thread that is getting a floor ready as well as by the game
+    lock = threading.RLock()
+
     skins = {}
     initialised = False
 
@@ -39,20 +53,89 @@ class ImageManager:
 
     def get_image(self, image_file_name: str, width: int = 32, height: int = 32):
 
-        if image_file_name not in ImageManager.image_cache.keys():
+        key = (image_file_name, int(width), int(height))
+
+        if key not in ImageManager.image_cache.keys():
+
+            original_image = self.load_image(image_file_name)
+            if original_image is not None:
+                ImageManager.image_cache[key] = pygame.transform.scale(original_image, key[1:])
+
+        return ImageManager.image_cache.get(key)
+
+    def load_image(self, image_file_name: str):
+
+        if image_file_name not in ImageManager.file_cache.keys():
 
             filename = ImageManager.RESOURCES_DIR + image_file_name
             try:
                 logging.info("Loading image {0}...".format(filename))
-                original_image = pygame.image.load(filename).convert_alpha()
-                image = pygame.transform.scale(original_image, (width, height))
-                ImageManager.image_cache[image_file_name] = image
+                ImageManager.file_cache[image_file_name] = pygame.image.load(filename).convert_alpha()
                 logging.info("Image {0} loaded and cached.".format(filename))
                 print("loading img")
             except Exception as err:
                 print(str(err))
+                ImageManager.file_cache[image_file_name] = None
+
+        return ImageManager.file_cache[image_file_name]
+
+    def clear(self):
+        """Throw away all of the loaded images and atlases"""
+
+        ImageManager.image_cache = {}
+        ImageManager.file_cache = {}
+        ImageManager.atlases = {}
+
+    def prewarm(self, skin_name: str, sprites: list):
+        """
+        Make sure that all of the images for a list of (tile name, width, height) sprites are loaded, scaled
+        and packed into the skin's atlas so that nothing needs to be loaded or scaled while drawing.
+        """
+
+        with ImageManager.lock:
+
+            atlas, atlas_rects = ImageManager.atlases.get(skin_name, (None, {}))
+
+            keys = set(atlas_rects.keys())
+            for tile_name, width, height in sprites:
+                if int(width) > 0 and int(height) > 0:
+                    for tile_file_name in self.get_tile_file_names(tile_name, skin_name):
+                        keys.add((tile_file_name, int(width), int(height)))
 
-        return self.image_cache[image_file_name]
+            images = {}
+            for key in keys:
+                image = self.get_image(*key)
+                if image is not None:
+                    images[key] = image
+
+            if len(images) == len(atlas_rects):
+                return
+
+            # Pack the images into rows of the atlas tallest first
+            atlas_rects = {}
+            x = 0
+            y = 0
+            row_height = 0
+            for key in sorted(images.keys(), key=lambda key: (-key[2], -key[1], key[0])):
+                file_name, width, height = key
+                if x + width > ImageManager.ATLAS_WIDTH:
+                    x = 0
+                    y += row_height
+                    row_height = 0
+                atlas_rects[key] = pygame.Rect(x, y, width, height)
+                x += width
+                row_height = max(row_height, height)
+
+            atlas = pygame.Surface((ImageManager.ATLAS_WIDTH, max(y + row_height, 1)), SRCALPHA).convert_alpha()
+            atlas.fill((0, 0, 0, 0))
+
+            # Copy the pixels across exactly rather than blending them with the empty atlas
+            for key, rect in atlas_rects.items():
+                atlas.blit(images[key], rect, special_flags=BLEND_RGBA_MAX)
+
+            ImageManager.atlases[skin_name] = (atlas, atlas_rects)
+
+            logging.info("Built {0} atlas with {1} images".format(skin_name, len(atlas_rects)))
 
     def load_skins(self):
 
@@ -154,7 +237,13 @@ class ImageManager:
 
         ImageManager.skins[new_skin_name] = new_skin
 
-    def get_skin_image(self, tile_name: str, skin_name: str = DEFAULT_SKIN, tick=0, width: int = 32, height: int = 32):
+    def is_animated(self, tile_name: str, skin_name: str = DEFAULT_SKIN):
+        """Does the image for a tile change with the tick count?"""
+
+        return len(self.get_tile_file_names(tile_name, skin_name)) > 1
+
+    def get_tile_file_names(self, tile_name: str, skin_name: str = DEFAULT_SKIN):
+        """Get all of the image files for a tile in a skin or in the default skin if the skin doesn't have it"""
 
         if skin_name not in ImageManager.skins.keys():
             raise Exception("Can't find specified skin {0}".format(skin_name))
@@ -164,26 +253,57 @@ class ImageManager:
         if tile_name not in tile_map.keys():
             name, tile_map = ImageManager.skins[ImageManager.DEFAULT_SKIN]
             if tile_name not in tile_map.keys():
-                raise Exception("Can't find tile name '{0}' in skin '{1}'!".format(tile_name, skin_name))
+                return ()
 
         tile_file_names = tile_map[tile_name]
 
-        image = None
-
         if tile_file_names is None:
-            image = None
+            return ()
         elif isinstance(tile_file_names, tuple):
-            if tick == 0:
-                tile_file_name = tile_file_names[0]
-            else:
-                tile_file_name = tile_file_names[tick % len(tile_file_names)]
+            return tile_file_names
+        else:
+            return (tile_file_names,)
 
-            image = self.get_image(image_file_name=tile_file_name, width=width, height=height)
+    def get_tile_file_name(self, tile_name: str, skin_name: str = DEFAULT_SKIN, tick=0):
 
-        else:
-            image = self.get_image(tile_file_names, width=width, height=height)
+        if skin_name not in ImageManager.skins.keys():
+            raise Exception("Can't find specified skin {0}".format(skin_name))
+
+        tile_file_names = self.get_tile_file_names(tile_name, skin_name)
+
+        if len(tile_file_names) == 0:
+            if tile_name not in ImageManager.skins[skin_name][1].keys() and \
+                    tile_name not in ImageManager.skins[ImageManager.DEFAULT_SKIN][1].keys():
+                raise Exception("Can't find tile name '{0}' in skin '{1}'!".format(tile_name, skin_name))
+            return None
+
+        return tile_file_names[tick % len(tile_file_names)]
+
+    def get_skin_image(self, tile_name: str, skin_name: str = DEFAULT_SKIN, tick=0, width: int = 32, height: int = 32):
+
+        tile_file_name = self.get_tile_file_name(tile_name, skin_name, tick)
+
+        if tile_file_name is None:
+            return None
+
+        return self.get_image(image_file_name=tile_file_name, width=width, height=height)
+
+    def get_skin_sprite(self, tile_name: str, skin_name: str = DEFAULT_SKIN, tick=0, width: int = 32,
+                        height: int = 32):
+        """Get the (surface, area) to blit for a tile which is a region of the skin's atlas if it has been prewarmed"""
+
+        tile_file_name = self.get_tile_file_name(tile_name, skin_name, tick)
+
+        if tile_file_name is None:
+            return None, None
 
-        return image
+        atlas, atlas_rects = ImageManager.atlases.get(skin_name, (None, {}))
+        area = atlas_rects.get((tile_file_name, int(width), int(height)))
+
+        if area is not None:
+            return atlas, area
+
+        return self.get_image(image_file_name=tile_file_name, width=width, height=height), None
 
 
 class View:
@@ -191,6 +311,11 @@ class View:
 
     def __init__(self):
         self.tick_count = 0
+        self.surface = None
+
+        # The regions of the view's surface that have changed since they were last collected
+        self.dirty_rects = []
+
         View.image_manager.initialise()
 
     def initialise(self):
@@ -205,6 +330,21 @@ class View:
     def end(self):
         pass
 
+    def mark_dirty(self, rect: pygame.Rect = None):
+        """Record that a region of the surface has changed or that all of it has if no rect is specified"""
+
+        if rect is None:
+            rect = self.surface.get_rect()
+
+        self.dirty_rects.append(pygame.Rect(rect))
+
+    def pop_dirty_rects(self):
+        """Get the regions that have changed since the last call and start again"""
+
+        dirty_rects = self.dirty_rects
+        self.dirty_rects = []
+        return dirty_rects
+
 
 class MainFrame(View):
     TITLE_HEIGHT = 80
@@ -215,7 +355,7 @@ class MainFrame(View):
     PLAYING = "Playing"
     SHOPPING = "Shopping"
 
-    RESOURCES_DIR = os.path.dirname(__file__) + "\\resources\\"
+    RESOURCES_DIR = os.path.join(os.path.dirname(__file__), "resources", "")
 
     def __init__(self, width: int = 600, height: int = 600):
 
@@ -232,8 +372,13 @@ class MainFrame(View):
 
         self.floor_view = FloorView(playing_area_width, playing_area_height)
         self.status_view = StatusView(playing_area_width, MainFrame.STATUS_HEIGHT)
+        self.profiler_view = ProfilerView(playing_area_width, MainFrame.TITLE_HEIGHT)
 
-    def initialise(self, game: model.Game):
+        # How many pixels were sent to the display by the last update and in total
+        self.pixels_pushed = 0
+        self.total_pixels_pushed = 0
+
+    def initialise(self, game: model.Game, profiler=None):
 
         super(MainFrame, self).initialise()
 
@@ -255,38 +400,73 @@ class MainFrame(View):
         images = ImageManager()
         images.initialise()
 
+        # Load and scale the images for every type of floor object in every skin before the first frame
+        sprites = [(floor_object.name, floor_object.rect.width, floor_object.height) for floor_object in
+                   model.FloorObjectLoader.floor_objects.values() if floor_object.is_visible is True]
+        for skin_name in ImageManager.skins.keys():
+            images.prewarm(skin_name, sprites)
+
         self.floor_view.initialise(self.game.current_floor)
         self.status_view.initialise(self.game)
+        self.profiler_view.initialise(profiler)
+
+        # Start off with a blank window that all needs to be pushed to the display
+        self.surface.fill(Colours.DARK_GREY)
+        self.mark_dirty()
 
     def draw(self):
 
         super(MainFrame, self).draw()
 
-        self.surface.fill(Colours.DARK_GREY)
-
         pane_rect = self.surface.get_rect()
 
         x = 0
-        y = pane_rect.y + MainFrame.TITLE_HEIGHT
+        y = pane_rect.y
+
+        # The profiler overlay goes over the title area
+        self.profiler_view.draw()
+        self.blit_dirty_rects(self.profiler_view, x, y)
+
+        y += MainFrame.TITLE_HEIGHT
 
         self.floor_view.initialise(self.game.current_floor)
         self.floor_view.draw()
-        self.surface.blit(self.floor_view.surface, (x, y))
+        self.blit_dirty_rects(self.floor_view, x, y)
 
         y += MainFrame.PLAYING_AREA_HEIGHT
 
         self.status_view.draw()
-        self.surface.blit(self.status_view.surface, (x, y))
+        self.blit_dirty_rects(self.status_view, x, y)
 
+    def interpolate(self, actor_offsets: dict):
+        """Draw the actors on the floor offset by (dx, dy) from where they are in the model"""
+
+        self.floor_view.set_actor_offsets(actor_offsets)
+
+    def blit_dirty_rects(self, view: View, x: int, y: int):
+        """Copy just the changed regions of a view onto the window"""
+
+        for rect in view.pop_dirty_rects():
+            self.surface.blit(view.surface, (rect.x + x, rect.y + y), rect)
+            self.mark_dirty(rect.move(x, y))
 
     def update(self):
-        pygame.display.update()
+
+        window_rect = self.surface.get_rect()
+        dirty_rects = [rect.clip(window_rect) for rect in merge_rects(self.pop_dirty_rects())]
+
+        if len(dirty_rects) > 0:
+            pygame.display.update(dirty_rects)
+
+        self.pixels_pushed = sum([rect.width * rect.height for rect in dirty_rects])
+        self.total_pixels_pushed += self.pixels_pushed
 
     def tick(self):
 
         super(MainFrame, self).tick()
         self.floor_view.tick()
         self.status_view.tick()
+        self.profiler_view.tick()
 
 
 class FloorView(View):
@@ -295,6 +475,9 @@ class FloorView(View):
     TILE_WIDTH = 32
     TILE_HEIGHT = 32
 
+    # Pack the images for each floor into its skin's atlas when it is first viewed
+    USE_ATLAS = True
+
     def __init__(self, width: int, height: int, tile_width: int = TILE_WIDTH, tile_height: int = TILE_HEIGHT):
 
         super(FloorView, self).__init__()
@@ -310,97 +493,334 @@ class FloorView(View):
         self.skin_name = None
         self.layer_surfaces = {}
 
+        # How far above its footprint the tallest object on the floor gets drawn
+        self.overhang = 0
+
+        # The (layer, rect, actor) regions of the floor that have changed in the view rather than in the model
+        self.changed_rects = []
+        self.redraw = True
+
+        # When the floor last changed and how long it took to get the first frame of it drawn
+        self.floor_change_time = None
+        self.first_frame_time = None
+
+        # How far from where they are in the model to draw each actor and where each actor that was
+        # drawn away from where it is in the model was last drawn
+        self.actor_offsets = {}
+        self.drawn_rects = {}
+
+        # The (change count, layer surfaces) for floors that have been drawn ahead of time
+        self.prepared = {}
+
         print("floor w={0},h={1}".format(width, height))
 
-    def draw_layer(self, surface, layer_id):
+    def get_scenery(self, layer_id, rect: pygame.Rect = None):
+        """Get the objects on a layer in draw order or just the ones that get drawn over rect if one is specified"""
+
+        layer = self.floor.layers[layer_id]
+        static_layer = self.floor.static_layers.get(layer_id)
+
+        if rect is None:
+            static_tiles = self.floor.get_static_tiles(layer_id)
+        else:
+            # Objects are drawn upwards from their footprint so look below the rect for any that overhang it
+            footprint_rect = pygame.Rect(rect.x, rect.y, rect.width, rect.height + self.overhang)
+
+            layer = self.floor.nearby_objects(layer_id, footprint_rect)
+            static_tiles = [] if static_layer is None else [static_layer.get_tile(entry) for entry in
+                                                             sorted(static_layer.query(footprint_rect))]
+
+            visible = lambda obj: self.model_to_view_rect(obj).colliderect(rect)
+            layer = list(filter(visible, layer))
+            static_tiles = list(filter(visible, static_tiles))
+
+        # Merge in any flyweight tiles in the same row by row order that the floor was loaded in
+        if static_layer is not None:
+            layer = sorted(layer + static_tiles, key=lambda obj: (obj.rect.y, obj.rect.x))
+
+        return layer
+
+    def get_actors(self, rect: pygame.Rect = None):
+        """Get the players and monsters in draw order or just the ones that get drawn over rect if one is specified"""
+
+        actors = list(self.floor.players.values()) + self.floor.monsters
+
+        if rect is not None:
+            actors = [actor for actor in actors if self.model_to_view_rect(actor).colliderect(rect)]
+
+        return sorted(actors, key=lambda obj: obj.rect.y, reverse=False)
+
+    def draw_layer(self, surface, layer_id, rect: pygame.Rect = None):
+        """Draw the scenery on a layer or just the specified region of it"""
 
         if self.floor is None:
             raise ("No Floor to view!")
 
-        skin_name = self.floor.skin_name
-
         # print("drawing layer for floor {0}".format(layer_id))
 
-        surface.fill(FloorView.TRANSPARENT)
+        if rect is None:
+            surface.fill(FloorView.TRANSPARENT)
+        else:
+            surface.set_clip(rect)
+            surface.fill(FloorView.TRANSPARENT, rect)
 
-        view_objects = []
+        for view_object in self.get_scenery(layer_id, rect):
+            self.draw_object(surface, view_object)
 
-        layer = self.floor.layers[layer_id]
-        if layer_id == 1:
-            player_layer = list(self.floor.players.values()) + layer + self.floor.monsters
-            view_objects += sorted(player_layer, key=lambda obj: obj.rect.y, reverse=False)
-        else:
-            view_objects += layer
-
-        for view_object in view_objects:
-            if view_object.is_visible is True:
-
-                if isinstance(view_object, model.Player):
-
-                    image = View.image_manager.get_skin_image(model.Objects.PLAYER,
-                                                              tick=self.tick_count,
-                                                              width=view_object.rect.width,
-                                                              height=view_object.height)
-                    if image is None:
-                        pygame.draw.rect(surface, Colours.WHITE, self.model_to_view_rect(view_object))
-                        pygame.draw.rect(surface, Colours.RED, self.model_to_view_rect(view_object), 1)
-                    else:
-                        surface.blit(image, self.model_to_view_rect(view_object))
-
-                elif isinstance(view_object, model.Monster):
-                    pygame.draw.rect(surface, Colours.RED, self.model_to_view_rect(view_object))
-                    pygame.draw.rect(surface, Colours.GOLD, self.model_to_view_rect(view_object), 1)
-
-                elif isinstance(view_object, model.RPGObject):
-                    image = View.image_manager.get_skin_image(view_object.name,
-                                                              tick=self.tick_count,
-                                                              width=view_object.rect.width,
-                                                              height=view_object.height,
-                                                              skin_name=skin_name)
-                    if image is None:
-                        pygame.draw.rect(surface, Colours.GREEN, self.model_to_view_rect(view_object))
-                        pygame.draw.rect(surface, Colours.GOLD, self.model_to_view_rect(view_object), 1)
-                    else:
-                        surface.blit(image, self.model_to_view_rect(view_object))
+        surface.set_clip(None)
 
         return surface
 
+    def draw_actors(self, surface, rect: pygame.Rect):
+        """
+        Draw the players and monsters over the layer 1 scenery in the specified region. Only the scenery
+        that is in front of each actor gets drawn again and only over the top of the actor itself.
+        """
+
+        surface.set_clip(rect)
+
+        for actor in self.get_actors(rect):
+
+            self.draw_object(surface, actor)
+
+            actor_rect = self.model_to_view_rect(actor).clip(rect)
+
+            # Players go behind scenery at the same y and monsters go in front of it
+            if isinstance(actor, model.Player):
+                in_front = lambda obj: obj.rect.y >= actor.rect.y
+            else:
+                in_front = lambda obj: obj.rect.y > actor.rect.y
+
+            surface.set_clip(actor_rect)
+            for view_object in self.get_scenery(1, actor_rect):
+                if in_front(view_object):
+                    self.draw_object(surface, view_object)
+            surface.set_clip(rect)
+
+        surface.set_clip(None)
+
+    def draw_object(self, surface, view_object):
+
+        if view_object.is_visible is True:
+
+            if isinstance(view_object, model.Player):
+
+                image, area = View.image_manager.get_skin_sprite(model.Objects.PLAYER,
+                                                                 tick=self.tick_count,
+                                                                 width=view_object.rect.width,
+                                                                 height=view_object.height)
+                if image is None:
+                    image = get_box_image(view_object.rect.width, view_object.height, Colours.WHITE, Colours.RED)
+
+                surface.blit(image, self.model_to_view_rect(view_object), area)
+
+            elif isinstance(view_object, model.Monster):
+                image = get_box_image(view_object.rect.width, view_object.height, Colours.RED, Colours.GOLD)
+                surface.blit(image, self.model_to_view_rect(view_object))
+
+            elif isinstance(view_object, (model.RPGObject, model.StaticTile)):
+                image, area = View.image_manager.get_skin_sprite(view_object.name,
+                                                                 tick=self.tick_count,
+                                                                 width=view_object.rect.width,
+                                                                 height=view_object.height,
+                                                                 skin_name=self.floor.skin_name)
+                if image is None:
+                    image = get_box_image(view_object.rect.width, view_object.height, Colours.GREEN, Colours.GOLD)
+
+                surface.blit(image, self.model_to_view_rect(view_object), area)
+
     def initialise(self, floor: model.Floor):
 
-        if self.floor is None or floor.name != self.floor.name:
+        if floor is not self.floor:
             print("Changing floor from to {0}".format(floor.name))
+            self.floor_change_time = time.perf_counter()
+
+            # Stop the floor that is being left recording changes now that nothing is going to draw them
+            if self.floor is not None:
+                self.floor.set_viewed(False)
+
             self.floor = floor
-            for layer_id in self.floor.layers.keys():
-                surface = pygame.Surface((self.width, self.height))
-                surface.set_colorkey(FloorView.TRANSPARENT)
-                surface.set_alpha(None)
-                self.layer_surfaces[layer_id] = self.draw_layer(surface, layer_id)
+            self.overhang = self.get_overhang()
+
+            # If the floor was got ready ahead of time and its scenery hasn't changed since then just swap it in...
+            change_count, layer_surfaces = self.prepared.pop(floor, (None, None))
+            self.prepared = {}
+
+            if layer_surfaces is not None and len(floor.changes) == change_count:
+                self.layer_surfaces = layer_surfaces
+
+            # ...otherwise draw it now
+            else:
+                if FloorView.USE_ATLAS is True:
+                    self.prewarm()
+
+                self.layer_surfaces = self.draw_layers()
+
+            # The whole floor is about to be drawn so any changes made before now don't matter
+            self.floor.set_viewed(True)
+            self.changed_rects = []
+            self.actor_offsets = {}
+            self.drawn_rects = {}
+            self.redraw = True
+
+    def draw_layers(self):
+        """Draw the scenery on every layer of the floor on to a new surface for each layer"""
+
+        return {layer_id: self.draw_layer(self.new_layer_surface(), layer_id) for layer_id in self.floor.layers.keys()}
+
+    def prepare(self, floor: model.Floor):
+        '''
+        Get the images and the layer surfaces for a floor ready before the player moves on to it and return
+        the (number of changes made to the floor, layer surfaces) for add_prepared(). This can be called from a
+        background thread as it only reads the floor and draws using a copy of the view rather than the view itself.
+        '''
+
+        # Anything that changes on the floor after this point means that it has to be drawn again
+        change_count = len(floor.changes)
+
+        floor_view = copy.copy(self)
+        floor_view.floor = floor
+        floor_view.overhang = floor_view.get_overhang()
+
+        if FloorView.USE_ATLAS is True:
+            floor_view.prewarm()
+
+        layer_surfaces = floor_view.draw_layers()
+
+        logging.info("{0}: Prepared floor {1}".format(__class__, floor.name))
+
+        return change_count, layer_surfaces
+
+    def add_prepared(self, floor: model.Floor, prepared: tuple):
+        """Keep what prepare() got ready for a floor so that initialise() can use it"""
+
+        if floor is not self.floor:
+            self.prepared[floor] = prepared
+
+    def set_actor_offsets(self, actor_offsets: dict):
+        """Draw each actor (dx, dy) away from where it is in the model e.g. part way through its last move"""
+
+        self.actor_offsets = {actor: offset for actor, offset in actor_offsets.items() if offset != (0, 0)}
+
+        # Redraw where each offset actor was last drawn, which the model doesn't know about, and where it goes now.
+        # Actors drawn where they are in the model are covered by the regions that the floor marks when they move
+        drawn_rects = {actor: actor.rect.move(offset) for actor, offset in self.actor_offsets.items()}
+
+        for actor in set(self.drawn_rects.keys()) | set(drawn_rects.keys()):
+            old_rect = self.drawn_rects.get(actor, actor.rect)
+            new_rect = drawn_rects.get(actor, actor.rect)
+            if old_rect != new_rect:
+                self.changed_rects.append((actor.layer, old_rect.union(new_rect), True))
+
+        self.drawn_rects = drawn_rects
+
+    def new_layer_surface(self):
+        surface = pygame.Surface((self.width, self.height))
+        surface.set_colorkey(FloorView.TRANSPARENT)
+        surface.set_alpha(None)
+        return surface
+
+    def get_floor_objects(self):
+
+        objects = list(self.floor.players.values()) + self.floor.monsters
+        for layer_id, layer in self.floor.layers.items():
+            objects += layer
+            objects += self.floor.get_static_tiles(layer_id)
+
+        return objects
+
+    def get_overhang(self):
+        """How far above its footprint does the tallest object on the floor get drawn?"""
+
+        return max([int(obj.height - obj.rect.height) for obj in self.get_floor_objects()] + [0])
+
+    def prewarm(self):
+        """Get the images for everything on the floor into the atlases before the floor is drawn"""
+
+        sprites = set()
+        for view_object in self.get_floor_objects():
+            if view_object.is_visible is True and not isinstance(view_object, (model.Player, model.Monster)):
+                sprites.add((view_object.name, view_object.rect.width, view_object.height))
+
+        View.image_manager.prewarm(self.floor.skin_name, sprites)
+
+        players = [(model.Objects.PLAYER, player.rect.width, player.height) for player in self.floor.players.values()]
+        View.image_manager.prewarm(ImageManager.DEFAULT_SKIN, players)
+
+    def tick(self):
+
+        super(FloorView, self).tick()
+
+        if self.floor is None:
+            return
+
+        # Animated objects need redrawing with their next image
+        for player in self.floor.players.values():
+            self.changed_rects.append((player.layer, player.rect.copy(), True))
+
+        for view_object in self.floor.layers.get(1, []):
+            if View.image_manager.is_animated(view_object.name, self.floor.skin_name) is True:
+                self.changed_rects.append((view_object.layer, view_object.rect.copy(), False))
 
     def draw(self):
 
         # dt1 = datetime.now()
 
-        self.surface.fill(FloorView.BG_COLOUR)
-
         if self.floor is None:
             raise ("No Floor to view!")
 
-        layer_surface_ids = sorted(self.layer_surfaces.keys())
+        # If this is a new floor then put the whole thing together...
+        if self.redraw is True:
+            self.compose(self.surface.get_rect())
+            self.mark_dirty()
+            self.redraw = False
 
-        for id in layer_surface_ids:
+            # How long did it take from changing floor to having the first frame of it ready?
+            self.first_frame_time = time.perf_counter() - self.floor_change_time
+            logging.info("First frame of {0} took {1:.2f}ms".format(self.floor.name, self.first_frame_time * 1000))
+            return
 
-            surface = self.layer_surfaces[id]
+        # ...otherwise just redraw the regions of each layer that have changed
+        regions = []
 
-            if id == 1:
-                surface = self.draw_layer(surface, id)
+        for layer_id, rect, actor in self.floor.pop_dirty_rects() + self.changed_rects:
 
-            # print("blitting surface for layer {0} {1}".format(id, surface.get_rect()))
+            region = self.model_to_view_region(rect).clip(self.surface.get_rect())
+            if region.width == 0 or region.height == 0:
+                continue
+
+            # If only actors have changed then the cached scenery is still good
+            if layer_id not in self.layer_surfaces.keys():
+                self.layer_surfaces[layer_id] = self.draw_layer(self.new_layer_surface(), layer_id)
+            elif actor is False:
+                self.draw_layer(self.layer_surfaces[layer_id], layer_id, region)
+
+            regions.append(region)
 
-            self.surface.blit(surface, (0, 0, self.width, self.height))
+        self.changed_rects = []
+
+        for region in merge_rects(regions):
+            self.compose(region)
+            self.mark_dirty(region)
 
             # dt2 = datetime.now()
             # print("draw={0}".format(dt2.microsecond - dt1.microsecond))
 
+    def compose(self, rect: pygame.Rect):
+        """Blit the layer surfaces on top of each other for the specified region of the view"""
+
+        self.surface.fill(FloorView.BG_COLOUR, rect)
+
+        for id in sorted(self.layer_surfaces.keys()):
+
+            # print("blitting surface for layer {0} {1}".format(id, surface.get_rect()))
+
+            self.surface.blit(self.layer_surfaces[id], rect.topleft, rect)
+
+            # The players and monsters go in between the layer 1 scenery
+            if id == 1:
+                self.draw_actors(self.surface, rect)
+
     def model_to_view_rect(self, model_object: model.RPGObject):
 
         HEIGHT_ANGLE_FACTOR = 1.0
@@ -410,11 +830,26 @@ class FloorView(View):
         view_rect.height = model_object.height * HEIGHT_ANGLE_FACTOR
         view_rect.bottom = bottom
 
+        # Actors can be drawn part way through a move
+        if len(self.actor_offsets) > 0 and isinstance(model_object, (model.Player, model.Monster)):
+            offset = self.actor_offsets.get(model_object)
+            if offset is not None:
+                view_rect.move_ip(offset)
+
         return view_rect
 
+    def model_to_view_region(self, rect: pygame.Rect):
+        """Get the region of the view that anything standing in a rect of the floor could be drawn over"""
+
+        return pygame.Rect(rect.x, rect.y - self.overhang, rect.width, rect.height + self.overhang)
+
 class StatusView(View):
 
     BG_COLOUR = Colours.DARK_GREY
+    FG_COLOUR = Colours.WHITE
+    FONT_SIZE = 18
+    LINE_HEIGHT = 13
+    MESSAGES_X = 4 * 32 + 12
 
     def __init__(self, width : int, height : int):
 
@@ -426,34 +861,205 @@ class StatusView(View):
         self.surface = pygame.Surface((self.width, self.height))
         self.game = None
         self.skin_name = None
+        self.status = None
+        self.font = None
+
+        # The latest (message, tick that it goes at) for the current player, newest last
+        self.messages = collections.deque(maxlen=model.Game.MAX_STATUS_MESSAGES)
 
     def initialise(self, game: model.Game):
 
         super(StatusView, self).initialise()
+
+        if self.game is not None:
+            self.game.events.unsubscribe(self.add_events)
+
         self.game = game
+        self.status = None
+        self.messages.clear()
+        self.game.events.subscribe(self.add_events)
+
+    def add_events(self, events: list):
+        """Subscriber that shows the messages for the events that happened to the current player"""
+
+        # Events carry the name of the player that they happened to so there might not be a current player by now
+        player = self.game.current_player
+        player_name = player.name if player is not None else None
+
+        for event in events:
+            if event.player_name in (None, player_name):
+                self.messages.append((event.get_text(), self.tick_count + model.Game.STATUS_MESSAGE_LIFETIME))
+
+    def tick(self):
+
+        super(StatusView, self).tick()
+
+        while len(self.messages) > 0 and self.messages[0][1] <= self.tick_count:
+            self.messages.popleft()
 
     def draw(self):
-        self.surface.fill(StatusView.BG_COLOUR)
 
         player = self.game.current_player
 
+        # Only redraw the status when something in it has changed, which is just the messages if there is no player
+        if player is not None:
+            status = (player.keys, player.boss_keys, player.treasure, player.HP, tuple(self.messages))
+        else:
+            status = (None, tuple(self.messages))
+        if status == self.status:
+            return
+
+        self.status = status
+        self.mark_dirty()
+
+        self.surface.fill(StatusView.BG_COLOUR)
+
+        if player is not None:
+
+            x=4
+            y=2
+
+            draw_icon(self.surface,x,y,model.Objects.KEY, player.keys)
+
+            x += 32
+
+            draw_icon(self.surface,x,y,model.Objects.BOSS_KEY, player.boss_keys)
+
+            x += 32
+
+            draw_icon(self.surface,x,y,model.Objects.TREASURE, player.treasure)
+
+            x += 32
+
+            draw_icon(self.surface,x,y,model.Objects.PLAYER, player.HP)
+
+        if self.font is None:
+            self.font = pygame.font.Font(None, StatusView.FONT_SIZE)
+
+        # Show as many of the newest messages as will fit with the newest at the bottom
+        lines = max(1, self.height // StatusView.LINE_HEIGHT)
+        y = 1
+        for message, expiry in list(self.messages)[-lines:]:
+            text = self.font.render(message, 1, StatusView.FG_COLOUR, StatusView.BG_COLOUR)
+            self.surface.blit(text, (StatusView.MESSAGES_X, y))
+            y += StatusView.LINE_HEIGHT
+
+
+class ProfilerView(View):
+
+    BG_COLOUR = Colours.DARK_GREY
+    FG_COLOUR = Colours.YELLOW
+    FONT_SIZE = 16
+    LINE_HEIGHT = 12
+    COLUMNS = 2
+
+    def __init__(self, width: int, height: int):
+
+        super(ProfilerView, self).__init__()
+
+        self.width = width
+        self.height = height
+
+        self.surface = pygame.Surface((self.width, self.height))
+        self.profiler = None
+        self.showing = False
+        self.refresh = True
+        self.font = None
+
+    def initialise(self, profiler):
+
+        super(ProfilerView, self).initialise()
+        self.profiler = profiler
+
+    def tick(self):
+
+        super(ProfilerView, self).tick()
+
+        # Don't redraw the numbers every frame or they can't be read and the overlay becomes a hot path itself
+        if self.tick_count % 2 == 0:
+            self.refresh = True
+
+    def draw(self):
+
+        if self.profiler is None:
+            return
+
+        # Clear the overlay away when profiling gets turned off
+        if self.profiler.enabled is False:
+            if self.showing is True:
+                self.surface.fill(ProfilerView.BG_COLOUR)
+                self.mark_dirty()
+                self.showing = False
+            return
+
+        if self.showing is True and self.refresh is False:
+            return
+
+        self.showing = True
+        self.refresh = False
+
+        if self.font is None:
+            self.font = pygame.font.Font(None, ProfilerView.FONT_SIZE)
+
+        self.surface.fill(ProfilerView.BG_COLOUR)
+
+        lines = []
+        for name, summary in self.profiler.get_report().items():
+            if summary["units"] == "s":
+                lines.append("{0:<26} {1:7.3f} {2:7.3f} {3:7.3f}ms".format(name, summary["p50"] * 1000,
+                                                                          summary["p90"] * 1000,
+                                                                          summary["p99"] * 1000))
+            else:
+                lines.append("{0:<26} {1:7.0f} {2:7.0f} {3:7.0f}{4}".format(name, summary["p50"], summary["p90"],
+                                                                           summary["p99"], summary["units"]))
+
+        rows = max(1, int(self.height / ProfilerView.LINE_HEIGHT) - 1)
+        column_width = int(self.width / ProfilerView.COLUMNS)
+
+        header = self.font.render("p50 / p90 / p99", 1, ProfilerView.FG_COLOUR, ProfilerView.BG_COLOUR)
+        self.surface.blit(header, (4, 2))
+
+        for i, line in enumerate(lines[:rows * ProfilerView.COLUMNS]):
+            text = self.font.render(line, 1, ProfilerView.FG_COLOUR, ProfilerView.BG_COLOUR)
+            self.surface.blit(text, (4 + int(i / rows) * column_width, 2 + (i % rows + 1) * ProfilerView.LINE_HEIGHT))
+
+        self.mark_dirty()
+
+
+box_images = {}
+
+
+def get_box_image(width: int, height: int, colour, border_colour):
+    """
+    Get a filled box with a border to stand in for an object. The box is drawn once and cached so that it
+    can be blitted as drawing a bordered rect straight onto a clipped surface puts the border on the clip edge.
+    """
 
-        x=4
-        y=2
+    key = (int(width), int(height), colour, border_colour)
 
-        draw_icon(self.surface,x,y,model.Objects.KEY, player.keys)
+    if key not in box_images.keys():
+        image = pygame.Surface((key[0], key[1]))
+        image.fill(colour)
+        pygame.draw.rect(image, border_colour, image.get_rect(), 1)
+        box_images[key] = image
 
-        x += 32
+    return box_images[key]
 
-        draw_icon(self.surface,x,y,model.Objects.BOSS_KEY, player.boss_keys)
 
-        x += 32
+def merge_rects(rects: list):
+    """Combine any overlapping rects so that no region gets drawn or pushed to the display twice"""
 
-        draw_icon(self.surface,x,y,model.Objects.TREASURE, player.treasure)
+    merged = []
 
-        x += 32
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        i = rect.collidelist(merged)
+        while i >= 0:
+            rect.union_ip(merged.pop(i))
+            i = rect.collidelist(merged)
+        merged.append(rect)
 
-        draw_icon(self.surface,x,y,model.Objects.PLAYER, player.HP)
+    return merged
 
 
 def draw_icon(surface, x, y, icon_name, count : int = None, tick : int = 0):